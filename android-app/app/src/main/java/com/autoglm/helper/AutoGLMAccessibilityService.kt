@@ -5,12 +5,15 @@ import android.accessibilityservice.GestureDescription
 import android.content.Intent
 import android.graphics.Bitmap
 import android.graphics.Path
+import android.graphics.Rect
 import android.os.Build
 import android.util.Base64
 import android.util.Log
 import android.view.Display
 import android.view.accessibility.AccessibilityEvent
 import android.view.accessibility.AccessibilityNodeInfo
+import org.json.JSONArray
+import org.json.JSONObject
 import java.io.ByteArrayOutputStream
 import java.util.concurrent.CountDownLatch
 import java.util.concurrent.TimeUnit
@@ -258,10 +261,86 @@ class AutoGLMAccessibilityService : AccessibilityService() {
         return null
     }
 
+    /**
+     * 导出当前窗口的控件树 (扁平列表)
+     *
+     * 只保留用户可见、且有文字 / 描述 / resource-id 或可交互的节点；
+     * 每个节点: b=[left,top,right,bottom], t=文字, d=描述, id=resource-id, cls=类名,
+     * c/e/s/f=可点击/可编辑/可滚动/有焦点 (只在为 true 时输出), p=最近的已输出祖先的下标 (-1 表示无)
+     */
+    fun dumpHierarchy(maxNodes: Int = 1500): JSONObject? {
+        val root = rootInActiveWindow ?: return null
+        val windowPackage = root.packageName?.toString() ?: ""
+        val nodes = JSONArray()
+        try {
+            walkNode(root, -1, nodes, maxNodes)
+        } finally {
+            root.recycle()
+        }
+        val metrics = resources.displayMetrics
+        val json = JSONObject()
+        json.put("success", true)
+        json.put("package", windowPackage)
+        json.put("width", metrics.widthPixels)
+        json.put("height", metrics.heightPixels)
+        json.put("truncated", nodes.length() >= maxNodes)
+        json.put("nodes", nodes)
+        return json
+    }
+
+    private fun walkNode(node: AccessibilityNodeInfo, parent: Int, out: JSONArray, maxNodes: Int) {
+        if (out.length() >= maxNodes || !node.isVisibleToUser) {
+            return
+        }
+        val text = node.text?.toString().orEmpty()
+        val desc = node.contentDescription?.toString().orEmpty()
+        val id = node.viewIdResourceName.orEmpty()
+        val interactive = node.isClickable || node.isEditable || node.isScrollable
+        var index = parent
+        if (interactive || text.isNotEmpty() || desc.isNotEmpty() || id.isNotEmpty()) {
+            val rect = Rect()
+            node.getBoundsInScreen(rect)
+            val item = JSONObject()
+            item.put("b", JSONArray(listOf(rect.left, rect.top, rect.right, rect.bottom)))
+            if (text.isNotEmpty()) item.put("t", text)
+            if (desc.isNotEmpty()) item.put("d", desc)
+            if (id.isNotEmpty()) item.put("id", id)
+            item.put("cls", node.className?.toString()?.substringAfterLast('.') ?: "")
+            if (node.isClickable) item.put("c", true)
+            if (node.isEditable) item.put("e", true)
+            if (node.isScrollable) item.put("s", true)
+            if (node.isFocused) item.put("f", true)
+            item.put("p", parent)
+            out.put(item)
+            index = out.length() - 1
+        }
+        for (i in 0 until node.childCount) {
+            val child = node.getChild(i) ?: continue
+            walkNode(child, index, out, maxNodes)
+            child.recycle()
+        }
+    }
+
+    /**
+     * 截图结果 (已编码的图片字节)
+     */
+    data class Screenshot(val bytes: ByteArray, val width: Int, val height: Int, val mimeType: String)
+
     /**
      * 截取屏幕并返回 Base64 编码
      */
-    fun takeScreenshotBase64(): String? {
+    fun takeScreenshotBase64(maxEdge: Int = 0): String? {
+        val screenshot = takeScreenshotBytes(maxEdge = maxEdge) ?: return null
+        return Base64.encodeToString(screenshot.bytes, Base64.NO_WRAP)
+    }
+
+    /**
+     * 截取屏幕并返回编码后的图片字节
+     *
+     * @param png true 输出 PNG，否则输出 JPEG
+     * @param maxEdge 长边大于该值时先缩放 (0 表示原尺寸)，用于低成本的屏幕稳定检测
+     */
+    fun takeScreenshotBytes(png: Boolean = false, quality: Int = 80, maxEdge: Int = 0): Screenshot? {
         return try {
             if (Build.VERSION.SDK_INT >= Build.VERSION_CODES.R) {
                 // Android 11+ 使用 takeScreenshot API
@@ -290,11 +369,22 @@ class AutoGLMAccessibilityService : AccessibilityService() {
                 latch.await(5, TimeUnit.SECONDS)
                 
                 if (bitmap != null) {
+                    val image = scaleToMaxEdge(bitmap!!, maxEdge)
                     val outputStream = ByteArrayOutputStream()
-                    bitmap!!.compress(Bitmap.CompressFormat.JPEG, 80, outputStream)
-                    val bytes = outputStream.toByteArray()
+                    val format = if (png) Bitmap.CompressFormat.PNG else Bitmap.CompressFormat.JPEG
+                    image.compress(format, quality, outputStream)
+                    val width = image.width
+                    val height = image.height
+                    if (image !== bitmap) {
+                        image.recycle()
+                    }
                     bitmap!!.recycle()
-                    Base64.encodeToString(bytes, Base64.NO_WRAP)
+                    Screenshot(
+                        outputStream.toByteArray(),
+                        width,
+                        height,
+                        if (png) "image/png" else "image/jpeg"
+                    )
                 } else {
                     null
                 }
@@ -309,4 +399,24 @@ class AutoGLMAccessibilityService : AccessibilityService() {
             null
         }
     }
+
+    private fun scaleToMaxEdge(bitmap: Bitmap, maxEdge: Int): Bitmap {
+        val longEdge = maxOf(bitmap.width, bitmap.height)
+        if (maxEdge <= 0 || longEdge <= maxEdge) {
+            return bitmap
+        }
+        val ratio = maxEdge.toFloat() / longEdge
+        // 硬件位图不能直接缩放，先复制到软件位图
+        val software = bitmap.copy(Bitmap.Config.ARGB_8888, false)
+        val scaled = Bitmap.createScaledBitmap(
+            software,
+            maxOf(1, (bitmap.width * ratio).toInt()),
+            maxOf(1, (bitmap.height * ratio).toInt()),
+            true
+        )
+        if (scaled !== software) {
+            software.recycle()
+        }
+        return scaled
+    }
 }
@@ -2,6 +2,7 @@ package com.autoglm.helper
 
 import android.util.Log
 import fi.iki.elonen.NanoHTTPD
+import org.json.JSONArray
 import org.json.JSONObject
 import java.io.ByteArrayInputStream
 
@@ -9,6 +10,9 @@ class HttpServer(private val service: AutoGLMAccessibilityService, port: Int = 8
     
     companion object {
         private const val TAG = "AutoGLM-HttpServer"
+        private const val MAX_BATCH_ACTIONS = 20
+        private const val MAX_BATCH_DELAY_MS = 5000L
+        private const val MAX_HIERARCHY_NODES = 5000
     }
 
     override fun serve(session: IHTTPSession): Response {
@@ -20,13 +24,15 @@ class HttpServer(private val service: AutoGLMAccessibilityService, port: Int = 8
         return try {
             when {
                 uri == "/status" && method == Method.GET -> handleStatus()
-                uri == "/screenshot" && method == Method.GET -> handleScreenshot()
+                uri == "/screenshot" && method == Method.GET -> handleScreenshot(session)
                 uri == "/tap" && method == Method.POST -> handleTap(session)
                 uri == "/swipe" && method == Method.POST -> handleSwipe(session)
                 uri == "/input" && method == Method.POST -> handleInput(session)
                 uri == "/back" && method == Method.POST -> handleBack()
                 uri == "/home" && method == Method.POST -> handleHome()
                 uri == "/launch" && method == Method.POST -> handleLaunch(session)
+                uri == "/batch" && method == Method.POST -> handleBatch(session)
+                uri == "/hierarchy" && method == Method.GET -> handleHierarchy(session)
                 else -> newFixedLengthResponse(
                     Response.Status.NOT_FOUND,
                     "application/json",
@@ -57,8 +63,15 @@ class HttpServer(private val service: AutoGLMAccessibilityService, port: Int = 8
         )
     }
 
-    private fun handleScreenshot(): Response {
-        val screenshot = service.takeScreenshotBase64()
+    private fun handleScreenshot(session: IHTTPSession): Response {
+        // 客户端声明接受 image/* 时直接返回二进制图片，省去 Base64 + JSON
+        val accept = session.headers["accept"] ?: ""
+        val maxEdge = session.parameters["max_edge"]?.firstOrNull()?.toIntOrNull() ?: 0
+        if (accept.contains("image/")) {
+            return handleScreenshotBinary(accept, maxEdge)
+        }
+
+        val screenshot = service.takeScreenshotBase64(maxEdge)
         
         return if (screenshot != null) {
             val json = JSONObject()
@@ -84,6 +97,42 @@ class HttpServer(private val service: AutoGLMAccessibilityService, port: Int = 8
         }
     }
 
+    private fun handleScreenshotBinary(accept: String, maxEdge: Int): Response {
+        val png = accept.contains("image/png") && !accept.contains("image/jpeg")
+        val screenshot = service.takeScreenshotBytes(png, maxEdge = maxEdge)
+            ?: return newFixedLengthResponse(
+                Response.Status.INTERNAL_ERROR,
+                "application/json",
+                """{"success": false, "error": "Failed to take screenshot"}"""
+            )
+
+        val response = newFixedLengthResponse(
+            Response.Status.OK,
+            screenshot.mimeType,
+            ByteArrayInputStream(screenshot.bytes),
+            screenshot.bytes.size.toLong()
+        )
+        response.addHeader("X-Image-Width", screenshot.width.toString())
+        response.addHeader("X-Image-Height", screenshot.height.toString())
+        return response
+    }
+
+    private fun handleHierarchy(session: IHTTPSession): Response {
+        val maxNodes = session.parameters["max_nodes"]?.firstOrNull()?.toIntOrNull() ?: 1500
+        val hierarchy = service.dumpHierarchy(maxNodes.coerceIn(1, MAX_HIERARCHY_NODES))
+            ?: return newFixedLengthResponse(
+                Response.Status.INTERNAL_ERROR,
+                "application/json",
+                """{"success": false, "error": "No active window"}"""
+            )
+
+        return newFixedLengthResponse(
+            Response.Status.OK,
+            "application/json",
+            hierarchy.toString()
+        )
+    }
+
     private fun handleTap(session: IHTTPSession): Response {
         val body = getRequestBody(session)
         val json = JSONObject(body)
@@ -187,6 +236,84 @@ class HttpServer(private val service: AutoGLMAccessibilityService, port: Int = 8
         )
     }
 
+    /**
+     * 批量执行动作，一次请求完成 "点击搜索框 → 输入 → 点击搜索" 这类序列
+     *
+     * 请求: {"actions": [{"action": "tap", "x": 1, "y": 2, "delay_ms": 500}, ...],
+     *        "stop_on_failure": true}
+     * delay_ms 是该动作完成后、执行下一个动作前的等待时间
+     */
+    private fun handleBatch(session: IHTTPSession): Response {
+        val body = getRequestBody(session)
+        val json = JSONObject(body)
+        val actions = json.getJSONArray("actions")
+        val stopOnFailure = json.optBoolean("stop_on_failure", true)
+
+        if (actions.length() > MAX_BATCH_ACTIONS) {
+            return newFixedLengthResponse(
+                Response.Status.BAD_REQUEST,
+                "application/json",
+                """{"success": false, "error": "Too many actions"}"""
+            )
+        }
+
+        val results = JSONArray()
+        var allSuccess = true
+        for (i in 0 until actions.length()) {
+            val step = actions.getJSONObject(i)
+            val start = System.currentTimeMillis()
+            val success = try {
+                runAction(step)
+            } catch (e: Exception) {
+                Log.e(TAG, "Batch action $i failed", e)
+                false
+            }
+
+            val result = JSONObject()
+            result.put("action", step.optString("action"))
+            result.put("success", success)
+            result.put("elapsed_ms", System.currentTimeMillis() - start)
+            results.put(result)
+
+            if (!success) {
+                allSuccess = false
+                if (stopOnFailure) break
+            }
+            val delay = step.optLong("delay_ms", 0L).coerceIn(0L, MAX_BATCH_DELAY_MS)
+            if (delay > 0 && i < actions.length() - 1) {
+                Thread.sleep(delay)
+            }
+        }
+
+        val response = JSONObject()
+        response.put("success", allSuccess && results.length() == actions.length())
+        response.put("completed", results.length())
+        response.put("results", results)
+
+        return newFixedLengthResponse(
+            Response.Status.OK,
+            "application/json",
+            response.toString()
+        )
+    }
+
+    private fun runAction(step: JSONObject): Boolean {
+        return when (step.getString("action")) {
+            "tap" -> service.performTap(step.getInt("x"), step.getInt("y"))
+            "swipe" -> service.performSwipe(
+                step.getInt("x1"), step.getInt("y1"),
+                step.getInt("x2"), step.getInt("y2"),
+                step.optInt("duration", 300)
+            )
+            "input" -> service.performInput(step.getString("text"))
+            "back" -> service.performBack()
+            "home" -> service.performHome()
+            "launch" -> service.launchApp(step.getString("package"))
+            "wait" -> true
+            else -> false
+        }
+    }
+
     private fun getRequestBody(session: IHTTPSession): String {
         val map = HashMap<String, String>()
         session.parseBody(map)
@@ -0,0 +1,309 @@
+"""
+Open-AutoGLM 混合方案 - 模型输出解析
+
+autoglm_hybrid / autoglm_web / 流式响应共用:
+- IncrementalJSONParser: 单遍扫描，识别字符串和转义，字符串里的括号不影响层级；
+  可以边接收边解析顶层字段
+- extract_json(): 从模型回复 (可能带 markdown 代码块、前后说明文字) 中取出第一个合法的 JSON 对象
+- validate_action(): 按每种操作的参数表校验，坐标统一转成 int，返回结构化错误
+- parse_action(): 以上两步的组合，失败时给出 wait 和错误列表
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+COORD = "coord"  # 坐标: 接受 int / float / 数字字符串，四舍五入为 int
+INT = "int"
+TEXT = "text"
+
+# 操作 -> {参数: (类型, 是否必需)}
+ACTION_SCHEMAS: Dict[str, Dict[str, Tuple[str, bool]]] = {
+    "tap": {"x": (COORD, True), "y": (COORD, True)},
+    "swipe": {"x1": (COORD, True), "y1": (COORD, True), "x2": (COORD, True), "y2": (COORD, True),
+              "duration": (INT, False)},
+    "tap_text": {"text": (TEXT, True)},
+    "tap_id": {"id": (TEXT, True)},
+    "input": {"text": (TEXT, True)},
+    "launch": {"app": (TEXT, True)},
+    "back": {},
+    "home": {},
+    "done": {},
+    "wait": {},
+}
+
+# 模型常用的别名
+ACTION_ALIASES = {
+    "click": "tap",
+    "press": "tap",
+    "scroll": "swipe",
+    "type": "input",
+    "input_text": "input",
+    "open": "launch",
+    "open_app": "launch",
+    "finish": "done",
+    "complete": "done",
+}
+
+
+class ActionError:
+    """一条解析 / 校验错误"""
+
+    __slots__ = ("code", "message", "field")
+
+    def __init__(self, code: str, message: str, field: Optional[str] = None):
+        self.code = code        # no_json / invalid_json / unknown_action / missing_param / bad_type
+        self.message = message
+        self.field = field
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "message": self.message, "field": self.field}
+
+    def __repr__(self):
+        return f"ActionError({self.code}: {self.message})"
+
+    def __str__(self):
+        return self.message
+
+
+class ParsedAction:
+    """parse_action 的结果"""
+
+    def __init__(self, action: str, params: dict, thought: str = "",
+                 raw: Optional[dict] = None, errors: Optional[List[ActionError]] = None):
+        self.action = action
+        self.params = params
+        self.thought = thought
+        self.raw = raw or {}
+        self.errors = errors or []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        """转成代理使用的 {"action", "params", "thought"}，保留 plan / actions 等其他字段"""
+        result = {k: v for k, v in self.raw.items() if k not in ("action", "params", "thought")}
+        result.update(action=self.action, params=self.params, thought=self.thought)
+        return result
+
+
+class IncrementalJSONParser:
+    """
+    增量解析第一个顶层 JSON 对象
+
+    每个顶层字段的值结束 (遇到同层的 , 或 }) 时立即解析到 fields；
+    对象之前的 markdown 代码块标记等内容会被跳过。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.complete = False
+        self.start = -1  # 对象在 buffer 中的起止位置
+        self.end = -1
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = "start"  # start / key / key_string / colon / value
+        self._key_start = 0
+        self._key = None
+        self._value_start = 0
+
+    def feed(self, text: str) -> dict:
+        """追加一段文本，返回目前已经完整的字段"""
+        self.buffer += text
+        if not self.complete:
+            self._scan()
+        return self.fields
+
+    def has(self, *keys) -> bool:
+        return all(key in self.fields for key in keys)
+
+    def object_text(self) -> Optional[str]:
+        """完整对象的原文"""
+        return self.buffer[self.start:self.end] if self.complete else None
+
+    def _scan(self):
+        buf = self.buffer
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            c = buf[i]
+            if self._state == "start":
+                i = buf.find("{", i)
+                if i == -1:
+                    i = n
+                    break
+                self.start = i
+                self._depth = 1
+                self._state = "key"
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._state == "key_string":
+                        try:
+                            self._key = json.loads(buf[self._key_start:i + 1])
+                        except ValueError:
+                            self._key = None  # 键不合法，跳过该字段
+                        self._state = "colon"
+            elif c == '"':
+                self._in_string = True
+                if self._depth == 1 and self._state == "key":
+                    self._key_start = i
+                    self._state = "key_string"
+            elif c == ":" and self._depth == 1 and self._state == "colon":
+                self._state = "value"
+                self._value_start = i + 1
+            elif c == "{" or c == "[":
+                self._depth += 1
+            elif c == "}" or c == "]":
+                self._depth -= 1
+                if self._depth == 0:
+                    if self._state == "value":
+                        self._finish_value(buf[self._value_start:i])
+                    self.complete = True
+                    self.end = i + 1
+                    self._pos = i + 1
+                    return
+            elif c == "," and self._depth == 1 and self._state == "value":
+                self._finish_value(buf[self._value_start:i])
+                self._state = "key"
+            i += 1
+        self._pos = i
+
+    def _finish_value(self, text: str):
+        if self._key is None:
+            return
+        try:
+            self.fields[self._key] = json.loads(text)
+        except ValueError:
+            pass  # 值不合法时忽略该字段，由完整解析兜底
+
+
+def extract_json(text: str) -> Tuple[Optional[dict], Optional[ActionError]]:
+    """
+    取出文本中第一个能解析的 JSON 对象
+
+    Returns:
+        (对象, None) 或 (None, 错误)
+    """
+    stripped = text.strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        # 常见情况: 回复本身就是一个 JSON 对象，直接解析
+        try:
+            obj = json.loads(stripped)
+            if isinstance(obj, dict):
+                return obj, None
+        except ValueError:
+            pass
+
+    error = ActionError("no_json", "响应中没有 JSON 对象")
+    offset = 0
+    while True:
+        start = text.find("{", offset)
+        if start == -1:
+            return None, error
+        parser = IncrementalJSONParser()
+        parser.feed(text[start:])
+        if not parser.complete:
+            if error.code == "no_json":
+                error = ActionError("invalid_json", "JSON 对象不完整")
+            return None, error
+        try:
+            obj = json.loads(parser.object_text())
+            if isinstance(obj, dict):
+                return obj, None
+        except ValueError as e:
+            error = ActionError("invalid_json", f"JSON 格式错误: {e}")
+        # 这一段不是合法 JSON (比如说明文字里的 {xx})，从下一个 { 继续找
+        offset = start + 1
+
+
+def _coerce(value, kind: str):
+    if kind == TEXT:
+        if isinstance(value, (dict, list)) or value is None:
+            raise ValueError("应为文字")
+        return str(value)
+    if isinstance(value, bool):
+        raise ValueError("应为数字")
+    if isinstance(value, str):
+        value = value.strip().rstrip("px").strip()
+    number = float(value)
+    if number != number or number in (float("inf"), float("-inf")):
+        raise ValueError("应为有限数字")
+    return int(round(number))
+
+
+def validate_action(obj: dict) -> Tuple[Optional[dict], List[ActionError]]:
+    """
+    按 ACTION_SCHEMAS 校验一个操作
+
+    接受 {"action": "tap", "params": {"x": "540", "y": 150.4}}，
+    也接受参数直接写在顶层的 {"action": "tap", "x": 540, "y": 150}。
+
+    Returns:
+        ({"action", "params"}, []) 或 (None, 错误列表)
+    """
+    if not isinstance(obj, dict):
+        return None, [ActionError("bad_type", "操作应为 JSON 对象")]
+    name = obj.get("action")
+    if not isinstance(name, str):
+        return None, [ActionError("missing_param", "缺少 action 字段", "action")]
+    name = name.strip().lower()
+    name = ACTION_ALIASES.get(name, name)
+    schema = ACTION_SCHEMAS.get(name)
+    if schema is None:
+        return None, [ActionError("unknown_action", f"未知操作: {obj.get('action')}", "action")]
+
+    raw_params = obj.get("params")
+    if raw_params is None:
+        raw_params = {}
+    if not isinstance(raw_params, dict):
+        return None, [ActionError("bad_type", "params 应为 JSON 对象", "params")]
+
+    params, errors = {}, []
+    for key, (kind, required) in schema.items():
+        value = raw_params.get(key, obj.get(key))
+        if value is None:
+            if required:
+                errors.append(ActionError("missing_param", f"{name} 缺少参数 {key}", key))
+            continue
+        try:
+            params[key] = _coerce(value, kind)
+        except (TypeError, ValueError) as e:
+            errors.append(ActionError("bad_type", f"{name} 参数 {key}={value!r} {e}", key))
+    if errors:
+        return None, errors
+    return {"action": name, "params": params}, []
+
+
+def parse_action(text: str) -> ParsedAction:
+    """
+    解析模型回复
+
+    plan / actions 列表原样保留在 raw 中，由调用方逐个 validate_action；
+    解析或校验失败时返回 wait，错误放在 errors 中。
+    """
+    obj, error = extract_json(text)
+    if obj is None:
+        return ParsedAction("wait", {}, f"无法解析响应: {error}", errors=[error])
+
+    thought = obj.get("thought", "")
+    thought = thought if isinstance(thought, str) else str(thought)
+    if isinstance(obj.get("plan"), list) or isinstance(obj.get("actions"), list):
+        if "action" not in obj:
+            return ParsedAction("wait", {}, thought, raw=obj)
+
+    step, errors = validate_action(obj)
+    if errors:
+        detail = "; ".join(str(e) for e in errors)
+        return ParsedAction("wait", {}, f"操作无效: {detail}", raw=obj, errors=errors)
+    return ParsedAction(step["action"], step["params"], thought, raw=obj)
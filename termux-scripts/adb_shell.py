@@ -0,0 +1,222 @@
+"""
+Open-AutoGLM 混合方案 - 常驻 ADB Shell 会话
+
+LADB 模式下每个动作都启动一次 `adb -s ... shell input ...`，
+fork/exec + adb 握手要几百毫秒。这里保持一个长期运行的 `adb shell`，
+命令通过 stdin 发送，每条命令后追加结束标记，按标记切分输出和退出码:
+- 会话意外退出时下一条命令前自动重连
+- 命令超时后丢弃会话 (输出已错位)，下次重新建立
+
+AUTOGLM_ADB_PERSISTENT=0 可关闭，回到每条命令一个进程。
+
+截图走 `adb exec-out screencap`，直接从 stdout 读到内存:
+- 默认 PNG
+- AUTOGLM_ADB_RAW_SCREENCAP=1 时读取原始帧缓冲 (设备端省掉 PNG 压缩，
+  传输数据更大，适合 USB / 本机 LADB)，用 Image.frombuffer 零拷贝解析
+"""
+
+import os
+import queue
+import shlex
+import struct
+import subprocess
+import threading
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+from PIL import Image
+
+ADB_PERSISTENT = os.getenv("AUTOGLM_ADB_PERSISTENT", "1") != "0"
+ADB_RAW_SCREENCAP = os.getenv("AUTOGLM_ADB_RAW_SCREENCAP", "0") == "1"
+
+# screencap 原始格式 (android PixelFormat) -> (PIL 模式, 每像素字节数)
+# 只列出 frombuffer 可以直接共享内存的格式
+RAW_FORMATS = {
+    1: ("RGBA", 4),  # RGBA_8888
+    2: ("RGBX", 4),  # RGBX_8888
+}
+
+_MARKER = "__AUTOGLM_END__"
+
+
+class AdbShellError(Exception):
+    """会话建立失败、断开或命令超时"""
+
+
+class AdbShellSession:
+    """单台设备上的常驻 adb shell（线程安全，命令串行执行）"""
+
+    def __init__(self, serial: Optional[str] = None, adb: str = "adb"):
+        """
+        Args:
+            serial: 设备序列号，None 表示 adb 默认设备
+            adb: adb 可执行文件
+        """
+        self.serial = serial
+        self.adb = adb
+        self.process: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.commands = 0
+        self.sessions = 0
+
+    def _argv(self) -> List[str]:
+        argv = [self.adb]
+        if self.serial:
+            argv += ["-s", self.serial]
+        return argv + ["shell"]
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _start(self):
+        try:
+            self.process = subprocess.Popen(
+                self._argv(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, bufsize=0
+            )
+        except OSError as e:
+            self.process = None
+            raise AdbShellError(f"无法启动 adb shell: {e}")
+        self.sessions += 1
+        # 后台线程按行读取输出，主线程按超时取
+        self._lines = queue.Queue()
+        threading.Thread(target=self._reader, args=(self.process.stdout, self._lines),
+                         daemon=True).start()
+
+    @staticmethod
+    def _reader(stream, lines: queue.Queue):
+        for line in iter(stream.readline, b""):
+            lines.put(line)
+        lines.put(None)  # EOF
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def run(self, args, timeout: float = 5) -> Tuple[int, str]:
+        """
+        在会话中执行一条命令
+
+        Args:
+            args: 参数列表 (会逐个转义) 或已经拼好的 shell 命令字符串
+            timeout: 等待结束标记的超时 (秒)
+
+        Returns:
+            (退出码, stdout + stderr 输出)
+        """
+        command = args if isinstance(args, str) else " ".join(shlex.quote(str(a)) for a in args)
+        with self._lock:
+            if not self.alive:
+                self._close()
+                self._start()
+            self._seq += 1
+            marker = f"{_MARKER}{self._seq}"
+            script = f"{{ {command}\n}} 2>&1 </dev/null; printf '\\n{marker} %d\\n' $?\n"
+            try:
+                self.process.stdin.write(script.encode())
+            except OSError:
+                # 写入失败说明命令没有发出去，重连后重试一次是安全的
+                self._close()
+                self._start()
+                self.process.stdin.write(script.encode())
+            self.commands += 1
+            return self._read_until(marker, timeout)
+
+    def _read_until(self, marker: str, timeout: float) -> Tuple[int, str]:
+        output = []
+        prefix = marker.encode() + b" "
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout)
+            except queue.Empty:
+                self._close()
+                raise AdbShellError(f"命令超时 ({timeout}s)")
+            if line is None:
+                self._close()
+                raise AdbShellError("adb shell 会话已断开")
+            if line.startswith(prefix):
+                break
+            output.append(line)
+        code = int(line[len(prefix):].strip() or b"-1")
+        text = b"".join(output).decode("utf-8", errors="replace")
+        # 去掉结束标记前补的换行
+        if text.endswith("\n"):
+            text = text[:-1]
+        return code, text
+
+    def check(self, args, timeout: float = 5) -> bool:
+        """执行命令，返回是否成功 (退出码为 0)"""
+        code, _ = self.run(args, timeout)
+        return code == 0
+
+    def stats(self) -> dict:
+        return {"commands": self.commands, "reconnects": max(0, self.sessions - 1)}
+
+
+def parse_raw_screencap(data: bytes) -> Image.Image:
+    """
+    解析 `screencap` (不带 -p) 的输出
+
+    头部为小端 width, height, format，Android 9 起多一个 colorspace 字段 (共 16 字节)，
+    用数据长度判断头部大小。返回的图片直接引用 data 的内存。
+    """
+    if len(data) < 12:
+        raise ValueError(f"screencap 数据过短: {len(data)} 字节")
+    width, height, pixel_format = struct.unpack_from("<III", data)
+    if pixel_format not in RAW_FORMATS:
+        raise ValueError(f"不支持的 screencap 像素格式: {pixel_format}")
+    mode, bpp = RAW_FORMATS[pixel_format]
+    header = len(data) - width * height * bpp
+    if header not in (12, 16):
+        raise ValueError(f"screencap 数据长度不匹配: {width}x{height}, {len(data)} 字节")
+    pixels = memoryview(data)[header:]
+    return Image.frombuffer(mode, (width, height), pixels, "raw", mode, 0, 1)
+
+
+def screencap(serial: Optional[str] = None, raw: bool = ADB_RAW_SCREENCAP,
+              timeout: float = 10, adb: str = "adb") -> Image.Image:
+    """
+    通过 `adb exec-out screencap` 截图，不落盘、一个进程
+
+    Args:
+        serial: 设备序列号
+        raw: 读取原始帧缓冲而不是 PNG
+        timeout: 超时 (秒)
+
+    Returns:
+        PIL.Image，失败抛出 AdbShellError
+    """
+    argv = [adb] + (["-s", serial] if serial else []) + ["exec-out", "screencap"]
+    if not raw:
+        argv.append("-p")
+    try:
+        result = subprocess.run(argv, capture_output=True, timeout=timeout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise AdbShellError(f"screencap 失败: {e}")
+    if result.returncode != 0 or not result.stdout:
+        raise AdbShellError(f"screencap 失败: {result.stderr.decode(errors='replace').strip()}")
+    try:
+        if raw:
+            return parse_raw_screencap(result.stdout)
+        image = Image.open(BytesIO(result.stdout))
+        image.load()
+        return image
+    except (OSError, ValueError) as e:
+        raise AdbShellError(f"截图数据无法解析: {e}")
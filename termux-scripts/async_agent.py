@@ -0,0 +1,465 @@
+"""
+Open-AutoGLM 混合方案 - asyncio 代理引擎
+
+把截图、模型调用、执行、等待屏幕稳定放进事件循环:
+- Helper / 模型的阻塞调用在线程池里执行，事件循环保持响应
+- 动作执行后立即开始等待屏幕稳定，同时处理历史记录、帧缓存和日志
+- stop() 可以从任意线程取消正在进行的模型调用
+- 规划模式下按计划连续执行，只在检查点或屏幕偏离预期时重新询问模型
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import tracing
+from frame_cache import FrameFingerprint
+from local_resolver import ResolveContext
+from trajectory import TrajectoryRecorder
+
+# 这些操作执行后屏幕应该有变化，没变化说明计划偏离
+PLAN_CHANGING_ACTIONS = ("tap", "tap_text", "tap_id", "swipe", "input", "back", "home", "launch")
+# 标记 same_page 的操作后，变化块比例超过该值视为跳到了其他页面
+PLAN_PAGE_CHANGE = float(os.getenv("AUTOGLM_PLAN_PAGE_CHANGE", "0.35"))
+
+# 独立线程池: asyncio.run 退出时不会等待被取消的模型请求跑完
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("AUTOGLM_THREADS", "8")),
+                               thread_name_prefix="autoglm")
+
+
+def configure_executor(max_workers: int):
+    """调整阻塞调用线程池大小（多设备并发时需要更多线程）"""
+    global _executor
+    old, _executor = _executor, ThreadPoolExecutor(max_workers=max_workers,
+                                                   thread_name_prefix="autoglm")
+    old.shutdown(wait=False)
+
+
+async def in_thread(func, *args, **kwargs):
+    """在线程池中执行阻塞调用 (带上当前上下文，耗时追踪记到同一个 Tracer)"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(ctx.run, func, *args, **kwargs))
+
+
+class AsyncHelperClient:
+    """PhoneController 的异步包装，共享同一个连接池"""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    async def screenshot(self):
+        return await in_thread(self.controller.screenshot)
+
+    async def call(self, method: str, *args):
+        """异步调用控制器方法，如 call("tap", x, y)"""
+        return await in_thread(getattr(self.controller, method), *args)
+
+
+class AsyncModelClient:
+    """视觉模型的异步包装，取消时立即返回，后台请求结果被丢弃"""
+
+    def __init__(self, model, limiter=None):
+        """
+        Args:
+            model: DoubaoVisionModel 或兼容对象
+            limiter: 可选的异步上下文管理器，多个代理共享以限制模型 API 调用速率
+        """
+        self.model = model
+        self.limiter = limiter
+        self.in_flight = 0
+        self.calls = 0
+
+    async def analyze_screen(self, image, task: str, history: list) -> dict:
+        if self.limiter is None:
+            return await self._call(image, task, history)
+        async with self.limiter:
+            return await self._call(image, task, history)
+
+    async def analyze_tree(self, tree, task: str, history: list) -> Optional[dict]:
+        """只发控件列表，模型要求截图时返回 None"""
+        if self.limiter is None:
+            return await self._call_text(tree, task, history)
+        async with self.limiter:
+            return await self._call_text(tree, task, history)
+
+    async def _call_text(self, tree, task: str, history: list) -> Optional[dict]:
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            return await in_thread(self.model.analyze_tree, tree, task, history)
+        finally:
+            self.in_flight -= 1
+
+    async def _call(self, image, task: str, history: list) -> dict:
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            return await in_thread(self.model.analyze_screen, image, task, history)
+        finally:
+            self.in_flight -= 1
+
+
+class AsyncAgentEngine:
+    """AutoGLMAgent 的异步执行引擎"""
+
+    def __init__(self, agent, model_limiter=None):
+        """
+        Args:
+            agent: AutoGLMAgent，提供 controller / model / frame_cache / decision_cache /
+                   trajectories / resolvers / settle / history / max_steps / _execute_action
+            model_limiter: 传给 AsyncModelClient 的共享限速器
+        """
+        self.agent = agent
+        self.helper = AsyncHelperClient(agent.controller)
+        self.model = AsyncModelClient(agent.model, model_limiter)
+        self.step_latencies = []  # 最近一次任务每步耗时 (秒)
+        self.model_calls = 0      # 最近一次任务的模型调用次数
+        self.planned_steps = 0    # 最近一次任务中按计划执行 (未调用模型) 的步数
+        self.plan_divergences = 0
+        self.replayed_steps = 0   # 最近一次任务中按录制的轨迹回放的步数
+        self.replay_diverged = False
+        self.resolved_steps = 0   # 最近一次任务中由本地解析器给出 (未调用模型) 的步数
+        self.text_calls = 0       # 最近一次任务中只发控件列表的模型调用
+        self.text_fallbacks = 0   # 其中模型要求截图、改发截图的次数
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """停止当前任务（线程安全），正在等待的模型调用会被取消"""
+        with self._lock:
+            if self._loop is not None and self._task is not None:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+
+    async def run(self, task: str) -> bool:
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.current_task()
+        self.step_latencies = []
+        self.planned_steps = 0
+        self.plan_divergences = 0
+        self.replayed_steps = 0
+        self.replay_diverged = False
+        self.resolved_steps = 0
+        self.text_calls = 0
+        self.text_fallbacks = 0
+        calls_before = self.model.calls
+        try:
+            return await self._run_steps(task)
+        except asyncio.CancelledError:
+            print("\n⏹ 任务已停止")
+            return False
+        finally:
+            self.model_calls = self.model.calls - calls_before
+            with self._lock:
+                self._loop = None
+                self._task = None
+
+    async def _run_steps(self, task: str) -> bool:
+        agent = self.agent
+        consecutive_failures = 0
+        last_action = None
+        screenshot = None  # 上一步等待屏幕稳定时拿到的最新帧
+        plan = []          # 规划模式下还没执行的计划动作
+        pending_check = None  # (刚执行的计划动作, 执行前的帧)，用于检查是否偏离
+        pending_verify = None  # (刚执行的决策, 执行前的帧, 缓存条目 id, 是否成功)，用于决策缓存
+        plan_hint = None
+        # 录制的轨迹: 按步回放，屏幕不一致时交给模型
+        trajectory = agent.trajectories.load(task) if agent.trajectories is not None else None
+        replay = list(trajectory.steps) if trajectory else []
+        if replay:
+            print(f"⏩ 找到录制的轨迹: {len(replay)} 步，录制时用时 {trajectory.duration:.1f}s")
+        recorder = TrajectoryRecorder()
+
+        for step in range(1, agent.max_steps + 1):
+            print(f"\n🔄 步骤 {step}/{agent.max_steps}")
+            step_start = time.monotonic()
+            step_span = tracing.current().begin("step", step=step)
+
+            # 1. 截图
+            if screenshot is None:
+                print("  📸 截取屏幕...")
+                screenshot = await self.helper.screenshot()
+            if screenshot is None:
+                print("  ❌ 截图失败")
+                consecutive_failures += 1
+                if consecutive_failures >= 3:
+                    print("\n❌ 连续截图失败，请检查 AutoGLM Helper")
+                    step_span.end()
+                    return False
+                await asyncio.sleep(2)
+                step_span.end()
+                continue
+
+            consecutive_failures = 0
+
+            # 2. 分析（按计划执行；屏幕没变时复用上一步决策）
+            with tracing.span("agent.fingerprint"):
+                frame = FrameFingerprint(screenshot)
+            if pending_verify is not None:
+                self._verify_decision(task, pending_verify, frame)
+                pending_verify = None
+            if pending_check is not None:
+                executed, before = pending_check
+                pending_check = None
+                reason = self._plan_diverged(executed, before, frame)
+                if reason:
+                    print(f"  🔀 计划偏离: {reason}，重新分析")
+                    self.plan_divergences += 1
+                    plan_hint = {'action': 'plan_diverged', 'thought': f'计划执行偏离: {reason}'}
+                    plan = []
+                elif executed.get('checkpoint'):
+                    print("  🚩 到达检查点，重新分析")
+                    plan = []
+
+            from_replay = False
+            if replay:
+                expected = replay.pop(0)
+                if expected.matches(frame):
+                    from_replay = True
+                else:
+                    print("  🔀 屏幕与录制的轨迹不一致，交给模型")
+                    self._abandon_replay(replay)
+                    replay = []
+                    plan_hint = {'action': 'replay_diverged',
+                                 'thought': '前面的步骤按录制的轨迹执行，当前屏幕与录制时不同，请根据当前屏幕继续'}
+
+            from_plan = bool(plan) and not from_replay
+            scripted = from_plan or from_replay  # 不经过模型的动作
+            cached = None
+            pending = None
+            replayed = None  # 决策缓存条目 id
+            if from_replay:
+                result = expected.decision()
+                self.replayed_steps += 1
+                print(f"  ⏩ 按轨迹回放 (剩余 {len(replay)} 步)")
+            elif from_plan:
+                result = plan.pop(0)
+                self.planned_steps += 1
+                print(f"  📋 按计划执行，预期: {result.get('expect', '')} (剩余 {len(plan)} 步)")
+            else:
+                with tracing.span("agent.cache_lookup"):
+                    unchanged, cached = agent.frame_cache.lookup(frame)
+                    if cached is None and not unchanged and agent.decision_cache is not None:
+                        replayed, decision = agent.decision_cache.lookup(task, frame)
+                if replayed is not None:
+                    print("  📚 命中决策缓存，跳过模型调用")
+                    result = decision
+                if cached is not None:
+                    print("  ♻️ 屏幕未变化，复用上一步决策")
+                    result = cached
+                elif replayed is None:
+                    print("  🤔 分析屏幕...")
+                    history = agent.history
+                    if unchanged:
+                        history = history + [{
+                            'action': 'screen_unchanged',
+                            'thought': '上一步操作后屏幕没有变化，可能没有生效，请换一种方式'
+                        }]
+                    if plan_hint is not None:
+                        history = history + [plan_hint]
+                        plan_hint = None
+                    # 本地解析 -> 纯文字 -> 截图，控件树在同一步内只取一次
+                    ctx = ResolveContext(task, screenshot, history, agent.controller.ui_tree)
+                    result = None
+                    if agent.resolvers is not None and not unchanged:
+                        with tracing.span("agent.resolve"):
+                            result = await in_thread(agent.resolvers.resolve, ctx)
+                        if result is not None:
+                            self.resolved_steps += 1
+                            self._add_model_params(result, screenshot.size)
+                            print(f"  🧩 {result['thought']}，跳过模型调用")
+                    if result is None and agent.text_first:
+                        result = await self._analyze_text(ctx)
+                    if result is None:
+                        with tracing.span("agent.model"):
+                            result = await self.model.analyze_screen(screenshot, task, history)
+                    plan = list(result.get('plan') or [])
+                    # 流式响应提前返回时，thought 还在接收
+                    pending = result.pop('pending', None)
+
+            action = result.get('action', 'wait')
+            params = result.get('params', {})
+            thought = result.get('thought', '')
+            if from_plan and not thought:
+                thought = f"计划: {result.get('expect', '')}"
+
+            # 检测重复操作（复用的决策、计划内和回放的动作是有意为之，不算重复）
+            current_action = f"{action}:{params}"
+            repeated = (current_action == last_action and action not in ['done', 'wait']
+                        and cached is None and not scripted)
+            if repeated:
+                plan = []
+                action = 'wait'
+            last_action = current_action
+
+            entry = {
+                'step': step,
+                'action': action,
+                'params': result.get('model_params', params),
+                'thought': thought
+            }
+            agent.history.append(entry)
+
+            # 3. 执行
+            t0 = time.monotonic()
+            with tracing.span("agent.execute", action=action):
+                success = await in_thread(agent._execute_action, action, params)
+            action_time = time.monotonic() - t0
+
+            if action == 'done':
+                if pending is not None:
+                    await self._complete_thought(pending, result, entry)
+                if agent.decision_cache is not None and not scripted and cached is None:
+                    # 任务结束，没有下一帧可以验证，完成判断直接记录
+                    self._verify_decision(task, (result, frame, replayed, success), None)
+                self.step_latencies.append(time.monotonic() - step_start)
+                step_span.end()
+                recorder.record(frame, result, action, params, self.step_latencies[-1])
+                self._save_trajectory(task, trajectory, recorder)
+                self._log_step(result, thought, action, params, repeated, success, action_time)
+                print("\n✅ 任务完成!")
+                return True
+
+            # 4. 立即开始等待屏幕稳定，同时做记录和日志
+            # 批量动作按最后一个动作的类型等待
+            settle_action = params['actions'][-1]['action'] if action == 'batch' else action
+            settle_job = asyncio.create_task(in_thread(agent.settle.wait, settle_action))
+            if cached is None and not scripted:
+                agent.frame_cache.store(frame, dict(result, action=action))
+                if agent.decision_cache is not None and not repeated:
+                    pending_verify = (result, frame, replayed, success)
+            if from_replay and not success:
+                print("  🔀 回放的操作执行失败，交给模型")
+                self._abandon_replay(replay)
+                replay = []
+            model_result = cached is None and not scripted and replayed is None
+            self._log_step(result if model_result else None, thought, action,
+                           params, repeated, success, action_time)
+            if plan:
+                if success:
+                    pending_check = (result, frame)
+                else:
+                    print("  🔀 计划中的操作执行失败，重新分析")
+                    self.plan_divergences += 1
+                    plan = []
+
+            if pending is not None:
+                await self._complete_thought(pending, result, entry)
+            with tracing.span("agent.settle_wait"):
+                screenshot, waited = await settle_job
+            self.step_latencies.append(time.monotonic() - step_start)
+            step_span.end()
+            if success and not repeated:
+                recorder.record(frame, result, action, params, self.step_latencies[-1])
+            print(f"  ⏱️ 等待屏幕稳定 {waited:.1f}s")
+
+        print("\n⚠️ 达到最大步数限制")
+        return False
+
+    async def _analyze_text(self, ctx: ResolveContext) -> Optional[dict]:
+        """纯文字优先: 控件树可用时先只发控件列表，不行再由调用方发截图"""
+        tree = await in_thread(lambda: ctx.tree)
+        if tree is None or not len(tree):
+            return None
+        print(f"  🔤 控件列表 ({len(tree)} 个控件)")
+        self.text_calls += 1
+        with tracing.span("agent.text_model"):
+            result = await self.model.analyze_tree(tree, ctx.task, ctx.history)
+        if result is None:
+            self.text_fallbacks += 1
+        else:
+            self._add_model_params(result, ctx.screenshot.size)
+        return result
+
+    def _add_model_params(self, result: dict, device_size: tuple):
+        """
+        不经过截图的决策给的是设备像素，换算成模型看到的图片坐标
+
+        历史、轨迹和决策缓存里的 model_params 都和截图决策在同一个坐标系，
+        模型在后面的步骤里看到的是同一张缩放后的图。
+        """
+        preparer = getattr(self.agent.model, 'image_preparer', None)
+        params = result.get('params', {})
+        result['model_params'] = preparer.to_model(params, device_size) if preparer else params
+
+    async def _complete_thought(self, pending, result: dict, entry: dict):
+        """
+        等流式响应接收完，把完整的 thought 补进这一步的历史记录
+
+        entry 是这一步追加的记录；执行动作时可能又追加了提示 (如 search_app)，不能写到 history[-1]
+        """
+        with tracing.span("agent.thought_wait"):
+            final = await asyncio.wrap_future(pending)
+        thought = final.get('thought', '')
+        result['thought'] = thought
+        entry['thought'] = thought
+        print(f"  💭 {thought}")
+
+    def _abandon_replay(self, remaining: list):
+        self.replay_diverged = True
+        if remaining:
+            print(f"  ⏹ 放弃剩余 {len(remaining)} 步轨迹")
+
+    def _save_trajectory(self, task: str, trajectory, recorder: TrajectoryRecorder):
+        """任务成功后保存轨迹；完整回放的只更新回放次数"""
+        store = self.agent.trajectories
+        if store is None:
+            return
+        if trajectory is not None and not self.replay_diverged \
+                and self.replayed_steps == len(trajectory.steps):
+            trajectory.replays += 1
+            store.save(trajectory)
+            print(f"⏩ 轨迹完整回放，用时 {time.monotonic() - recorder.started:.1f}s "
+                  f"(录制时 {trajectory.duration:.1f}s)")
+            return
+        store.save(recorder.finish(task))
+        print(f"💾 已录制轨迹: {len(recorder.steps)} 步")
+
+    def _verify_decision(self, task: str, executed: tuple, after: Optional[FrameFingerprint]):
+        """
+        动作执行后检查屏幕是否变化: 模型的决策验证通过后写入决策缓存，
+        重放的决策没有生效则删除
+
+        after 为 None 表示任务已完成 (done)，只要执行成功就算通过。
+        """
+        result, before, entry_id, success = executed
+        cache = self.agent.decision_cache
+        changed = success and (after is None or after.diff(before) > self.agent.frame_cache.threshold)
+        if entry_id is None:
+            if changed:
+                cache.store(task, before, result)
+        elif changed:
+            cache.confirm(entry_id)
+        else:
+            print("  🗑️ 缓存的决策没有生效，已从决策缓存删除")
+            cache.invalidate(entry_id)
+
+    def _plan_diverged(self, executed: dict, before: FrameFingerprint,
+                       after: FrameFingerprint) -> Optional[str]:
+        """按计划动作的预期检查屏幕，偏离时返回原因"""
+        diff = after.diff(before)
+        expect = executed.get('expect', '')
+        if executed.get('action') in PLAN_CHANGING_ACTIONS and diff <= self.agent.frame_cache.threshold:
+            return f"{executed['action']} 后屏幕没有变化 (预期: {expect})"
+        if executed.get('same_page') and diff > PLAN_PAGE_CHANGE:
+            return f"屏幕变化 {diff:.0%}，离开了当前页面 (预期: {expect})"
+        return None
+
+    def _log_step(self, result, thought, action, params, repeated, success, action_time):
+        if result is not None:
+            print(f"  解析结果: {result}")
+        if thought:
+            print(f"  💭 {thought}")
+        print(f"  🎯 {action}: {params}")
+        if repeated:
+            print("  ⚠️ 检测到重复操作，改为等待")
+        if not success and action not in ['wait', 'done']:
+            print("  ⚠️ 操作执行失败")
+        print(f"  ⚡ 执行耗时 {action_time:.2f}s")
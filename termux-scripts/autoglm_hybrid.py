@@ -10,14 +10,14 @@ Open-AutoGLM 混合方案 - 独立运行脚本 v1.1
 - 任务完成检测优化
 """
 
+import asyncio
 import os
 import sys
-import base64
 import requests
 import time
-import json
-import re
-from io import BytesIO
+import threading
+from concurrent.futures import Future
+from typing import Optional
 
 try:
     from PIL import Image
@@ -25,11 +25,37 @@ except ImportError:
     print("请安装 Pillow: pip install pillow")
     sys.exit(1)
 
+import tracing
+from helper_transport import get_transport, request_not_sent
+from image_prep import ImagePreparer
+from frame_cache import FrameCache
+from decision_cache import DECISION_CACHE, DecisionCache
+from trajectory import REPLAY, TrajectoryStore
+from ui_tree import UITree
+from local_resolver import LOCAL_RESOLVE, ResolverChain, default_chain
+from settle import SETTLE_PREVIEW_EDGE, SettleDetector
+from async_agent import AsyncAgentEngine
+from model_stream import iter_sse_deltas
+from action_parser import IncrementalJSONParser, extract_json, parse_action, validate_action
+from prompt_builder import PromptBuilder, UsageTracker, current_usage, track_usage, usage_call
+
 # ============== 配置 ==============
 DOUBAO_API_KEY = os.getenv("DOUBAO_API_KEY", "")
 DOUBAO_API_URL = os.getenv("DOUBAO_API_URL", "https://ark.cn-beijing.volces.com/api/v3")
 DOUBAO_MODEL = os.getenv("DOUBAO_MODEL", "doubao-seed-1-6-vision-250815")
 HELPER_URL = os.getenv("AUTOGLM_HELPER_URL", "http://localhost:8080")
+MAX_BATCH_ACTIONS = int(os.getenv("AUTOGLM_MAX_BATCH_ACTIONS", "3"))  # 模型一次最多返回几个操作
+MODEL_STREAM = os.getenv("AUTOGLM_MODEL_STREAM", "1") == "1"  # 流式响应，action 完整后立即执行
+PLAN_MODE = os.getenv("AUTOGLM_PLAN_MODE", "0") == "1"  # 规划模式: 一次规划多步，按检查点重新截图
+PLAN_MAX_ACTIONS = int(os.getenv("AUTOGLM_PLAN_MAX_ACTIONS", "5"))
+# 纯文字优先: 先只发控件列表 (不发截图) 询问模型，模型要求截图或控件树不可用时再发截图
+TEXT_FIRST = os.getenv("AUTOGLM_TEXT_FIRST", "0") == "1"
+TEXT_MAX_NODES = int(os.getenv("AUTOGLM_TEXT_MAX_NODES", "120"))
+
+# 批量执行时每个动作后的默认等待 (秒)，给界面响应时间；最后一个动作之后由屏幕稳定检测等待
+BATCH_STEP_DELAYS = {"tap": 0.6, "tap_text": 0.6, "tap_id": 0.6, "swipe": 0.6, "input": 0.3, "back": 0.5, "home": 0.5, "launch": 2.0}
+# 坐标在本地从控件树解析的操作，不能交给 Helper 的 /batch
+LOCAL_ACTIONS = ("tap_text", "tap_id")
 
 # ============== 手机控制器 ==============
 class PhoneController:
@@ -37,13 +63,14 @@ class PhoneController:
     
     def __init__(self, helper_url: str = HELPER_URL):
         self.helper_url = helper_url
+        self.transport = get_transport(helper_url)
         self.screen_width = 1080
         self.screen_height = 2400
     
     def check_connection(self) -> bool:
         """检查连接状态"""
         try:
-            resp = requests.get(f"{self.helper_url}/status", timeout=5)
+            resp = self.transport.get("/status", timeout=5)
             if resp.status_code == 200:
                 data = resp.json()
                 if data.get('accessibility_enabled'):
@@ -60,93 +87,187 @@ class PhoneController:
             print(f"❌ 连接错误: {e}")
         return False
     
+    @tracing.traced("helper.screenshot")
     def screenshot(self) -> Image.Image:
         """截取屏幕，带重试"""
         for attempt in range(3):
             try:
-                resp = requests.get(f"{self.helper_url}/screenshot", timeout=15)
-                if resp.status_code == 200:
-                    data = resp.json()
-                    if data.get('success') and data.get('image'):
-                        image_data = base64.b64decode(data['image'])
-                        img = Image.open(BytesIO(image_data))
-                        self.screen_width, self.screen_height = img.size
-                        return img
+                img = self.transport.screenshot()
+                if img is not None:
+                    self.screen_width, self.screen_height = img.size
+                    return img
             except Exception as e:
                 if attempt < 2:
                     print(f"  截图失败，重试 ({attempt+1}/3)...")
                     time.sleep(1)
         return None
     
+    @tracing.traced("helper.preview")
+    def screenshot_preview(self, max_edge: int = SETTLE_PREVIEW_EDGE) -> Image.Image:
+        """低分辨率截图，用于检测屏幕是否稳定（不重试）"""
+        try:
+            return self.transport.screenshot(max_edge=max_edge)
+        except Exception:
+            return None
+    
+    @tracing.traced("helper.tap")
     def tap(self, x: int, y: int) -> bool:
         """点击指定坐标"""
         # 确保坐标在屏幕范围内
         x = max(0, min(x, self.screen_width))
         y = max(0, min(y, self.screen_height))
         try:
-            resp = requests.post(
-                f"{self.helper_url}/tap",
-                json={'x': x, 'y': y},
-                timeout=5
-            )
-            return resp.status_code == 200 and resp.json().get('success', False)
+            return self.transport.call("/tap", {'x': x, 'y': y})
         except Exception as e:
             print(f"  点击失败: {e}")
         return False
     
+    @tracing.traced("helper.ui_tree")
+    def ui_tree(self) -> Optional[UITree]:
+        """获取当前窗口的控件树，Helper 不支持时返回 None"""
+        try:
+            data = self.transport.hierarchy()
+        except Exception as e:
+            print(f"  获取控件树失败: {e}")
+            return None
+        return UITree.from_json(data) if data else None
+    
+    def tap_text(self, text: str) -> bool:
+        """点击包含该文字 (或描述) 的控件，坐标在本地从控件树解析"""
+        return self._tap_node(text=text)
+    
+    def tap_id(self, resource_id: str) -> bool:
+        """按 resource-id 点击控件"""
+        return self._tap_node(rid=resource_id)
+    
+    def _tap_node(self, text: str = None, rid: str = None) -> bool:
+        tree = self.ui_tree()
+        if tree is None:
+            print("  ⚠️ 无法获取控件树 (Helper 不支持 /hierarchy)")
+            return False
+        point = tree.resolve(text=text, rid=rid)
+        if point is None:
+            print(f"  ⚠️ 控件树中找不到: {text or rid}")
+            return False
+        print(f"  🎯 {text or rid} -> {point}")
+        return self.tap(*point)
+    
+    @tracing.traced("helper.swipe")
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 500) -> bool:
         """滑动"""
         try:
-            resp = requests.post(
-                f"{self.helper_url}/swipe",
-                json={'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'duration': duration},
-                timeout=10
+            return self.transport.call(
+                "/swipe",
+                {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'duration': duration}
             )
-            return resp.status_code == 200 and resp.json().get('success', False)
         except Exception as e:
             print(f"  滑动失败: {e}")
         return False
     
+    @tracing.traced("helper.input")
     def input_text(self, text: str) -> bool:
         """输入文字"""
         try:
-            resp = requests.post(
-                f"{self.helper_url}/input",
-                json={'text': text},
-                timeout=5
-            )
-            return resp.status_code == 200 and resp.json().get('success', False)
+            return self.transport.call("/input", {'text': text})
         except Exception as e:
             print(f"  输入失败: {e}")
         return False
     
+    @tracing.traced("helper.back")
     def back(self) -> bool:
         """返回键"""
         try:
-            resp = requests.post(f"{self.helper_url}/back", timeout=5)
-            return resp.status_code == 200 and resp.json().get('success', False)
+            return self.transport.call("/back")
         except:
             return False
     
+    @tracing.traced("helper.home")
     def home(self) -> bool:
         """主页键"""
         try:
-            resp = requests.post(f"{self.helper_url}/home", timeout=5)
-            return resp.status_code == 200 and resp.json().get('success', False)
+            return self.transport.call("/home")
         except:
             return False
     
+    @tracing.traced("helper.batch")
+    def run_batch(self, steps: list) -> list:
+        """
+        一次请求执行多个动作，Helper 不支持 /batch 时逐个执行
+        
+        Args:
+            steps: [{"action": "tap", "params": {"x": 1, "y": 2}, "delay": 0.6}, ...]
+                   delay 为该动作后的等待 (秒)，默认见 BATCH_STEP_DELAYS
+        
+        Returns:
+            已执行动作的成功情况，某个动作失败后不再执行后面的动作；
+            /batch 请求已发出但没拿到结果 (如超时) 时不知道执行到了哪一步，每个动作都是 None
+        """
+        actions = []
+        for step in steps:
+            action = step['action']
+            params = dict(step.get('params', {}))
+            if action == 'tap':
+                params['x'] = max(0, min(int(params.get('x', 0)), self.screen_width))
+                params['y'] = max(0, min(int(params.get('y', 0)), self.screen_height))
+            delay = step.get('delay', BATCH_STEP_DELAYS.get(action, 0.5))
+            actions.append(dict(params, action=action, delay_ms=int(delay * 1000)))
+        
+        # tap_text / tap_id 要在执行到该步时读取控件树，不能交给 /batch
+        local = any(a['action'] in LOCAL_ACTIONS for a in actions)
+        try:
+            results = None if local else self.transport.batch(actions)
+        except Exception as e:
+            if not request_not_sent(e):
+                # 前面的动作可能已经执行了，重做会重复点击 / 输入
+                print(f"  ⚠️ 批量执行结果未知 (可能已执行一部分): {e}")
+                return [None] * len(actions)
+            print(f"  批量请求未发出，逐个执行: {e}")
+            results = None
+        if results is not None:
+            return [bool(r.get('success')) for r in results]
+        
+        # 旧版 Helper 或包含本地解析的动作: 逐个执行
+        outcomes = []
+        for i, action in enumerate(actions):
+            ok = self._run_step(action)
+            outcomes.append(ok)
+            if not ok:
+                break
+            if i < len(actions) - 1 and action['delay_ms']:
+                with tracing.span("sleep"):
+                    time.sleep(action['delay_ms'] / 1000)
+        return outcomes
+    
+    def _run_step(self, step: dict) -> bool:
+        """执行 /batch 格式的单个动作"""
+        action = step['action']
+        if action == 'tap':
+            return self.tap(int(step['x']), int(step['y']))
+        elif action == 'tap_text':
+            return self.tap_text(step.get('text', ''))
+        elif action == 'tap_id':
+            return self.tap_id(step.get('id', ''))
+        elif action == 'swipe':
+            return self.swipe(int(step['x1']), int(step['y1']), int(step['x2']), int(step['y2']),
+                              int(step.get('duration', 500)))
+        elif action == 'input':
+            return self.input_text(step.get('text', ''))
+        elif action == 'back':
+            return self.back()
+        elif action == 'home':
+            return self.home()
+        elif action == 'launch':
+            return self.launch_app(step['package'])
+        return action == 'wait'
+    
+    @tracing.traced("helper.launch")
     def launch_app(self, package_name: str) -> bool:
         """通过包名启动应用"""
         print(f"  尝试启动: {package_name}")
         
         # 方法1: 尝试通过 HTTP 接口
         try:
-            resp = requests.post(
-                f"{self.helper_url}/launch",
-                json={'package': package_name},
-                timeout=5
-            )
+            resp = self.transport.post("/launch", json={'package': package_name})
             print(f"  HTTP响应: {resp.status_code} - {resp.text[:100]}")
             if resp.status_code == 200 and resp.json().get('success', False):
                 print("  ✅ 通过HTTP启动成功")
@@ -206,10 +327,21 @@ APP_PACKAGES = {
 class DoubaoVisionModel:
     """豆包视觉大模型"""
     
-    def __init__(self):
+    def __init__(self, plan_mode: bool = PLAN_MODE, plan_max_actions: int = PLAN_MAX_ACTIONS):
+        """
+        Args:
+            plan_mode: 规划模式，模型一次返回最多 plan_max_actions 个操作及每步预期的屏幕状态
+        """
         self.api_key = DOUBAO_API_KEY
         self.api_url = DOUBAO_API_URL
         self.model = DOUBAO_MODEL
+        self.plan_mode = plan_mode
+        self.stream = MODEL_STREAM
+        self.plan_max_actions = plan_max_actions
+        self.image_preparer = ImagePreparer()
+        self.last_image_stats = None
+        # system 提示词只在这里生成一次，每次请求逐字节相同，便于服务端前缀缓存
+        self.prompt_builder = PromptBuilder(MAX_BATCH_ACTIONS, plan_mode, plan_max_actions)
         
         if not self.api_key:
             print("❌ 未配置 DOUBAO_API_KEY")
@@ -217,49 +349,17 @@ class DoubaoVisionModel:
     
     def analyze_screen(self, image: Image.Image, task: str, history: list = None) -> dict:
         """分析屏幕截图，返回下一步操作"""
-        width, height = image.size
-        
-        # 将图片转为 base64
-        buffered = BytesIO()
-        image.save(buffered, format="PNG")
-        image_base64 = base64.b64encode(buffered.getvalue()).decode()
+        # 缩放并编码图片，模型看到的是缩放后的尺寸
+        with tracing.span("image.prepare"):
+            prepared = self.image_preparer.prepare(image)
+        self.last_image_stats = prepared.stats()
+        print(f"  🖼️ 图片: {prepared.summary()}")
+        width, height = prepared.width, prepared.height
         
-        # 构建历史记录摘要
-        history_text = ""
-        if history and len(history) > 0:
-            recent = history[-5:]  # 最近5步
-            history_text = "\n【已执行的操作】\n" + "\n".join([
-                f"- {h['thought']}: {h['action']}" for h in recent
-            ])
+        with tracing.span("prompt.build"):
+            messages = self.prompt_builder.build(task, history, width, height, prepared.data_url)
+            estimated = self.prompt_builder.estimate(messages, width, height)
         
-        prompt = f"""分析手机屏幕截图，完成任务：{task}
-{history_text}
-
-屏幕尺寸：{width}x{height}像素
-
-可用操作：
-- launch: 直接启动应用（推荐）{{"app":"应用名"}} 支持：淘宝/京东/微信/支付宝/抖音/拼多多/美团/高德地图/微博/QQ/bilibili/小红书
-- tap: 点击屏幕位置 {{"x":数字,"y":数字}}
-- input: 输入文字 {{"text":"文字"}}
-- swipe: 滑动 {{"x1":起点x,"y1":起点y,"x2":终点x,"y2":终点y}}
-- back: 返回 {{}}
-- done: 任务完成 {{}}
-
-重要规则：
-1. 如果任务是"打开XX应用"，优先使用 launch 操作直接启动
-2. 如果需要搜索，先用 launch 打开应用，再 tap 点击搜索框，再 input 输入
-3. 坐标(0,0)在左上角，({width},{height})在右下角
-
-返回JSON格式：{{"action":"操作名","params":{{}},"thought":"说明"}}
-
-示例：
-- 打开淘宝：{{"action":"launch","params":{{"app":"淘宝"}},"thought":"启动淘宝应用"}}
-- 点击搜索框：{{"action":"tap","params":{{"x":540,"y":150}},"thought":"点击顶部搜索框"}}
-- 输入关键词：{{"action":"input","params":{{"text":"蓝牙耳机"}},"thought":"输入搜索词"}}
-- 完成：{{"action":"done","params":{{}},"thought":"搜索结果已显示"}}
-
-现在返回下一步操作："""
-
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -267,32 +367,31 @@ class DoubaoVisionModel:
         
         body = {
             "model": self.model,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{image_base64}"}}
-                    ]
-                }
-            ],
+            "messages": messages,
             "max_tokens": 500,
             "temperature": 0.1  # 降低随机性，提高一致性
         }
         
         try:
-            resp = requests.post(
-                f"{self.api_url}/chat/completions",
-                headers=headers,
-                json=body,
-                timeout=60
-            )
+            if self.stream:
+                return self._analyze_streaming(headers, body, prepared, estimated)
+            
+            start = time.monotonic()
+            # 非流式: 上传 + 推理 + 下载都在这一个请求里
+            with tracing.span("model.request", bytes=prepared.payload_bytes):
+                resp = requests.post(
+                    f"{self.api_url}/chat/completions",
+                    headers=headers,
+                    json=body,
+                    timeout=60
+                )
             
             if resp.status_code == 200:
                 result = resp.json()
                 content = result['choices'][0]['message']['content'].strip()
-                print(f"  AI原始响应: {content[:200]}...")
-                return self._parse_response(content)
+                self._record_usage(result.get('usage'), estimated, time.monotonic() - start)
+                with tracing.span("model.parse"):
+                    return self._finish(content, prepared)
             else:
                 print(f"  API 错误: {resp.status_code} - {resp.text[:200]}")
                 return {"action": "wait", "params": {}, "thought": "API调用失败"}
@@ -301,122 +400,341 @@ class DoubaoVisionModel:
             print(f"  模型调用失败: {e}")
             return {"action": "wait", "params": {}, "thought": str(e)}
     
-    def _parse_response(self, content: str) -> dict:
-        """解析模型响应"""
+    def analyze_tree(self, tree: UITree, task: str, history: list = None) -> Optional[dict]:
+        """
+        只用控件列表询问模型，不上传截图
+        
+        Returns:
+            模型的决策；模型要求截图、调用失败或响应无法解析时返回 None，由调用方改发截图
+        """
+        messages = self.prompt_builder.build_text(task, history, tree.describe(TEXT_MAX_NODES))
+        estimated = self.prompt_builder.estimate_text(messages)
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        body = {"model": self.model, "messages": messages, "max_tokens": 300, "temperature": 0.1}
         try:
-            # 移除 markdown 代码块
-            content = content.strip()
-            if content.startswith("```"):
-                lines = content.split("\n")
-                content = "\n".join(lines[1:-1] if lines[-1].startswith("```") else lines[1:])
-            
-            # 尝试直接解析
-            try:
-                return json.loads(content)
-            except:
-                pass
-            
-            # 尝试提取 JSON（支持嵌套）
-            start = content.find('{')
-            if start != -1:
-                depth = 0
-                for i, c in enumerate(content[start:], start):
-                    if c == '{': depth += 1
-                    elif c == '}': depth -= 1
-                    if depth == 0:
-                        json_str = content[start:i+1]
-                        return json.loads(json_str)
-            
-            return {"action": "wait", "params": {}, "thought": "无法提取JSON"}
+            start = time.monotonic()
+            with tracing.span("model.request", text=True):
+                resp = requests.post(f"{self.api_url}/chat/completions", headers=headers, json=body,
+                                     timeout=60)
+            if resp.status_code != 200:
+                print(f"  API 错误: {resp.status_code} - {resp.text[:200]}")
+                return None
+            data = resp.json()
+            content = data['choices'][0]['message']['content'].strip()
+            self._record_usage(data.get('usage'), estimated, time.monotonic() - start)
         except Exception as e:
-            print(f"  JSON 解析失败: {e}")
-            return {"action": "wait", "params": {}, "thought": "响应解析失败"}
+            print(f"  模型调用失败: {e}")
+            return None
+        
+        print(f"  AI原始响应 (文字): {content[:200]}...")
+        obj, _ = extract_json(content)
+        if obj is not None and obj.get('action') == 'screenshot':
+            print("  🖼️ 模型要求截图")
+            return None
+        with tracing.span("model.parse"):
+            parsed = parse_action(content)
+        if not parsed.ok or parsed.action == 'wait':
+            return None
+        # 控件列表里的坐标就是设备像素，不需要换算；写进历史前由代理换算成模型图片坐标
+        return {'action': parsed.action, 'params': parsed.params, 'thought': parsed.thought,
+                'source': 'text'}
+    
+    def _record_usage(self, usage, estimated: int, latency: float, tracker: UsageTracker = None):
+        """记到当前代理的 UsageTracker (见 track_usage)；没有激活时只打印"""
+        tracker = tracker or current_usage()
+        call = tracker.record(usage, estimated, latency) if tracker else usage_call(usage, estimated, latency)
+        cached = f"，缓存 {call['cached_tokens']}" if call['cached_tokens'] else ""
+        mark = "≈" if call['estimated'] else ""
+        print(f"  🔢 输入 {mark}{call['prompt_tokens']} tokens{cached}，输出 {call['completion_tokens']}")
+    
+    def _batch_result(self, steps: list, prepared) -> dict:
+        """把模型返回的操作列表整理成 batch 动作，只有一个操作时还原成普通动作"""
+        actions = []
+        for step in steps[:MAX_BATCH_ACTIONS]:
+            valid, errors = validate_action(step)
+            if errors:
+                print(f"  ⚠️ 第 {len(actions) + 1} 个操作无效，截断: {'; '.join(map(str, errors))}")
+                break
+            action = valid['action']
+            if action in ('done', 'wait') and actions:
+                break  # 完成需要看到执行后的屏幕再确认
+            actions.append(valid)
+            if action in ('done', 'wait'):
+                break
+        if not actions:
+            return {'action': 'wait', 'params': {}, 'model_params': {}}
+        if len(actions) == 1:
+            params = actions[0]['params']
+            return {'action': actions[0]['action'], 'model_params': params,
+                    'params': prepared.to_device(params)}
+        return {
+            'action': 'batch',
+            'model_params': {'actions': actions},
+            'params': {'actions': [{'action': a['action'], 'params': prepared.to_device(a['params'])}
+                                   for a in actions]},
+        }
+    
+    def _finish(self, content: str, prepared) -> dict:
+        """解析完整响应，坐标换算回设备像素，历史记录保留模型坐标"""
+        print(f"  AI原始响应: {content[:200]}...")
+        result = self._parse_response(content)
+        if isinstance(result.get('plan'), list) and result['plan']:
+            result.update(self._plan_result(result.pop('plan'), prepared))
+        elif isinstance(result.get('actions'), list) and result['actions']:
+            result.update(self._batch_result(result.pop('actions'), prepared))
+        else:
+            result['model_params'] = result.get('params', {})
+            result['params'] = prepared.to_device(result['model_params'])
+        return result
+    
+    def _analyze_streaming(self, headers: dict, body: dict, prepared, estimated: int) -> dict:
+        """
+        流式请求: action 和 params 完整后立即返回，thought 在后台继续接收
+        
+        提前返回时 result['pending'] 是一个 Future，完成后给出完整的 thought。
+        """
+        start = time.monotonic()
+        # 后台接收线程里没有上下文，显式传过去
+        tracer = tracing.current()
+        usage_tracker = current_usage()
+        # 流式: 请求返回时服务端已收到图片并开始推理 (响应头)
+        with tracer.span("model.request", bytes=prepared.payload_bytes, stream=True):
+            resp = requests.post(
+                f"{self.api_url}/chat/completions",
+                headers=headers,
+                json=dict(body, stream=True, stream_options={"include_usage": True}),
+                timeout=60,
+                stream=True
+            )
+        if resp.status_code != 200:
+            print(f"  API 错误: {resp.status_code} - {resp.text[:200]}")
+            return {"action": "wait", "params": {}, "thought": "API调用失败"}
+        if not resp.headers.get('Content-Type', '').startswith('text/event-stream'):
+            # 服务端忽略了 stream 参数
+            result = resp.json()
+            content = result['choices'][0]['message']['content'].strip()
+            self._record_usage(result.get('usage'), estimated, time.monotonic() - start)
+            with tracer.span("model.parse"):
+                return self._finish(content, prepared)
+        
+        usage = {}
+        deltas = iter_sse_deltas(resp, usage)
+        parser = IncrementalJSONParser()
+        first_token = None
+        # 首字之前是推理排队 + 预填充，之后到 action 完整是生成
+        receive = tracer.begin("model.first_token")
+        for delta in deltas:
+            if first_token is None:
+                first_token = time.monotonic() - start
+                receive.end()
+                receive = tracer.begin("model.stream")
+            parser.feed(delta)
+            # 批量 / 规划格式需要完整结果
+            if parser.complete or parser.has('plan') or parser.has('actions'):
+                continue
+            if parser.has('action', 'params'):
+                break
+        
+        if parser.complete or not parser.has('action', 'params'):
+            for delta in deltas:
+                parser.feed(delta)
+            resp.close()
+            receive.end()
+            total = time.monotonic() - start
+            print(f"  ⚡ 首字 {first_token or 0:.2f}s，完整响应 {total:.2f}s")
+            self._record_usage(usage, estimated, total)
+            with tracer.span("model.parse"):
+                return self._finish(parser.buffer.strip(), prepared)
+        receive.end()
+        
+        step, errors = validate_action(parser.fields)
+        if errors:
+            # 操作不合法，等完整响应后统一解析和报错
+            for delta in deltas:
+                parser.feed(delta)
+            resp.close()
+            self._record_usage(usage, estimated, time.monotonic() - start)
+            with tracer.span("model.parse"):
+                return self._finish(parser.buffer.strip(), prepared)
+        
+        # 提前执行: thought 在后台线程继续接收
+        action_time = time.monotonic() - start
+        result = {
+            'action': step['action'],
+            'model_params': step['params'],
+            'params': prepared.to_device(step['params']),
+            'thought': parser.fields.get('thought', ''),
+        }
+        pending = Future()
+        
+        def drain():
+            try:
+                with tracer.span("model.drain"):
+                    for delta in deltas:
+                        parser.feed(delta)
+                total = time.monotonic() - start
+                print(f"  ⚡ 首字 {first_token:.2f}s，动作 {action_time:.2f}s，完整响应 {total:.2f}s")
+                # 耗时按拿到动作的时间计，这是代理实际等待的时间
+                self._record_usage(usage, estimated, action_time, usage_tracker)
+                pending.set_result({'thought': parser.fields.get('thought', result['thought']),
+                                    'raw': parser.buffer})
+            except Exception as e:
+                pending.set_result({'thought': result['thought'], 'raw': parser.buffer, 'error': str(e)})
+            finally:
+                resp.close()
+        
+        threading.Thread(target=drain, daemon=True).start()
+        result['pending'] = pending
+        return result
+    
+    def _plan_result(self, steps: list, prepared) -> dict:
+        """
+        校验模型返回的计划: 第一个操作立即执行，其余放进 result['plan'] 由代理按检查点执行
+        
+        遇到未知操作或缺少参数时截断计划，后面的操作不再可信。
+        """
+        plan = []
+        for step in steps[:self.plan_max_actions]:
+            valid, errors = validate_action(step)
+            if errors:
+                print(f"  ⚠️ 计划第 {len(plan) + 1} 步无效，截断: {'; '.join(map(str, errors))}")
+                break
+            action, params = valid['action'], valid['params']
+            if action == 'done' and plan:
+                break  # 完成需要看到执行后的屏幕再确认
+            plan.append({
+                'action': action,
+                'model_params': params,
+                'params': prepared.to_device(params),
+                'expect': str(step.get('expect', '')),
+                'same_page': bool(step.get('same_page', False)),
+                'checkpoint': bool(step.get('checkpoint', False)),
+            })
+            if action in ('done', 'wait'):
+                break
+        if not plan:
+            return {'action': 'wait', 'params': {}, 'model_params': {}}
+        first = plan.pop(0)
+        if plan:
+            print(f"  📋 计划 {len(plan) + 1} 步")
+        return dict(first, plan=plan)
+    
+    def _parse_response(self, content: str) -> dict:
+        """解析模型响应"""
+        parsed = parse_action(content)
+        for error in parsed.errors:
+            print(f"  ⚠️ 解析失败 [{error.code}]: {error}")
+        return parsed.to_dict()
 
 # ============== 主程序 ==============
 class AutoGLMAgent:
     """AutoGLM 自动化代理"""
     
-    def __init__(self):
-        self.controller = PhoneController()
-        self.model = DoubaoVisionModel()
+    def __init__(self, controller: PhoneController = None, model: DoubaoVisionModel = None,
+                 model_limiter=None, decision_cache: DecisionCache = None,
+                 trajectories: TrajectoryStore = None, resolvers: ResolverChain = None,
+                 tracer: tracing.Tracer = None):
+        """
+        Args:
+            controller: 手机控制器，默认连接 AUTOGLM_HELPER_URL
+            model: 视觉模型，多个代理可以共享同一个实例
+            model_limiter: 多个代理共享的模型 API 限速器 (见 fleet.py)
+            decision_cache: 决策缓存，AUTOGLM_DECISION_CACHE=1 时默认按 AUTOGLM_DECISION_CACHE_PATH 打开
+            trajectories: 轨迹录制 / 回放，AUTOGLM_REPLAY=1 时默认使用 AUTOGLM_TRAJECTORY_DIR
+            resolvers: 模型调用前的本地解析器，AUTOGLM_LOCAL_RESOLVE=1 时默认为文字规则 + AUTOGLM_TEMPLATE_DIR 的模板库
+            tracer: 各阶段耗时追踪，每个任务开始时清空，AUTOGLM_TRACE=0 关闭
+        """
+        self.controller = controller or PhoneController()
+        self.model = model or DoubaoVisionModel()
+        self.frame_cache = FrameCache()
+        # 跨任务的决策缓存 (SQLite)，AUTOGLM_DECISION_CACHE=1 开启
+        if decision_cache is None and DECISION_CACHE:
+            decision_cache = DecisionCache()
+        self.decision_cache = decision_cache
+        # 成功的任务录制成轨迹，下次直接回放，AUTOGLM_REPLAY=1 开启
+        if trajectories is None and REPLAY:
+            trajectories = TrajectoryStore()
+        self.trajectories = trajectories
+        # 简单步骤在本地解决 (控件树规则、模板匹配)，AUTOGLM_LOCAL_RESOLVE=1 开启
+        if resolvers is None and LOCAL_RESOLVE:
+            resolvers = default_chain()
+        self.resolvers = resolvers
+        # 纯文字优先需要模型支持 analyze_tree，AUTOGLM_TEXT_FIRST=1 开启
+        self.text_first = TEXT_FIRST and hasattr(self.model, 'analyze_tree')
+        self.settle = SettleDetector(
+            self.controller.screenshot_preview,
+            lambda: (self.controller.screen_width, self.controller.screen_height)
+        )
+        # 每个代理单独记录，共享的模型实例通过上下文记到当前代理
+        self.tracer = tracer or tracing.Tracer()
+        self.usage = UsageTracker()
         self.max_steps = 25
         self.history = []
+        self.engine = AsyncAgentEngine(self, model_limiter)
     
     def run(self, task: str) -> bool:
+        """执行任务（同步入口）"""
+        return asyncio.run(self.run_async(task))
+    
+    def stop(self):
+        """停止正在执行的任务（可从其他线程调用）"""
+        self.engine.stop()
+    
+    async def run_async(self, task: str) -> bool:
         """执行任务"""
         print(f"\n📋 任务: {task}")
         print("=" * 50)
         
         self.history = []
-        consecutive_failures = 0
-        last_action = None
-        
-        for step in range(1, self.max_steps + 1):
-            print(f"\n🔄 步骤 {step}/{self.max_steps}")
-            
-            # 1. 截图
-            print("  📸 截取屏幕...")
-            screenshot = self.controller.screenshot()
-            if screenshot is None:
-                print("  ❌ 截图失败")
-                consecutive_failures += 1
-                if consecutive_failures >= 3:
-                    print("\n❌ 连续截图失败，请检查 AutoGLM Helper")
-                    return False
-                time.sleep(2)
-                continue
-            
-            consecutive_failures = 0
-            
-            # 2. 分析
-            print("  🤔 分析屏幕...")
-            result = self.model.analyze_screen(screenshot, task, self.history)
-            print(f"  解析结果: {result}")
-            
-            action = result.get('action', 'wait')
-            params = result.get('params', {})
-            thought = result.get('thought', '')
-            
-            print(f"  💭 {thought}")
-            print(f"  🎯 {action}: {params}")
-            
-            # 检测重复操作
-            current_action = f"{action}:{params}"
-            if current_action == last_action and action not in ['done', 'wait']:
-                print("  ⚠️ 检测到重复操作，尝试其他方式...")
-                action = 'wait'
-            last_action = current_action
-            
-            # 记录历史
-            self.history.append({
-                'step': step,
-                'action': f"{action} {params}",
-                'thought': thought
-            })
-            
-            # 3. 执行
-            success = self._execute_action(action, params)
-            
-            if action == 'done':
-                print("\n✅ 任务完成!")
-                return True
-            
-            if not success and action not in ['wait', 'done']:
-                print("  ⚠️ 操作执行失败")
-            
-            # 等待操作生效
-            wait_time = 2.0 if action in ['tap', 'input'] else 1.5
-            time.sleep(wait_time)
-        
-        print("\n⚠️ 达到最大步数限制")
-        return False
+        self.frame_cache.reset()
+        decisions_before = self.decision_cache.stats() if self.decision_cache else None
+        self.usage.reset()
+        settle_before = self.settle.total_wait
+        if self.resolvers is not None:
+            self.resolvers.reset()
+        self.tracer.reset()
+        try:
+            with tracing.activate(self.tracer), track_usage(self.usage), \
+                    self.tracer.span(tracing.TASK_SPAN, task=task):
+                return await self.engine.run(task)
+        finally:
+            stats = self.frame_cache.stats()
+            print(f"\n🧠 帧缓存: 命中 {stats['hits']} / 未命中 {stats['misses']}，"
+                  f"节省模型调用 {stats['model_calls_saved']} 次")
+            print(f"🤖 模型调用 {self.engine.model_calls} 次，按计划执行 {self.engine.planned_steps} 步，"
+                  f"计划偏离 {self.engine.plan_divergences} 次，按轨迹回放 {self.engine.replayed_steps} 步")
+            if self.resolvers is not None:
+                print(f"{self.resolvers.report()}，共跳过模型调用 {self.engine.resolved_steps} 次")
+            if self.text_first:
+                print(f"🔤 纯文字调用 {self.engine.text_calls} 次，改发截图 {self.engine.text_fallbacks} 次")
+            if decisions_before is not None:
+                after = self.decision_cache.stats()
+                lookups = after['lookups'] - decisions_before['lookups']
+                hits = after['hits'] - decisions_before['hits']
+                print(f"📚 决策缓存: 命中 {hits}/{lookups}，节省模型调用 {hits} 次，"
+                      f"失效 {after['invalidated'] - decisions_before['invalidated']} 条，"
+                      f"共 {after['entries']} 条")
+            print(self.usage.report())
+            print(f"⏱️ 屏幕稳定等待共 {self.settle.total_wait - settle_before:.1f}s")
+            if self.tracer.enabled:
+                print(self.tracer.report())
+                if tracing.TRACE_DIR:
+                    try:
+                        path = self.tracer.export(tracing.export_path())
+                        print(f"📈 耗时追踪已导出: {path} (用 ui.perfetto.dev 打开)")
+                    except OSError as e:
+                        print(f"⚠️ 耗时追踪导出失败: {e}")
     
     def _execute_action(self, action: str, params: dict) -> bool:
         """执行操作"""
         if action == 'done':
             return True
         elif action == 'wait':
-            time.sleep(1)
+            with tracing.span("sleep"):
+                time.sleep(1)
             return True
         elif action == 'launch':
             app_name = params.get('app', '')
@@ -424,22 +742,22 @@ class AutoGLMAgent:
             print(f"  启动应用: {app_name} ({package})")
             success = self.controller.launch_app(package)
             if success:
-                time.sleep(2)  # 等待应用启动
-                return True
+                return True  # 应用启动由屏幕稳定检测等待
             else:
                 print("  ⚠️ 直接启动失败，尝试通过搜索打开...")
                 # 策略：下拉通知栏搜索 或 回主页下拉搜索
                 # 大多数手机主页下拉可以搜索应用
-                self.controller.home()
-                time.sleep(0.5)
-                # 从屏幕中间向下滑动，触发搜索
                 screen_w = self.controller.screen_width or 1080
                 screen_h = self.controller.screen_height or 2400
-                self.controller.swipe(screen_w // 2, screen_h // 3, screen_w // 2, screen_h * 2 // 3, 300)
-                time.sleep(1)
-                # 输入应用名搜索
-                self.controller.input_text(app_name)
-                time.sleep(1.5)
+                self.controller.run_batch([
+                    {'action': 'home', 'params': {}, 'delay': 0.5},
+                    # 从屏幕中间向下滑动，触发搜索
+                    {'action': 'swipe', 'params': {'x1': screen_w // 2, 'y1': screen_h // 3,
+                                                   'x2': screen_w // 2, 'y2': screen_h * 2 // 3,
+                                                   'duration': 300}, 'delay': 1},
+                    # 输入应用名搜索，搜索结果由屏幕稳定检测等待
+                    {'action': 'input', 'params': {'text': app_name}},
+                ])
                 # 添加提示
                 self.history.append({
                     'step': len(self.history),
@@ -450,6 +768,10 @@ class AutoGLMAgent:
         elif action == 'tap':
             x, y = int(params.get('x', 0)), int(params.get('y', 0))
             return self.controller.tap(x, y)
+        elif action == 'tap_text':
+            return self.controller.tap_text(params.get('text', ''))
+        elif action == 'tap_id':
+            return self.controller.tap_id(params.get('id', ''))
         elif action == 'swipe':
             x1, y1 = int(params.get('x1', 0)), int(params.get('y1', 0))
             x2, y2 = int(params.get('x2', 0)), int(params.get('y2', 0))
@@ -461,7 +783,25 @@ class AutoGLMAgent:
             return self.controller.back()
         elif action == 'home':
             return self.controller.home()
+        elif action == 'batch':
+            return self._execute_batch(params.get('actions', []))
         return False
+    
+    def _execute_batch(self, actions: list) -> bool:
+        """一次请求执行模型返回的多个操作"""
+        steps = []
+        for step in actions:
+            action, params = step['action'], step.get('params', {})
+            if action == 'launch':
+                app_name = params.get('app', '')
+                params = {'package': APP_PACKAGES.get(app_name, app_name)}
+            steps.append({'action': action, 'params': params})
+        results = self.controller.run_batch(steps)
+        if None in results:
+            print(f"  📦 批量执行 {len(steps)} 个操作，结果未知，以下一步截图为准")
+            return False
+        print(f"  📦 批量执行 {sum(results)}/{len(steps)} 成功")
+        return len(results) == len(steps) and all(results)
 
 
 def main():
@@ -8,18 +8,22 @@ Open-AutoGLM 混合方案 - Web 远程监控版 v1.1
 - 实时状态更新
 - 手动控制功能
 - 截图压缩优化
+- 控制台通过 SSE (/api/events) 接收增量事件，截图单独以 JPEG 获取 (/api/frame.jpg，支持 ETag/304)
+- 状态是带版本号的不可变快照，读取不加锁；/api/state?since=N 只返回版本 N 之后的变更
+- 固定大小线程池处理请求，连接有超时；手动刷新/操作后的截图会合并，慢请求不再卡住其他控制台
+- 任务队列: 可批量提交、设置优先级、取消，每个任务有自己的状态和日志；每台设备一个工作线程
 """
 
 import os
 import sys
-import base64
 import requests
 import time
 import json
-import re
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from io import BytesIO
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
 
 try:
     from PIL import Image
@@ -27,123 +31,177 @@ except ImportError:
     print("请安装 Pillow: pip install pillow")
     sys.exit(1)
 
+from helper_transport import get_transport
+from image_prep import ImagePreparer
+from action_parser import parse_action
+from settle import SETTLE_PREVIEW_EDGE, SettleDetector
+from jobs import QUEUED, RUNNING, JobQueue
+from state_store import StateStore
+
 # ============== 配置 ==============
 DOUBAO_API_KEY = os.getenv("DOUBAO_API_KEY", "")
 DOUBAO_API_URL = os.getenv("DOUBAO_API_URL", "https://ark.cn-beijing.volces.com/api/v3")
 DOUBAO_MODEL = os.getenv("DOUBAO_MODEL", "doubao-seed-1-6-vision-250815")
 HELPER_URL = os.getenv("AUTOGLM_HELPER_URL", "http://localhost:8080")
+# 多台手机时用逗号分隔多个 Helper 地址，每台设备一个工作线程
+WEB_DEVICES = [u.strip() for u in os.getenv("AUTOGLM_WEB_DEVICES", HELPER_URL).split(",") if u.strip()]
 WEB_PORT = int(os.getenv("AUTOGLM_WEB_PORT", "8888"))
+EVENT_BUFFER = 500       # 保留最近多少个事件，断线重连时按 Last-Event-ID 补发
+SSE_KEEPALIVE = 15       # 没有事件时每隔多少秒发一次注释行，检测断开的连接
+MAX_LOGS = 100
+WEB_WORKERS = int(os.getenv("AUTOGLM_WEB_WORKERS", "8"))          # 处理普通请求的线程数
+WEB_MAX_STREAMS = int(os.getenv("AUTOGLM_WEB_MAX_STREAMS", "16"))  # 同时打开的 SSE 连接上限
+WEB_BACKLOG = 64         # 线程都忙时最多排队多少个连接，再多直接 503
+WEB_TIMEOUT = float(os.getenv("AUTOGLM_WEB_TIMEOUT", "10"))        # 连接读写超时 (秒)
+HELPER_WAIT = 15         # 等待 (合并后的) Helper 调用结果的最长时间，超时返回 504
+ACTION_REFRESH_DELAY = 0.5  # 手动操作后多久截图刷新预览
+REFRESH_DEBOUNCE = 0.2   # 这段时间内连续的刷新点击合并成一次截图
+# 进程启动时间，和帧版本号一起作为 ETag / 图片 URL: 重启后版本号从 1 开始，不能让浏览器用上次的缓存
+FRAME_EPOCH = format(time.time_ns() // 1000000, "x")
 
-# 全局状态
-state = {
+# 全局状态: 带版本号的不可变快照，读 (/api/state、SSE) 不加锁；修改通过 update_state / log
+# 每个任务的详细状态在 jobs 里 (任务 ID -> 任务信息)，其余是汇总: 运行/排队数量、最近一次思考和操作、
+# 设备列表、每台设备预览的帧版本号
+store = StateStore({
     "running": False,
-    "task": "",
-    "step": 0,
     "max_steps": 25,
     "status": "空闲",
     "thought": "",
     "action": "",
-    "screenshot": "",
-    "logs": [],
-    "connected": False
-}
+    "devices": [],
+    "frames": [],
+    "epoch": FRAME_EPOCH,
+    "jobs": {},
+}, max_logs=MAX_LOGS, history=EVENT_BUFFER)
+
+
+def update_state(**changes):
+    """修改状态，只推送真正变化的字段"""
+    store.update(**changes)
+
 
 def log(msg):
     """添加日志"""
     ts = time.strftime("%H:%M:%S")
-    state["logs"].append(f"[{ts}] {msg}")
-    state["logs"] = state["logs"][-100:]
+    store.append_log(f"[{ts}] {msg}")
     print(msg)
 
+# ============== 屏幕预览 ==============
+PREVIEW_WIDTH = 720
+
+
+class LivePreview:
+    """
+    控制台预览 (每台设备一个): 只保存最新一帧，有控制台拉取时才编码 720px JPEG
+    
+    每一帧有一个版本号，同一版本只编码一次，多个浏览器共用；FRAME_EPOCH 加版本号作为 ETag。
+    """
+    
+    def __init__(self, device=0):
+        self.device = device
+        self.lock = threading.Lock()
+        self.frame = None
+        self.version = 0
+        self.encoded = None
+        self.encoded_version = 0
+    
+    def set_frame(self, img):
+        """登记新的一帧（不编码），通知控制台有新帧"""
+        with self.lock:
+            self.frame = img
+            self.version += 1
+            version = self.version
+        
+        def bump(current):
+            frames = list(current["frames"])
+            frames += [0] * (self.device + 1 - len(frames))
+            frames[self.device] = version
+            return {"frames": frames}, {"device": self.device, "version": version}
+        store.apply("frame", bump)
+    
+    def jpeg(self):
+        """返回 (最新一帧的 JPEG 字节, 版本号)，还没有截图时字节为 None"""
+        with self.lock:
+            if self.frame is not None:
+                self.encoded = encode_preview(self.frame)
+                self.encoded_version = self.version
+                self.frame = None
+            return self.encoded, self.encoded_version
+
+
+def encode_preview(img):
+    """缩小到 720px 宽并压缩为 JPEG"""
+    if img.width > PREVIEW_WIDTH:
+        ratio = PREVIEW_WIDTH / img.width
+        img = img.resize((PREVIEW_WIDTH, int(img.height * ratio)), Image.LANCZOS)
+    
+    buf = BytesIO()
+    img.convert("RGB").save(buf, format="JPEG", quality=70)
+    return buf.getvalue()
+
 # ============== 手机控制器 ==============
 class Controller:
-    def __init__(self):
-        self.url = HELPER_URL
+    def __init__(self, url=HELPER_URL):
+        self.url = url
+        self.transport = get_transport(url)
         self.width = 1080
         self.height = 2400
     
     def check(self):
         try:
-            r = requests.get(f"{self.url}/status", timeout=3)
+            r = self.transport.get("/status")
             if r.status_code == 200:
-                state["connected"] = r.json().get('accessibility_enabled', False)
-                return state["connected"]
+                return bool(r.json().get('accessibility_enabled', False))
         except:
             pass
-        state["connected"] = False
         return False
     
-    def screenshot(self):
-        try:
-            r = requests.get(f"{self.url}/screenshot", timeout=15)
-            if r.status_code == 200:
-                data = r.json()
-                if data.get('success') and data.get('image'):
-                    # 压缩图片
-                    img_data = base64.b64decode(data['image'])
-                    img = Image.open(BytesIO(img_data))
-                    self.width, self.height = img.size
-                    
-                    # 缩小并压缩
-                    if img.width > 720:
-                        ratio = 720 / img.width
-                        img = img.resize((720, int(img.height * ratio)), Image.LANCZOS)
-                    
-                    buf = BytesIO()
-                    img.save(buf, format="JPEG", quality=70)
-                    return base64.b64encode(buf.getvalue()).decode()
-        except Exception as e:
-            log(f"截图失败: {e}")
-        return None
-    
     def screenshot_full(self):
         """获取完整截图用于 AI 分析"""
         try:
-            r = requests.get(f"{self.url}/screenshot", timeout=15)
-            if r.status_code == 200:
-                data = r.json()
-                if data.get('success') and data.get('image'):
-                    img_data = base64.b64decode(data['image'])
-                    img = Image.open(BytesIO(img_data))
-                    self.width, self.height = img.size
-                    return img
+            img = self.transport.screenshot()
+            if img is not None:
+                self.width, self.height = img.size
+                return img
         except:
             pass
         return None
     
+    def screenshot_preview(self, max_edge=SETTLE_PREVIEW_EDGE):
+        """低分辨率截图，用于检测屏幕是否稳定"""
+        try:
+            return self.transport.screenshot(max_edge=max_edge)
+        except:
+            return None
+    
     def tap(self, x, y):
         try:
-            r = requests.post(f"{self.url}/tap", json={'x': x, 'y': y}, timeout=5)
-            return r.status_code == 200 and r.json().get('success')
+            return self.transport.call("/tap", {'x': x, 'y': y})
         except:
             return False
     
     def swipe(self, x1, y1, x2, y2, duration=500):
         try:
-            r = requests.post(f"{self.url}/swipe", 
-                json={'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'duration': duration}, timeout=10)
-            return r.status_code == 200 and r.json().get('success')
+            return self.transport.call("/swipe",
+                {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'duration': duration})
         except:
             return False
     
     def input_text(self, text):
         try:
-            r = requests.post(f"{self.url}/input", json={'text': text}, timeout=5)
-            return r.status_code == 200 and r.json().get('success')
+            return self.transport.call("/input", {'text': text})
         except:
             return False
     
     def back(self):
         try:
-            r = requests.post(f"{self.url}/back", timeout=5)
-            return r.status_code == 200 and r.json().get('success')
+            return self.transport.call("/back")
         except:
             return False
     
     def home(self):
         try:
-            r = requests.post(f"{self.url}/home", timeout=5)
-            return r.status_code == 200 and r.json().get('success')
+            return self.transport.call("/home")
         except:
             return False
 
@@ -153,11 +211,13 @@ class AIModel:
         self.api_key = DOUBAO_API_KEY
         self.api_url = DOUBAO_API_URL
         self.model = DOUBAO_MODEL
+        self.image_preparer = ImagePreparer()
     
-    def analyze(self, img, task, width, height, history=None):
-        buf = BytesIO()
-        img.save(buf, format="PNG")
-        img_b64 = base64.b64encode(buf.getvalue()).decode()
+    def analyze(self, img, task, history=None):
+        # 缩放并编码图片，提示词使用模型看到的尺寸
+        prepared = self.image_preparer.prepare(img)
+        log(f"图片: {prepared.summary()}")
+        width, height = prepared.width, prepared.height
         
         prompt = f"""分析手机屏幕，完成任务：{task}
 
@@ -185,7 +245,7 @@ class AIModel:
                     "model": self.model,
                     "messages": [{"role": "user", "content": [
                         {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_b64}"}}
+                        {"type": "image_url", "image_url": {"url": prepared.data_url}}
                     ]}],
                     "max_tokens": 300,
                     "temperature": 0.1
@@ -194,68 +254,204 @@ class AIModel:
             )
             if r.status_code == 200:
                 content = r.json()['choices'][0]['message']['content'].strip()
-                # 解析 JSON
-                if content.startswith("```"):
-                    content = "\n".join(content.split("\n")[1:-1])
-                match = re.search(r'\{[^{}]*\}', content)
-                if match:
-                    return json.loads(match.group())
+                parsed = parse_action(content)
+                for error in parsed.errors:
+                    log(f"解析失败 [{error.code}]: {error}")
+                result = parsed.to_dict()
+                result['params'] = prepared.to_device(result['params'])
+                return result
         except Exception as e:
             log(f"AI错误: {e}")
         return {"action": "wait", "params": {}, "thought": "分析失败"}
 
+# ============== 合并 Helper 调用 ==============
+class Coalescer:
+    """
+    合并对同一个 Helper 调用的并发请求
+    
+    同一时间最多执行一次；执行期间到来的请求全部并入紧接着的下一次，
+    所以每个请求拿到的结果都不早于请求时刻，连点十次刷新最多截两次图。
+    """
+    
+    def __init__(self, func, max_delay=1.0):
+        self.func = func
+        self.max_delay = max_delay  # trigger() 一直被推迟时，最晚多久也要执行
+        self.lock = threading.Lock()
+        self.running = None   # 正在执行的那次调用的 Future
+        self.pending = None   # 下一次调用的 Future，执行期间到来的请求共用
+        self.due = 0.0        # trigger() 约定的执行时间
+        self.deadline = 0.0
+        self.scheduled = False
+        self.requests = 0
+        self.calls = 0
+    
+    def __call__(self, timeout=None):
+        """请求一次调用并等待结果，超时抛出 concurrent.futures.TimeoutError"""
+        with self.lock:
+            self.requests += 1
+        return self._join(timeout)
+    
+    def _join(self, timeout):
+        with self.lock:
+            if self.running is None:
+                future = self.running = Future()
+                leader = True
+            else:
+                if self.pending is None:
+                    self.pending = Future()
+                future = self.pending
+                leader = False
+        if leader:
+            self._drain(future)
+        return future.result(timeout)
+    
+    def _drain(self, future):
+        """在调用方线程里执行，直到没有排队的请求"""
+        while future is not None:
+            try:
+                future.set_result(self.func())
+            except Exception as e:
+                future.set_exception(e)
+            with self.lock:
+                self.calls += 1
+                future = self.running = self.pending
+                self.pending = None
+    
+    def trigger(self, delay=0.0):
+        """
+        后台请求一次调用，不等结果
+        
+        delay 秒内的多次触发只执行一次 (以最后一次为准)，但不会因为一直有新的触发
+        推迟到 max_delay 之后。
+        """
+        now = time.monotonic()
+        with self.lock:
+            self.requests += 1
+            if self.scheduled:
+                self.due = min(now + delay, self.deadline)
+                return
+            self.scheduled = True
+            self.due = now + delay
+            self.deadline = now + max(delay, self.max_delay)
+        self._schedule(delay)
+    
+    def _schedule(self, delay):
+        timer = threading.Timer(delay, self._fire)
+        timer.daemon = True
+        timer.start()
+    
+    def _fire(self):
+        with self.lock:
+            remaining = self.due - time.monotonic()
+            if remaining > 0.01:
+                self._schedule(remaining)
+                return
+            self.scheduled = False
+        try:
+            self._join(HELPER_WAIT)
+        except Exception:
+            pass
+    
+    def stats(self):
+        return {"requests": self.requests, "calls": self.calls}
+
+
+class Device:
+    """一台手机: 控制器、预览、屏幕稳定检测，以及合并后的截图刷新和状态检查"""
+    
+    def __init__(self, index, url):
+        self.index = index
+        self.name = f"d{index}"
+        self.ctrl = Controller(url)
+        self.preview = LivePreview(index)
+        self.settle = SettleDetector(self.ctrl.screenshot_preview,
+                                     lambda: (self.ctrl.width, self.ctrl.height))
+        self.refresh = Coalescer(self.capture)
+        self.check_status = Coalescer(self.check)
+        self.connected = False
+        self.job = None  # 正在执行的任务 ID
+    
+    def capture(self):
+        """截一帧更新预览"""
+        img = self.ctrl.screenshot_full()
+        if img:
+            self.preview.set_frame(img)
+        return bool(img)
+    
+    def check(self):
+        self.connected = self.ctrl.check()
+        publish_devices()
+        return self.connected
+    
+    def info(self):
+        return {"name": self.name, "url": self.ctrl.url, "connected": self.connected, "job": self.job}
+
+
+def publish_devices():
+    update_state(devices=[d.info() for d in devices])
+
+
+def find_device(value):
+    """按序号或名称查找设备，默认第一台"""
+    if value in (None, ""):
+        return devices[0]
+    for d in devices:
+        if str(value) in (str(d.index), d.name):
+            return d
+    return None
+
 # ============== 全局实例 ==============
-ctrl = Controller()
 ai = AIModel()
+devices = [Device(i, url) for i, url in enumerate(WEB_DEVICES)]
+devices_by_name = {d.name: d for d in devices}
+# 第一台设备 (单设备时的旧名字)
+ctrl = devices[0].ctrl
+preview = devices[0].preview
+settle = devices[0].settle
+refresh_preview = devices[0].refresh
+check_status = devices[0].check_status
 
 # ============== 任务执行 ==============
-def run_task(task):
-    global state
-    state["running"] = True
-    state["task"] = task
-    state["step"] = 0
-    state["status"] = "运行中"
-    log(f"▶ 开始: {task}")
+def run_job(job, device):
+    """工作线程在 device 上执行一个任务，返回结果"""
+    ctrl, settle = device.ctrl, device.settle
+    jobs.log(job, f"▶ 开始: {job.task} (设备 {device.name})")
     
     history = []
+    img = None  # 等待屏幕稳定时拿到的全尺寸帧可直接复用
     
-    for step in range(1, state["max_steps"] + 1):
-        if not state["running"]:
-            log("⏹ 已停止")
-            break
+    for step in range(1, job.max_steps + 1):
+        if job.cancelled:
+            return {"ok": False, "reason": "cancelled", "steps": step - 1}
         
-        state["step"] = step
-        state["status"] = f"步骤 {step}/{state['max_steps']}"
+        jobs.update(job, step=step)
         
-        # 截图
-        img = ctrl.screenshot_full()
+        # 截图（每步只截一次，同一帧同时用于 AI 分析和控制台预览）
+        if img is None:
+            img = ctrl.screenshot_full()
         if not img:
-            log(f"步骤{step}: 截图失败")
+            jobs.log(job, f"步骤{step}: 截图失败")
             time.sleep(2)
             continue
         
-        # 更新预览
-        preview = ctrl.screenshot()
-        if preview:
-            state["screenshot"] = preview
+        # 更新预览，实际编码推迟到控制台拉取时
+        device.preview.set_frame(img)
         
         # AI 分析
-        result = ai.analyze(img, task, ctrl.width, ctrl.height, history)
+        result = ai.analyze(img, job.task, history)
         action = result.get('action', 'wait')
         params = result.get('params', {})
         thought = result.get('thought', '')
         
-        state["thought"] = thought
-        state["action"] = f"{action} {params}"
-        log(f"步骤{step}: {thought} → {action}")
+        jobs.update(job, thought=thought, action=f"{action} {params}")
+        jobs.log(job, f"步骤{step}: {thought} → {action}")
         
         history.append({'action': f"{action}", 'thought': thought})
         
         # 执行
         if action == 'done':
-            state["status"] = "✅ 完成"
-            log("✅ 任务完成")
-            break
+            jobs.log(job, "✅ 任务完成")
+            return {"ok": True, "steps": step, "summary": thought}
         elif action == 'tap':
             ctrl.tap(int(params.get('x', 0)), int(params.get('y', 0)))
         elif action == 'swipe':
@@ -268,11 +464,86 @@ def run_task(task):
         elif action == 'home':
             ctrl.home()
         
-        time.sleep(1.5)
+        # 等待屏幕稳定，代替固定的 1.5 秒
+        img, _ = settle.wait(action)
+    
+    if job.cancelled:
+        return {"ok": False, "reason": "cancelled", "steps": job.max_steps}
+    jobs.log(job, "⚠️ 步数限制")
+    return {"ok": False, "reason": "max_steps", "steps": job.max_steps}
+
+
+def on_job_change(job, changes):
+    """任务状态变化: 推送任务事件，更新设备和汇总状态"""
+    def put(current):
+        data = job.to_dict()
+        table = dict(current["jobs"])
+        table[job.id] = data
+        if "status" in changes:
+            # 队列里已经丢弃的旧任务也从状态里去掉
+            table = {job_id: info for job_id, info in table.items() if jobs.get(job_id) is not None}
+        return {"jobs": table}, data
+    store.apply("job", put)
+    if "status" in changes:
+        device = devices_by_name.get(job.device)
+        if device is not None:
+            device.job = job.id if job.status == RUNNING else None
+            publish_devices()
+        counts = jobs.counts()
+        running, queued = counts[RUNNING], counts[QUEUED]
+        update_state(running=running > 0,
+                     status=f"运行 {running} / 排队 {queued}" if running or queued else "空闲")
+    if "thought" in changes or "action" in changes:
+        update_state(thought=f"[{job.id}] {job.thought}", action=f"[{job.id}] {job.action}")
+
+
+def on_job_log(job, msg):
+    log(f"[{job.id}] {msg}")
+
+
+jobs = JobQueue(on_change=on_job_change, on_log=on_job_log)
+
+
+def int_field(body: dict, key: str, default: int) -> int:
+    """请求里的整数字段，缺省或为 null 时用默认值，类型不对抛出 ValueError"""
+    value = body.get(key)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{key} 必须是整数")
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} 必须是整数") from None
+
+
+def submit_jobs(body: dict):
+    """
+    提交任务: {"task": "..."} 或 {"tasks": [...]}，可选 priority (越大越先执行)、device、max_steps
     
-    state["running"] = False
-    if state["step"] >= state["max_steps"]:
-        state["status"] = "⚠️ 步数限制"
+    Returns:
+        提交的任务列表；参数不合法时抛出 ValueError
+    """
+    tasks = body.get('tasks') or [body.get('task')]
+    if not isinstance(tasks, list):
+        raise ValueError("tasks 必须是数组")
+    tasks = [t.strip() for t in tasks if isinstance(t, str) and t.strip()]
+    priority = int_field(body, 'priority', 0)
+    max_steps = int_field(body, 'max_steps', store.snapshot()["max_steps"])
+    if max_steps < 1:
+        raise ValueError("max_steps 必须大于 0")
+    device = body.get('device')
+    if device not in (None, ""):
+        found = find_device(device)
+        if found is None:
+            raise ValueError(f"未知设备: {device}")
+        device = found.name
+    else:
+        device = None
+    submitted = [jobs.submit(t, priority=priority, device=device, max_steps=max_steps) for t in tasks]
+    for job in submitted:
+        log(f"📥 排队 [{job.id}] {job.task}" + (f" (设备 {device})" if device else ""))
+    return submitted
 
 # ============== Web 界面 ==============
 HTML = '''<!DOCTYPE html>
@@ -297,7 +568,7 @@ body{font-family:system-ui;background:#0d1117;color:#c9d1d9;min-height:100vh}
 .stat-label{font-size:11px;color:#8b949e}
 .stat-value{font-size:14px;margin-top:4px;word-break:break-all}
 .connected{color:#3fb950}.disconnected{color:#f85149}
-input[type=text]{width:100%;padding:10px;border:1px solid #30363d;border-radius:6px;background:#0d1117;color:#c9d1d9;font-size:14px}
+input[type=text],input[type=number],textarea,select{width:100%;padding:10px;border:1px solid #30363d;border-radius:6px;background:#0d1117;color:#c9d1d9;font-size:14px}
 .btns{display:flex;gap:8px;margin-top:10px;flex-wrap:wrap}
 button{padding:8px 16px;border:none;border-radius:6px;cursor:pointer;font-size:13px;font-weight:500}
 .btn-primary{background:#238636;color:#fff}
@@ -308,6 +579,13 @@ button{padding:8px 16px;border:none;border-radius:6px;cursor:pointer;font-size:1
 .controls{display:grid;grid-template-columns:repeat(3,1fr);gap:8px;margin-top:10px}
 .ctrl-btn{padding:12px;background:#21262d;border:1px solid #30363d;color:#c9d1d9;border-radius:6px;cursor:pointer}
 .ctrl-btn:hover{background:#30363d}
+.row{display:flex;gap:8px;margin-top:8px}
+.row select,.row input{flex:1}
+.jobs{width:100%;border-collapse:collapse;font-size:12px}
+.jobs td,.jobs th{padding:5px;border-bottom:1px solid #21262d;text-align:left;word-break:break-all}
+.jobs th{color:#8b949e;font-weight:normal}
+.st-running{color:#58a6ff}.st-done{color:#3fb950}.st-failed{color:#f85149}.st-cancelled,.st-queued{color:#8b949e}
+.cancel{background:none;border:none;color:#f85149;cursor:pointer;padding:0 4px}
 </style>
 </head><body>
 <div class="header"><h1>🤖 AutoGLM 远程控制台</h1></div>
@@ -315,6 +593,7 @@ button{padding:8px 16px;border:none;border-radius:6px;cursor:pointer;font-size:1
 <div class="left">
 <div class="card">
 <h3>📱 手机屏幕 (点击刷新)</h3>
+<select id="device" onchange="selectDevice()" style="margin-bottom:8px"></select>
 <img id="screen" class="screen" onclick="refresh()" alt="等待截图">
 </div>
 <div class="card">
@@ -343,14 +622,23 @@ button{padding:8px 16px;border:none;border-radius:6px;cursor:pointer;font-size:1
 </div>
 <div class="card">
 <h3>🚀 任务控制</h3>
-<input type="text" id="task" placeholder="输入任务，如：打开淘宝搜索蓝牙耳机">
+<textarea id="task" rows="3" placeholder="每行一个任务，如：打开淘宝搜索蓝牙耳机"></textarea>
+<div class="row">
+<select id="target"><option value="">任意设备</option></select>
+<input type="number" id="priority" value="0" title="优先级，越大越先执行">
+</div>
 <div class="btns">
-<button class="btn-primary" onclick="start()">▶ 开始任务</button>
-<button class="btn-danger" onclick="stop()">⏹ 停止</button>
+<button class="btn-primary" onclick="start()">▶ 加入队列</button>
+<button class="btn-danger" onclick="stop()">⏹ 停止运行中的任务</button>
 <button class="btn-secondary" onclick="document.getElementById('task').value=''">清空</button>
 </div>
 </div>
 <div class="card">
+<h3>🗂 任务队列</h3>
+<table class="jobs"><thead><tr><th>ID</th><th>任务</th><th>设备</th><th>优先级</th><th>状态</th><th>步数</th><th></th></tr></thead>
+<tbody id="jobs"></tbody></table>
+</div>
+<div class="card">
 <h3>📋 运行日志</h3>
 <div id="logs" class="logs"></div>
 </div>
@@ -358,88 +646,366 @@ button{padding:8px 16px;border:none;border-radius:6px;cursor:pointer;font-size:1
 </div>
 <script>
 const $ = id => document.getElementById(id);
-function update() {
-  fetch('/api/state').then(r=>r.json()).then(d=>{
-    $('status').textContent = d.status;
-    $('thought').textContent = d.thought || '-';
-    $('action').textContent = d.action || '-';
-    if(d.screenshot) $('screen').src = 'data:image/jpeg;base64,' + d.screenshot;
-    $('logs').innerHTML = d.logs.map(l=>'<div class="log">'+l+'</div>').join('');
-    $('logs').scrollTop = $('logs').scrollHeight;
-    $('conn').textContent = d.connected ? '✅ 已连接' : '❌ 未连接';
-    $('conn').className = 'stat-value ' + (d.connected ? 'connected' : 'disconnected');
+const MAX_LOGS = 100;
+const STATUS = {queued:'排队', running:'运行中', done:'完成', failed:'失败', cancelled:'已取消'};
+let device = 0, devices = [], frames = [], shown = '', epoch = '';
+const jobs = new Map();
+function setFrame(d, v) {
+  frames[d] = v;
+  const key = epoch + '-' + v;  // 控制台重启后版本号从 1 开始，加上启动时间区分
+  if (d === device && v && key !== shown) { shown = key; $('screen').src = '/api/frame.jpg?device=' + d + '&v=' + key; }
+}
+function showConn() {
+  const c = devices[device] && devices[device].connected;
+  $('conn').textContent = c ? '✅ 已连接' : '❌ 未连接';
+  $('conn').className = 'stat-value ' + (c ? 'connected' : 'disconnected');
+}
+function setDevices(list) {
+  if (list.length !== devices.length) {
+    const opts = list.map((d, i) => new Option(d.name + ' ' + d.url, i));
+    $('device').replaceChildren(...opts);
+    $('device').value = device;
+    $('target').replaceChildren(new Option('任意设备', ''), ...list.map(d => new Option(d.name, d.name)));
+  }
+  devices = list;
+  showConn();
+}
+function selectDevice() {
+  device = +$('device').value; shown = '';
+  setFrame(device, frames[device]);
+  showConn();
+}
+function applyState(d) {
+  if ('status' in d) $('status').textContent = d.status;
+  if ('thought' in d) $('thought').textContent = d.thought || '-';
+  if ('action' in d) $('action').textContent = d.action || '-';
+  if ('devices' in d) setDevices(d.devices);
+}
+function renderJobs() {
+  const rows = [...jobs.values()].reverse().map(j => {
+    const tr = document.createElement('tr');
+    [j.id, j.task, j.device || '-', j.priority, STATUS[j.status] || j.status, j.step + '/' + j.max_steps]
+      .forEach((v, i) => { const td = tr.insertCell(); td.textContent = v; if (i === 4) td.className = 'st-' + j.status; });
+    const td = tr.insertCell();
+    if (j.status === 'queued' || j.status === 'running') {
+      const b = document.createElement('button');
+      b.className = 'cancel'; b.textContent = '✖'; b.title = '取消';
+      b.onclick = () => fetch('/api/jobs/' + j.id + '/cancel', {method:'POST'});
+      td.appendChild(b);
+    }
+    return tr;
   });
+  $('jobs').replaceChildren(...rows);
+}
+function applyJob(j) { jobs.set(j.id, j); renderJobs(); }
+function addLog(line) {
+  const logs = $('logs');
+  const div = document.createElement('div');
+  div.className = 'log';
+  div.textContent = line;
+  logs.appendChild(div);
+  while (logs.childNodes.length > MAX_LOGS) logs.removeChild(logs.firstChild);
+  logs.scrollTop = logs.scrollHeight;
+}
+function snapshot(d) {
+  epoch = d.epoch;
+  applyState(d);
+  $('logs').innerHTML = '';
+  d.logs.forEach(addLog);
+  d.frames.forEach((v, i) => setFrame(i, v));
+  jobs.clear();
+  Object.values(d.jobs).forEach(j => jobs.set(j.id, j));
+  renderJobs();
+}
+const handlers = {
+  snapshot, state: applyState, log: d => addLog(d.line),
+  frame: f => setFrame(f.device, f.version), job: applyJob,
+};
+// 服务端推送增量事件，断线后浏览器自动重连并带上 Last-Event-ID
+function connect() {
+  if (!window.EventSource) return poll();
+  const es = new EventSource('/api/events');
+  for (const kind in handlers) es.addEventListener(kind, e => handlers[kind](JSON.parse(e.data)));
+  // 服务端连接数已满 (503) 时 EventSource 不再重连，改为轮询
+  es.onerror = () => { if (es.readyState === EventSource.CLOSED) poll(); };
+}
+// 轮询也只取上次版本之后的变更
+let version = null;
+function poll() {
+  fetch('/api/state' + (version === null ? '' : '?since=' + version)).then(r=>r.json()).then(d => {
+    if (d.changes) d.changes.forEach(c => handlers[c.kind](c.data)); else snapshot(d);
+    version = d.version;
+  }).finally(() => setTimeout(poll, 2000));
+}
+function post(url, body) {
+  return fetch(url, {method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify(body)});
 }
 function start() {
-  const task = $('task').value.trim();
-  if(!task) return alert('请输入任务');
-  fetch('/api/start', {method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({task})});
+  const tasks = $('task').value.split('\\n').map(t => t.trim()).filter(Boolean);
+  if(!tasks.length) return alert('请输入任务');
+  post('/api/jobs', {tasks, priority: +$('priority').value || 0, device: $('target').value})
+    .then(r => r.json()).then(d => { if (!d.ok) alert(d.error || '提交失败'); else $('task').value = ''; });
 }
 function stop() { fetch('/api/stop', {method:'POST'}); }
-function refresh() { fetch('/api/screenshot'); }
-function action(a) { fetch('/api/action', {method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({action:a})}); }
+function refresh() { fetch('/api/screenshot?device=' + device); }
+function action(a) { post('/api/action', {action:a, device}); }
 function swipe(dir) {
   const params = {up:{x1:540,y1:1600,x2:540,y2:800}, down:{x1:540,y1:800,x2:540,y2:1600}, left:{x1:900,y1:1200,x2:200,y2:1200}};
-  fetch('/api/action', {method:'POST', headers:{'Content-Type':'application/json'}, body:JSON.stringify({action:'swipe', params:params[dir]})});
+  post('/api/action', {action:'swipe', params:params[dir], device});
 }
-setInterval(update, 1000);
-update();
+connect();
 </script>
 </body></html>'''
 
+def sse_message(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+
+
 class Handler(BaseHTTPRequestHandler):
+    timeout = WEB_TIMEOUT  # 读请求/写响应卡住的连接不会一直占着工作线程
+    streams = threading.BoundedSemaphore(WEB_MAX_STREAMS)
+    
     def log_message(self, *args): pass
     
     def do_GET(self):
-        if self.path == '/':
+        url = urlparse(self.path)
+        path = url.path
+        query = parse_qs(url.query)
+        if path == '/':
             self.send_response(200)
             self.send_header('Content-Type', 'text/html')
             self.end_headers()
             self.wfile.write(HTML.encode())
-        elif self.path == '/api/state':
-            self.json_response(state)
-        elif self.path == '/api/screenshot':
-            s = ctrl.screenshot()
-            if s: state["screenshot"] = s
-            ctrl.check()
-            self.json_response({"ok": bool(s)})
+        elif path == '/api/state':
+            # 完整状态，截图只给版本号，内容从 /api/frame.jpg 获取；
+            # ?since=版本号 时只返回之后的变更 (太旧时仍返回完整状态)
+            if 'since' in query:
+                try:
+                    since = int(query['since'][0])
+                except ValueError:
+                    self.json_response({"ok": False, "error": "since 需要是整数"}, status=400)
+                    return
+                changes = store.changes_since(since)
+                if changes is not None:
+                    self.json_response({
+                        "version": changes[-1][0] if changes else since,
+                        "changes": [{"version": v, "kind": kind, "data": data} for v, kind, data in changes],
+                    })
+                    return
+            self.json_response(store.snapshot().to_dict())
+        elif path == '/api/events':
+            self.stream_events()
+        elif path == '/api/frame.jpg':
+            device = self.device_param(query.get('device', [None])[0])
+            if device: self.frame_response(device)
+        elif path == '/api/screenshot':
+            device = self.device_param(query.get('device', [None])[0])
+            if not device:
+                return
+            # 多个控制台/连续点击的刷新合并成一次截图。默认后台截图，新帧通过 SSE 推送，
+            # 工作线程不用陪着等 Helper；?wait=1 时等截图完成再返回
+            if query.get('wait') != ['1']:
+                device.refresh.trigger(REFRESH_DEBOUNCE)
+                device.check_status.trigger(REFRESH_DEBOUNCE)
+                self.json_response({"ok": True, "pending": True})
+                return
+            try:
+                ok = device.refresh(HELPER_WAIT)
+                device.check_status(HELPER_WAIT)
+            except FutureTimeout:
+                self.json_response({"ok": False, "error": "Helper 响应超时"}, status=504)
+                return
+            self.json_response({"ok": ok})
+        elif path == '/api/devices':
+            self.json_response({"devices": [d.info() for d in devices]})
+        elif path == '/api/jobs':
+            status = query.get('status', [None])[0]
+            self.json_response({"jobs": [job.to_dict() for job in jobs.list(status)],
+                                "counts": jobs.counts()})
+        elif path.startswith('/api/jobs/'):
+            # 单个任务的完整信息，包括日志和结果
+            job = jobs.get(path[len('/api/jobs/'):])
+            if job is None:
+                self.json_response({"ok": False, "error": "任务不存在"}, status=404)
+            else:
+                self.json_response(job.to_dict(logs=True))
         else:
             self.send_response(404)
             self.end_headers()
     
     def do_POST(self):
         length = int(self.headers.get('Content-Length', 0))
-        body = json.loads(self.rfile.read(length).decode()) if length else {}
+        try:
+            body = json.loads(self.rfile.read(length).decode()) if length else {}
+        except ValueError:
+            self.json_response({"ok": False, "error": "请求体不是 JSON"}, status=400)
+            return
+        if not isinstance(body, dict):
+            self.json_response({"ok": False, "error": "请求体必须是 JSON 对象"}, status=400)
+            return
         
-        if self.path == '/api/start':
-            task = body.get('task', '')
-            if task and not state["running"]:
-                threading.Thread(target=run_task, args=(task,), daemon=True).start()
-            self.json_response({"ok": True})
+        if self.path in ('/api/jobs', '/api/start'):
+            # /api/start 是旧接口: 以前任务运行中会忽略新任务，现在一律排队
+            try:
+                submitted = submit_jobs(body)
+            except ValueError as e:
+                self.json_response({"ok": False, "error": str(e)}, status=400)
+                return
+            ids = [job.id for job in submitted]
+            self.json_response({"ok": bool(ids), "jobs": ids})
+        elif self.path.startswith('/api/jobs/') and self.path.endswith('/cancel'):
+            job_id = self.path[len('/api/jobs/'):-len('/cancel')]
+            self.json_response({"ok": jobs.cancel(job_id)})
         elif self.path == '/api/stop':
-            state["running"] = False
+            # 停止正在运行的任务，排队的任务继续
+            running = jobs.list(RUNNING)
+            for job in running:
+                jobs.cancel(job.id)
             log("⏹ 用户停止")
-            self.json_response({"ok": True})
+            self.json_response({"ok": True, "jobs": [job.id for job in running]})
         elif self.path == '/api/action':
+            device = self.device_param(body.get('device'))
+            if not device:
+                return
             a = body.get('action')
-            p = body.get('params', {})
-            if a == 'home': ctrl.home()
-            elif a == 'back': ctrl.back()
-            elif a == 'swipe': ctrl.swipe(p.get('x1',540), p.get('y1',1600), p.get('x2',540), p.get('y2',800))
-            time.sleep(0.5)
-            s = ctrl.screenshot()
-            if s: state["screenshot"] = s
+            p = body.get('params')
+            if not isinstance(p, dict):
+                p = {}
+            if a == 'home': device.ctrl.home()
+            elif a == 'back': device.ctrl.back()
+            elif a == 'swipe': device.ctrl.swipe(p.get('x1',540), p.get('y1',1600), p.get('x2',540), p.get('y2',800))
+            # 不在请求里等待: 稍后后台截图，新帧通过 SSE 推送；连续操作只截最后一次
+            device.refresh.trigger(ACTION_REFRESH_DELAY)
             self.json_response({"ok": True})
         else:
             self.send_response(404)
             self.end_headers()
     
-    def json_response(self, data):
+    def device_param(self, value):
+        """按请求参数找设备，找不到时直接返回 404"""
+        device = find_device(value)
+        if device is None:
+            self.json_response({"ok": False, "error": f"未知设备: {value}"}, status=404)
+        return device
+    
+    def stream_events(self):
+        """SSE: 先发完整快照 (或按 Last-Event-ID 补发)，之后只推送增量"""
+        # 连接数满了返回 503，浏览器 EventSource 关闭后改为轮询 /api/state
+        if not self.streams.acquire(blocking=False):
+            self.send_response(503)
+            self.send_header('Retry-After', '5')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        try:
+            self._stream_events()
+        finally:
+            self.streams.release()
+    
+    def _stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('X-Accel-Buffering', 'no')
+        self.end_headers()
+        try:
+            last_id = int(self.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            last_id = None
+        try:
+            events = store.changes_since(last_id) if last_id is not None else None
+            while not store.closed:
+                if events is None:
+                    snap = store.snapshot()
+                    last_id = snap.version
+                    self.wfile.write(sse_message(last_id, "snapshot", snap.to_dict()))
+                elif events:
+                    self.wfile.write(b"".join(sse_message(*e) for e in events))
+                    last_id = events[-1][0]
+                else:
+                    self.wfile.write(b": ping\n\n")
+                self.wfile.flush()
+                store.wait(last_id, SSE_KEEPALIVE)
+                events = store.changes_since(last_id)
+        except OSError:
+            pass  # 浏览器关闭了页面，或者写超时
+    
+    def frame_response(self, device):
+        """设备最新一帧的 JPEG，浏览器已有同一版本时返回 304"""
+        data, version = device.preview.jpeg()
+        if data is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        etag = f'"{FRAME_EPOCH}-{version}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
         self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def json_response(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
+
+
+class WebServer(HTTPServer):
+    """
+    固定大小线程池的 HTTP 服务
+    
+    ThreadingHTTPServer 每个连接开一个线程、没有上限。这里 SSE 长连接最多 WEB_MAX_STREAMS 个，
+    线程池再多留 WEB_WORKERS 个线程给普通请求，推送连接占满也不影响操作；
+    所有线程都忙时最多排队 WEB_BACKLOG 个连接，再多直接返回 503。
+    """
+    
+    request_queue_size = 128  # 默认 5，连点刷新时新连接会被丢掉等 1 秒重传
+    REJECT = b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+    
+    def __init__(self, address, handler, workers=WEB_WORKERS, backlog=WEB_BACKLOG):
+        super().__init__(address, handler)
+        size = workers + WEB_MAX_STREAMS
+        self.pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix="web")
+        self.slots = threading.BoundedSemaphore(size + backlog)
+        self.rejected = 0
+    
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            try:
+                request.settimeout(1)
+                request.sendall(self.REJECT)
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        self.pool.submit(self.process_request_thread, request, client_address)
+    
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.slots.release()
+    
+    def server_close(self):
+        super().server_close()
+        store.close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
 
 def main():
     print("=" * 50)
@@ -461,19 +1027,28 @@ def main():
         ip = "localhost"
     
     print(f"\n📡 模型: {DOUBAO_MODEL}")
-    print(f"🔗 Helper: {HELPER_URL}")
+    for d in devices:
+        print(f"🔗 Helper {d.name}: {d.ctrl.url}")
     print(f"\n🌐 在电脑浏览器打开:")
     print(f"   http://{ip}:{WEB_PORT}")
     print(f"\n按 Ctrl+C 停止服务\n")
     
-    ctrl.check()
+    for d in devices:
+        d.check()
     log(f"服务启动: http://{ip}:{WEB_PORT}")
     
-    server = HTTPServer(('0.0.0.0', WEB_PORT), Handler)
+    # 每台设备一个工作线程，从任务队列领取任务
+    jobs.start_workers(devices_by_name, run_job)
+    server = WebServer(('0.0.0.0', WEB_PORT), Handler)
     try:
         server.serve_forever()
     except KeyboardInterrupt:
         print("\n已停止")
+    finally:
+        jobs.close()
+        for job in jobs.list(RUNNING):
+            jobs.cancel(job.id)
+        server.server_close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,181 @@
+"""
+Open-AutoGLM 混合方案 - 控制后端健康管理
+
+PhoneController 有两个后端: 无障碍服务 (优先) 和 LADB (备用)。
+这里按后端记录最近的成功率和延迟:
+- 当前后端连续失败、成功率过低或明显变慢时，切换到下一个可用后端
+- 被降级的后端在后台按指数退避探测 (无障碍服务探测 /status)，恢复后自动切回
+- 记录每个动作由哪个后端完成
+"""
+
+import os
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+FAILOVER_FAILURES = int(os.getenv("AUTOGLM_FAILOVER_FAILURES", "2"))
+MIN_SUCCESS_RATE = float(os.getenv("AUTOGLM_MIN_SUCCESS_RATE", "0.5"))
+SLOW_ACTION = float(os.getenv("AUTOGLM_SLOW_ACTION", "3.0"))
+HEALTH_WINDOW = 20
+MIN_SAMPLES = 5           # 成功率 / 延迟判断至少需要的样本数
+PROBE_BACKOFF = (1.0, 30.0)  # 探测间隔: 初始, 最大 (秒)
+
+
+class BackendHealth:
+    """单个后端最近 window 次调用的统计"""
+
+    def __init__(self, name: str, window: int = HEALTH_WINDOW):
+        self.name = name
+        self.samples = deque(maxlen=window)  # (成功, 耗时)
+        self.consecutive_failures = 0
+        self.available = True
+        self.served = 0
+        self.failovers = 0
+
+    def record(self, ok: bool, latency: float):
+        self.samples.append((ok, latency))
+        if ok:
+            self.consecutive_failures = 0
+            self.served += 1
+        else:
+            self.consecutive_failures += 1
+
+    @property
+    def success_rate(self) -> float:
+        if not self.samples:
+            return 1.0
+        return sum(1 for ok, _ in self.samples if ok) / len(self.samples)
+
+    @property
+    def avg_latency(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(latency for _, latency in self.samples) / len(self.samples)
+
+    def degraded(self) -> bool:
+        if self.consecutive_failures >= FAILOVER_FAILURES:
+            return True
+        if len(self.samples) < MIN_SAMPLES:
+            return False
+        return self.success_rate < MIN_SUCCESS_RATE or self.avg_latency > SLOW_ACTION
+
+    def reset(self):
+        self.samples.clear()
+        self.consecutive_failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "success_rate": self.success_rate,
+            "avg_latency": self.avg_latency,
+            "served": self.served,
+            "failovers": self.failovers,
+        }
+
+
+class BackendManager:
+    """按优先级选择健康的后端，降级后后台探测恢复"""
+
+    def __init__(self, priority: List[str], probes: Dict[str, Callable[[], bool]],
+                 on_change: Optional[Callable[[Optional[str], Optional[str]], None]] = None):
+        """
+        Args:
+            priority: 后端名称，按优先级从高到低
+            probes: 后端名称 -> 探测函数 (返回是否可用)
+            on_change: 当前后端变化时回调 (旧后端, 新后端)
+        """
+        self.priority = priority
+        self.probes = probes
+        self.on_change = on_change
+        self.health = {name: BackendHealth(name) for name in priority}
+        self.last_backend: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._probing = set()
+
+    @property
+    def current(self) -> Optional[str]:
+        """优先级最高的可用后端"""
+        for name in self.priority:
+            if self.health[name].available:
+                return name
+        return None
+
+    def candidates(self) -> List[str]:
+        """本次调用可以依次尝试的后端"""
+        with self._lock:
+            return [name for name in self.priority if self.health[name].available]
+
+    def detect(self):
+        """同步探测所有后端，不可用的转入后台探测"""
+        for name in self.priority:
+            try:
+                ok = self.probes[name]()
+            except Exception:
+                ok = False
+            if not ok:
+                self.mark_down(name)
+
+    def record(self, name: str, ok: bool, latency: float):
+        """记录一次调用结果，后端变差时降级"""
+        with self._lock:
+            health = self.health[name]
+            health.record(ok, latency)
+            if ok:
+                self.last_backend = name
+            degraded = health.degraded()
+        if degraded and self.current == name:
+            self.mark_down(name)
+
+    def mark_down(self, name: str):
+        """降级后端并开始后台探测"""
+        with self._lock:
+            health = self.health[name]
+            if not health.available:
+                return
+            before = self.current
+            health.available = False
+            health.failovers += 1
+            after = self.current
+            start_probe = name not in self._probing
+            self._probing.add(name)
+        if start_probe:
+            threading.Thread(target=self._probe_loop, args=(name,), daemon=True,
+                             name=f"probe-{name}").start()
+        if before != after and self.on_change:
+            self.on_change(before, after)
+
+    def _mark_up(self, name: str):
+        with self._lock:
+            before = self.current
+            health = self.health[name]
+            health.available = True
+            health.reset()
+            self._probing.discard(name)
+            after = self.current
+        if before != after and self.on_change:
+            self.on_change(before, after)
+
+    def _probe_loop(self, name: str):
+        delay, max_delay = PROBE_BACKOFF
+        while not self._stop.wait(delay):
+            try:
+                ok = self.probes[name]()
+            except Exception:
+                ok = False
+            if ok:
+                self._mark_up(name)
+                return
+            delay = min(delay * 2, max_delay)
+
+    def close(self):
+        """停止后台探测"""
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "current": self.current,
+                "last_backend": self.last_backend,
+                "backends": {name: h.stats() for name, h in self.health.items()},
+            }
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+LADB 动作 / 截图延迟测试台
+
+用 fake_adb 模拟设备，动作对比:
+- spawn:      每个动作启动一个 `adb shell input ...` 进程 (原实现)
+- persistent: 常驻 adb shell 会话
+
+截图对比:
+- pull:       screencap 到 /sdcard，adb pull 到 /tmp，再 rm (原实现，3 个进程)
+- exec-out:   `adb exec-out screencap -p` 直接读到内存
+- raw:        `adb exec-out screencap` 原始帧缓冲 + Image.frombuffer
+
+用法:
+    python benchmarks/bench_adb.py [--actions 50] [--frames 10] [--latency 0.05]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subprocess
+
+from PIL import Image, ImageChops
+
+import fake_adb
+from adb_shell import screencap
+from stub_helper import make_screen
+from phone_controller import PhoneController
+
+# 没有 Helper 监听的端口，强制降级到 LADB
+NO_HELPER = "http://127.0.0.1:9"
+
+
+def measure(controller: PhoneController, actions: int) -> list:
+    latencies = []
+    for i in range(actions):
+        t0 = time.perf_counter()
+        if i % 2:
+            ok = controller.swipe(540, 1800, 540, 600, 0)
+        else:
+            ok = controller.tap(540, 400 + i)
+        latencies.append(time.perf_counter() - t0)
+        assert ok, "动作执行失败"
+    return latencies
+
+
+def screenshot_pull(serial: str) -> Image.Image:
+    """原来的三进程截图流程"""
+    subprocess.run(['adb', '-s', serial, 'shell', 'screencap', '-p', '/sdcard/autoglm_screenshot.png'],
+                   check=True, timeout=5)
+    local_path = os.path.join(tempfile.gettempdir(), 'autoglm_bench_screenshot.png')
+    subprocess.run(['adb', '-s', serial, 'pull', '/sdcard/autoglm_screenshot.png', local_path],
+                   check=True, timeout=5)
+    image = Image.open(local_path)
+    image.load()
+    subprocess.run(['adb', '-s', serial, 'shell', 'rm', '/sdcard/autoglm_screenshot.png'], timeout=3)
+    return image
+
+
+def measure_screenshots(capture, frames: int, expected: Image.Image) -> list:
+    latencies = []
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        image = capture()
+        latencies.append(time.perf_counter() - t0)
+    diff = ImageChops.difference(image.convert("RGB"), expected).getbbox()
+    assert diff is None, f"截图内容不一致: {diff}"
+    return latencies
+
+
+def report(name: str, latencies: list):
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(f"{name:<12}{statistics.mean(latencies) * 1000:>9.1f}ms"
+          f"{statistics.median(latencies) * 1000:>9.1f}ms{p95 * 1000:>9.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="模拟 adb 握手耗时 (秒)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        screen = make_screen()
+        os.environ.update(fake_adb.install(tmp, latency=args.latency, screen=screen))
+
+        spawn = PhoneController(NO_HELPER)
+        spawn.close_adb_shell()
+        persistent = PhoneController(NO_HELPER)
+
+        print(f"{'':<12}{'平均':>9}{'中位数':>9}{'p95':>9}")
+        report("spawn", measure(spawn, args.actions))
+        report("persistent", measure(persistent, args.actions))
+
+        # 会话被杀掉后应自动重连
+        persistent.adb_shell.process.kill()
+        persistent.adb_shell.process.wait()
+        assert persistent.tap(1, 1), "重连失败"
+        print(f"\n会话统计: {persistent.adb_shell.stats()}")
+        persistent.close()
+
+        with open(os.environ["FAKE_ADB_LOG"]) as f:
+            print(f"设备端共收到 {len(f.readlines())} 条 input 命令")
+
+        serial = fake_adb.DEFAULT_SERIAL
+        print(f"\n截图 {screen.size[0]}x{screen.size[1]}")
+        print(f"{'':<12}{'平均':>9}{'中位数':>9}{'p95':>9}")
+        report("pull", measure_screenshots(lambda: screenshot_pull(serial), args.frames, screen))
+        report("exec-out", measure_screenshots(lambda: screencap(serial, raw=False),
+                                               args.frames, screen))
+        report("raw", measure_screenshots(lambda: screencap(serial, raw=True),
+                                          args.frames, screen))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+批量动作测试台
+
+任务 "点击搜索框 → 输入关键词 → 点击搜索 → 完成"，假模型 (固定延迟) 分别:
+- single:   每张截图返回一个操作 (原流程，4 次模型调用)
+- batch:    一次返回 3 个操作，Helper 用 /batch 一次执行
+- fallback: 同 batch，但 Helper 不支持 /batch，客户端逐个执行
+
+用法:
+    python benchmarks/bench_batch.py [--model-latency 1.0] [--helper-latency 0.02]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+# 对比的是模型调用次数，不能让之前运行留下的决策缓存 / 轨迹命中
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+
+from stub_helper import ACTION_PATHS, StubHelper
+from autoglm_hybrid import AutoGLMAgent, PhoneController
+
+SEARCH_STEPS = [
+    {'action': 'tap', 'params': {'x': 540, 'y': 150}},
+    {'action': 'input', 'params': {'text': '蓝牙耳机'}},
+    {'action': 'tap', 'params': {'x': 980, 'y': 150}},
+]
+
+
+class FakeModel:
+    def __init__(self, latency: float, batch: bool):
+        self.latency = latency
+        self.batch = batch
+        self.calls = 0
+
+    def analyze_screen(self, image, task, history):
+        self.calls += 1
+        time.sleep(self.latency)
+        done_steps = sum(1 for h in history if 'step' in h)
+        if self.batch:
+            if done_steps == 0:
+                return {'action': 'batch', 'params': {'actions': SEARCH_STEPS},
+                        'model_params': {'actions': SEARCH_STEPS}, 'thought': '搜索'}
+        elif done_steps < len(SEARCH_STEPS):
+            step = SEARCH_STEPS[done_steps]
+            return dict(step, thought='单步')
+        return {'action': 'done', 'params': {}, 'thought': '完成'}
+
+
+def run(mode: str, args) -> dict:
+    animations = {path: args.animation for path in ACTION_PATHS}
+    with StubHelper(image_format="JPEG", latency=args.helper_latency, animations=animations,
+                    batch=(mode == "batch")) as stub:
+        model = FakeModel(args.model_latency, batch=(mode != "single"))
+        agent = AutoGLMAgent(PhoneController(stub.url), model)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run("搜索蓝牙耳机")
+        elapsed = time.perf_counter() - t0
+        actions = [path for path, _ in stub.actions]
+        requests = stub.requests
+    assert ok and actions == ["/tap", "/input", "/tap"], actions
+    return {"elapsed": elapsed, "model_calls": model.calls, "requests": requests}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    parser.add_argument("--helper-latency", type=float, default=0.02)
+    parser.add_argument("--animation", type=float, default=0.3)
+    args = parser.parse_args()
+
+    print(f"{'模式':<10}{'耗时':>9}{'模型调用':>10}{'HTTP请求':>10}")
+    for mode in ("single", "batch", "fallback"):
+        r = run(mode, args)
+        print(f"{mode:<10}{r['elapsed']:>8.2f}s{r['model_calls']:>10}{r['requests']:>10}")
+
+
+if __name__ == "__main__":
+    main()
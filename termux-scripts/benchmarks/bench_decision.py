@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+决策缓存测试台
+
+同一个任务 "点击搜索框 → 输入关键词 → 点击搜索 → 完成" 在同样的页面上重复运行 (假模型固定延迟):
+- 第 1 次全部调用模型，验证通过的决策写入缓存
+- 之后 (任务写法略有不同，规范化后相同) 全部命中缓存，不再调用模型
+- 模拟界面改版: 输入后屏幕不再变化，重放的决策被删除并回退到模型
+
+用法:
+    python benchmarks/bench_decision.py [--runs 5] [--model-latency 1.0]
+"""
+
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+# 只测决策缓存，不让轨迹回放接管重复运行
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+
+from stub_helper import ACTION_PATHS, StubHelper
+from autoglm_hybrid import AutoGLMAgent, PhoneController
+from decision_cache import DecisionCache
+
+SEARCH_STEPS = [
+    {'action': 'tap', 'params': {'x': 540, 'y': 150}},
+    {'action': 'input', 'params': {'text': '蓝牙耳机'}},
+    {'action': 'tap', 'params': {'x': 980, 'y': 150}},
+]
+TASKS = ["搜索蓝牙耳机", "搜索 蓝牙耳机！", "搜索蓝牙耳机。"]
+
+
+class FakeModel:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def analyze_screen(self, image, task, history):
+        self.calls += 1
+        time.sleep(self.latency)
+        done_steps = sum(1 for h in history if 'step' in h and h['action'] != 'wait')
+        if done_steps < len(SEARCH_STEPS):
+            step = SEARCH_STEPS[done_steps]
+            return dict(step, model_params=step['params'], thought='单步')
+        return {'action': 'done', 'params': {}, 'model_params': {}, 'thought': '完成'}
+
+
+def run(cache: DecisionCache, task: str, args, animations: dict, check_actions: bool = True) -> dict:
+    with StubHelper(image_format="JPEG", animations=animations) as stub:
+        model = FakeModel(args.model_latency)
+        agent = AutoGLMAgent(PhoneController(stub.url), model, decision_cache=cache)
+        before = cache.stats()
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run(task)
+        elapsed = time.perf_counter() - t0
+        actions = [path for path, _ in stub.actions]
+    after = cache.stats()
+    assert ok, actions
+    if check_actions:
+        assert actions == ["/tap", "/input", "/tap"], actions
+    return {
+        "elapsed": elapsed,
+        "model_calls": model.calls,
+        "hits": after["hits"] - before["hits"],
+        "lookups": after["lookups"] - before["lookups"],
+        "invalidated": after["invalidated"] - before["invalidated"],
+        "entries": after["entries"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    parser.add_argument("--animation", type=float, default=0.2)
+    args = parser.parse_args()
+
+    animations = {path: args.animation for path in ACTION_PATHS}
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = DecisionCache(os.path.join(tmp, "decisions.db"))
+        print(f"{'运行':<18}{'耗时':>8}{'模型调用':>10}{'缓存命中':>10}{'失效':>6}{'条目':>6}")
+
+        def show(label, r):
+            print(f"{label:<18}{r['elapsed']:>7.2f}s{r['model_calls']:>10}"
+                  f"{r['hits']:>7}/{r['lookups']:<2}{r['invalidated']:>6}{r['entries']:>6}")
+
+        total_calls = 0
+        for i in range(args.runs):
+            task = TASKS[i % len(TASKS)]
+            r = run(cache, task, args, animations)
+            total_calls += r["model_calls"]
+            show(f"#{i + 1} {task}", r)
+        baseline = args.runs * (len(SEARCH_STEPS) + 1)
+        s = cache.stats()
+        print(f"\n共 {args.runs} 次: 模型调用 {total_calls}/{baseline}，"
+              f"命中率 {s['hit_rate']:.0%}，节省模型调用 {s['model_calls_saved']} 次")
+
+        # 界面改版: 输入后屏幕不再变化
+        changed = dict(animations, **{"/input": None})
+        show("改版后", run(cache, TASKS[0], args, changed, check_actions=False))
+        show("改版后再次", run(cache, TASKS[0], args, changed, check_actions=False))
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
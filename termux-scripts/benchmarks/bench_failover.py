@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+后端故障切换测试台
+
+模拟 Helper (StubHelper) + 假 adb (fake_adb)，连续点击过程中:
+1. 停掉 Helper，观察切换到 LADB 的耗时
+2. 重新启动 Helper，观察后台探测后切回无障碍服务
+
+每个动作输出由哪个后端完成和耗时。
+
+用法:
+    python benchmarks/bench_failover.py [--actions 40] [--interval 0.2]
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import fake_adb
+from stub_helper import StubHelper
+from phone_controller import PhoneController
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--actions", type=int, default=40)
+    parser.add_argument("--interval", type=float, default=0.2, help="动作间隔 (秒)")
+    parser.add_argument("--kill-at", type=int, default=5, help="第几个动作前停掉 Helper")
+    parser.add_argument("--restore-at", type=int, default=15, help="第几个动作前恢复 Helper")
+    args = parser.parse_args()
+
+    logging.getLogger("PhoneController").setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(fake_adb.install(tmp, latency=0.05))
+        stub = StubHelper().start()
+        port = stub.server.server_address[1]
+        controller = PhoneController(stub.url)
+
+        served = []
+        for i in range(args.actions):
+            if i == args.kill_at:
+                stub.stop()
+                print("--- Helper 已停止 ---")
+            if i == args.restore_at:
+                stub = StubHelper(port=port).start()
+                print("--- Helper 已恢复 ---")
+            t0 = time.perf_counter()
+            ok = controller.tap(540, 400 + i)
+            elapsed = time.perf_counter() - t0
+            served.append(controller.last_backend)
+            print(f"#{i:<3} {'✅' if ok else '❌'} {controller.last_backend:<14} {elapsed * 1000:7.1f}ms")
+            time.sleep(args.interval)
+
+        stub.stop()
+        stats = controller.backend_stats()
+        controller.close()
+
+    print(f"\n当前后端: {stats['current']}")
+    for name, h in stats["backends"].items():
+        print(f"{name:<14} 完成 {h['served']:>3} 次，降级 {h['failovers']} 次，"
+              f"成功率 {h['success_rate']:.0%}，平均 {h['avg_latency'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+多设备并发调度测试台
+
+启动 N 个模拟 Helper (每个动作后带动画)，用一个假模型 (固定延迟，
+每个任务走 steps 步后返回 done) 跑同一批任务，对比:
+- 串行: 1 台设备依次执行
+- 并发: N 台设备同时执行，共享模型限速器
+
+用法:
+    python benchmarks/bench_fleet.py [--devices 4] [--tasks 8] [--model-latency 0.5]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import threading
+import time
+
+# 对比的是模型调用次数，不能让之前运行留下的决策缓存 / 轨迹命中
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+
+from stub_helper import ACTION_PATHS, StubHelper
+from autoglm_hybrid import AutoGLMAgent, PhoneController
+from fleet import FleetRunner, ModelRateLimiter, print_report
+
+
+class FakeModel:
+    """线程安全的假模型: 每个任务点击 steps 次后完成"""
+
+    def __init__(self, latency: float, steps: int):
+        self.latency = latency
+        self.steps = steps
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def analyze_screen(self, image, task, history):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        done = sum(1 for h in history if 'step' in h) >= self.steps
+        if done:
+            return {"thought": "完成", "action": "done", "params": {}}
+        return {"thought": "点击", "action": "tap",
+                "params": {"x": 540, "y": 400 + 100 * len(history)}}
+
+
+def run(devices: int, tasks: int, args) -> dict:
+    animations = {path: args.animation for path in ACTION_PATHS}
+    model = FakeModel(args.model_latency, args.steps)
+    with contextlib.ExitStack() as stack:
+        stubs = [stack.enter_context(StubHelper(image_format="JPEG", latency=args.helper_latency,
+                                                animations=animations))
+                 for _ in range(devices)]
+
+        def make_agent(url, limiter):
+            return AutoGLMAgent(PhoneController(url), model, limiter)
+
+        async def main():
+            limiter = None
+            if args.model_rps:
+                limiter = ModelRateLimiter(args.model_rps, burst=devices)
+            runner = FleetRunner([s.url for s in stubs], make_agent, limiter=limiter)
+            return await runner.run([f"任务 {i}" for i in range(tasks)])
+
+        with contextlib.redirect_stdout(None):
+            report = asyncio.run(main())
+    return report, model.calls
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=3, help="每个任务的点击步数")
+    parser.add_argument("--model-latency", type=float, default=0.5)
+    parser.add_argument("--helper-latency", type=float, default=0.01)
+    parser.add_argument("--animation", type=float, default=0.3)
+    parser.add_argument("--model-rps", type=float, default=0, help="模型限速，0 不限")
+    args = parser.parse_args()
+
+    serial, serial_calls = run(1, args.tasks, args)
+    fleet, fleet_calls = run(args.devices, args.tasks, args)
+    print(f"串行 (1 台)，模型调用 {serial_calls} 次:")
+    print_report(serial)
+    print(f"\n并发 ({args.devices} 台)，模型调用 {fleet_calls} 次:")
+    print_report(fleet)
+    speedup = serial["total"]["wall"] / fleet["total"]["wall"]
+    print(f"\n加速比 {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Web 控制台任务队列测试台
+
+几台 stub_helper 作为设备，假模型每次分析耗时 --model-latency 秒，每个任务 --steps 步后完成。
+通过 HTTP 接口批量提交任务，检查:
+- 优先级: 高优先级的任务先开始，同优先级按提交顺序
+- 指定设备的任务只在那台设备上执行
+- 取消: 排队中的任务直接出队，运行中的任务在下一步之前停下
+- /api/jobs/<id> 能取到每个任务的日志和结果
+并对比 1 台设备和 N 台设备跑完同一批任务的总耗时和设备利用率。
+
+用法:
+    python benchmarks/bench_jobs.py [--devices 3] [--tasks 12] [--steps 3]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from stub_helper import StubHelper
+
+# 设备列表在导入 autoglm_web 时读取，先解析设备数
+_pre = argparse.ArgumentParser(add_help=False)
+_pre.add_argument("--devices", type=int, default=3)
+_stubs = [StubHelper(image_format="JPEG").start() for _ in range(_pre.parse_known_args()[0].devices)]
+os.environ["AUTOGLM_WEB_DEVICES"] = ",".join(stub.url for stub in _stubs)
+import autoglm_web as web  # noqa: E402
+from jobs import CANCELLED, DONE  # noqa: E402
+
+
+class FakeAI:
+    """每个任务 steps 步后完成"""
+
+    def __init__(self, steps: int, latency: float):
+        self.steps = steps
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def analyze(self, img, task, history=None):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        if len(history) + 1 >= self.steps:
+            return {"action": "done", "params": {}, "thought": f"{task} 完成"}
+        return {"action": "tap", "params": {"x": 540, "y": 270}, "thought": "点击"}
+
+
+def api(port: int, method: str, path: str, body: dict = None) -> dict:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read())
+
+
+def wait_idle(port: int, timeout: float = 120.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = api(port, "GET", "/api/jobs")["counts"]
+        if not counts["queued"] and not counts["running"]:
+            return counts
+        time.sleep(0.05)
+    raise TimeoutError("任务没有在限定时间内跑完")
+
+
+def new_queue(names: list):
+    """换一个新的任务队列，只启动 names 这几台设备的工作线程"""
+    web.jobs.close()
+    web.jobs = web.JobQueue(on_change=web.on_job_change, on_log=web.on_job_log)
+    web.jobs.start_workers({name: web.devices_by_name[name] for name in names}, web.run_job)
+
+
+def run_batch(port: int, names: list, tasks: int, steps: int) -> dict:
+    new_queue(names)
+    t0 = time.perf_counter()
+    api(port, "POST", "/api/jobs", {"tasks": [f"任务{i}" for i in range(tasks)]})
+    counts = wait_idle(port)
+    wall = time.perf_counter() - t0
+    jobs = api(port, "GET", "/api/jobs")["jobs"]
+    busy = sum(j["finished"] - j["started"] for j in jobs)
+    assert counts["done"] == tasks, counts
+    assert all(j["result"]["steps"] == steps for j in jobs), jobs
+    return {"wall": wall, "utilization": busy / (wall * len(names)),
+            "per_device": {n: sum(1 for j in jobs if j["device"] == n) for n in names}}
+
+
+def check_semantics(port: int):
+    names = [d.name for d in web.devices]
+    new_queue(names[:1])
+    # 第一个任务占住设备，其余按优先级排队
+    first = api(port, "POST", "/api/jobs", {"task": "占住设备"})["jobs"][0]
+    while web.jobs.get(first).status != "running":
+        time.sleep(0.01)
+    low = api(port, "POST", "/api/jobs", {"tasks": ["低1", "低2"], "priority": 0})["jobs"]
+    high = api(port, "POST", "/api/jobs", {"task": "高", "priority": 5})["jobs"]
+    dropped = api(port, "POST", "/api/jobs", {"task": "会被取消", "priority": 9})["jobs"][0]
+    assert api(port, "POST", f"/api/jobs/{dropped}/cancel")["ok"]
+    wait_idle(port)
+    jobs = {j["id"]: j for j in api(port, "GET", "/api/jobs")["jobs"]}
+    order = sorted((j for j in jobs.values() if j["started"]), key=lambda j: j["started"])
+    assert [j["id"] for j in order] == [first] + high + low, [j["task"] for j in order]
+    assert jobs[dropped]["status"] == CANCELLED and jobs[dropped]["started"] is None
+    done = api(port, "GET", f"/api/jobs/{first}")
+    assert done["status"] == DONE and done["result"]["ok"] and done["logs"], done
+
+    # 取消运行中的任务: 当前步骤结束后停下
+    new_queue(names)
+    target = names[-1]
+    long_job = api(port, "POST", "/api/jobs", {"task": "长任务", "max_steps": 50, "device": target})["jobs"][0]
+    web.ai.steps, steps_before = 50, web.ai.steps
+    while web.jobs.get(long_job).step < 2:
+        time.sleep(0.01)
+    assert api(port, "POST", f"/api/jobs/{long_job}/cancel")["ok"]
+    wait_idle(port)
+    web.ai.steps = steps_before
+    detail = api(port, "GET", f"/api/jobs/{long_job}")
+    assert detail["status"] == CANCELLED and detail["device"] == target, detail
+    assert detail["step"] < 50 and any("取消" in line for line in detail["logs"]), detail
+
+    print(f"优先级顺序 {[j['task'] for j in order]}，排队中取消的任务没有执行；"
+          f"运行中取消的任务停在第 {detail['step']} 步；结果和日志可查询")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--devices", type=int, default=3)
+    parser.add_argument("--tasks", type=int, default=12)
+    parser.add_argument("--steps", type=int, default=3)
+    parser.add_argument("--model-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    web.print = lambda *a, **k: None  # log() 的控制台输出
+    web.ai = FakeAI(args.steps, args.model_latency)
+    server = web.WebServer(("127.0.0.1", 0), web.Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    check_semantics(port)
+    names = [d.name for d in web.devices]
+    print(f"\n{args.tasks} 个任务，每个 {args.steps} 步，模型 {args.model_latency * 1000:.0f}ms/步")
+    print(f"{'设备数':<8}{'总耗时':>8}{'利用率':>8}  每台设备完成")
+    base = None
+    for count in sorted({1, len(names)}):
+        r = run_batch(port, names[:count], args.tasks, args.steps)
+        base = base or r["wall"]
+        print(f"{count:<8}{r['wall']:>7.2f}s{r['utilization']:>8.0%}  {r['per_device']}"
+              f"  ({base / r['wall']:.1f}x)")
+    web.jobs.close()
+    server.shutdown()
+    server.server_close()
+    for stub in _stubs:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
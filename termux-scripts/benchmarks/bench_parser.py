@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+模型输出解析回归 / 模糊测试 / 微基准
+
+1. 回归: parser_corpus.jsonl 中每条样例的解析结果必须与预期一致
+2. 模糊: 对样例随机截断、插入、替换字符，parse_action 不能抛异常，
+   流式逐字喂入 IncrementalJSONParser 的结果必须与一次性解析一致
+3. 微基准: 对比原来的括号计数 (autoglm_hybrid) 、正则 (autoglm_web) 与 parse_action
+
+用法:
+    python benchmarks/bench_parser.py [--fuzz 20000] [--seed 1]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from action_parser import IncrementalJSONParser, extract_json, parse_action
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_corpus.jsonl")
+FUZZ_CHARS = '{}[]":,\\ \n\'ax1'
+
+
+def load_corpus() -> list:
+    with open(CORPUS, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def legacy_brace_scan(content: str) -> dict:
+    """原 autoglm_hybrid._parse_response 的括号计数"""
+    try:
+        content = content.strip()
+        if content.startswith("```"):
+            lines = content.split("\n")
+            content = "\n".join(lines[1:-1] if lines[-1].startswith("```") else lines[1:])
+        try:
+            return json.loads(content)
+        except Exception:
+            pass
+        start = content.find('{')
+        if start != -1:
+            depth = 0
+            for i, c in enumerate(content[start:], start):
+                if c == '{':
+                    depth += 1
+                elif c == '}':
+                    depth -= 1
+                if depth == 0:
+                    return json.loads(content[start:i + 1])
+        return {"action": "wait", "params": {}}
+    except Exception:
+        return {"action": "wait", "params": {}}
+
+
+def legacy_regex(content: str) -> dict:
+    """原 autoglm_web.AIModel.analyze 的正则"""
+    try:
+        if content.startswith("```"):
+            content = "\n".join(content.split("\n")[1:-1])
+        match = re.search(r'\{[^{}]*\}', content)
+        if match:
+            return json.loads(match.group())
+    except Exception:
+        pass
+    return {"action": "wait", "params": {}}
+
+
+def check_corpus(corpus: list) -> int:
+    failures = 0
+    for case in corpus:
+        parsed = parse_action(case["input"])
+        if "error" in case:
+            ok = [e.code for e in parsed.errors][:1] == [case["error"]] and parsed.action == "wait"
+            got = [e.code for e in parsed.errors]
+        else:
+            ok = parsed.ok and parsed.action == case["action"] and parsed.params == case["params"]
+            got = (parsed.action, parsed.params, [e.code for e in parsed.errors])
+        if not ok:
+            failures += 1
+            print(f"  ❌ {case['name']}: {got}")
+    return failures
+
+
+def legacy_correct(corpus: list, parse) -> int:
+    """旧解析器在回归样例 (不含错误样例) 上的正确数"""
+    correct = 0
+    for case in corpus:
+        if "error" in case:
+            continue
+        result = parse(case["input"])
+        if result.get("action") == case["action"] and result.get("params", {}) == case["params"]:
+            correct += 1
+    return correct
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    op = rng.randrange(4)
+    pos = rng.randrange(len(text) + 1)
+    if op == 0:
+        return text[:pos]
+    if op == 1:
+        return text[:pos] + rng.choice(FUZZ_CHARS) + text[pos:]
+    if op == 2 and pos < len(text):
+        return text[:pos] + rng.choice(FUZZ_CHARS) + text[pos + 1:]
+    return text[:pos] + text[pos + 1:]
+
+
+def fuzz(corpus: list, rounds: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(rounds):
+        text = rng.choice(corpus)["input"]
+        for _ in range(rng.randint(1, 4)):
+            text = mutate(text, rng)
+        try:
+            parse_action(text)
+            obj, _ = extract_json(text)
+        except Exception as e:
+            failures += 1
+            print(f"  ❌ 抛出异常 {e!r}: {text!r}")
+            continue
+        # 第一个对象本身合法时，流式逐块喂入解析出的顶层字段应与完整解析一致
+        parser = IncrementalJSONParser()
+        pos = 0
+        while pos < len(text):
+            step = rng.randint(1, 8)
+            parser.feed(text[pos:pos + step])
+            pos += step
+        if parser.complete:
+            try:
+                whole = json.loads(parser.object_text())
+            except ValueError:
+                continue
+            if whole != obj:
+                continue
+            for key, value in parser.fields.items():
+                if obj.get(key) != value:
+                    failures += 1
+                    print(f"  ❌ 流式字段不一致 {key}: {text!r}")
+                    break
+    return failures
+
+
+def bench(corpus: list, parse, repeats: int) -> float:
+    inputs = [case["input"] for case in corpus]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for text in inputs:
+            parse(text)
+    return (time.perf_counter() - start) / (repeats * len(inputs)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fuzz", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=300)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    positive = sum(1 for case in corpus if "error" not in case)
+    print(f"回归样例 {len(corpus)} 条")
+    failures = check_corpus(corpus)
+    print(f"  parse_action 通过 {len(corpus) - failures}/{len(corpus)}")
+    print(f"  原括号计数正确 {legacy_correct(corpus, legacy_brace_scan)}/{positive}，"
+          f"原正则正确 {legacy_correct(corpus, legacy_regex)}/{positive}")
+
+    print(f"\n模糊测试 {args.fuzz} 轮")
+    fuzz_failures = fuzz(corpus, args.fuzz, args.seed)
+    print(f"  失败 {fuzz_failures}")
+
+    print("\n每条耗时")
+    for name, parse in (("括号计数", legacy_brace_scan), ("正则", legacy_regex),
+                        ("parse_action", parse_action)):
+        print(f"  {name:<14}{bench(corpus, parse, args.repeats):>8.1f}µs")
+
+    sys.exit(1 if failures or fuzz_failures else 0)
+
+
+if __name__ == "__main__":
+    main()
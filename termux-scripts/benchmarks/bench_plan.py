@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+规划模式测试台
+
+任务 "点击搜索框 → 输入关键词 → 点击搜索 → 完成"，假模型 (固定延迟) 分别:
+- single:   每张截图返回一个操作
+- plan:     一次返回剩余的全部操作及预期，代理按计划执行
+- diverged: 同 plan，但输入后屏幕没有变化 (模拟输入没生效)，应检测到偏离并重新询问模型
+
+用法:
+    python benchmarks/bench_plan.py [--model-latency 1.0]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+# 对比的是模型调用次数，不能让之前运行留下的决策缓存 / 轨迹命中
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+
+from stub_helper import ACTION_PATHS, StubHelper
+from autoglm_hybrid import AutoGLMAgent, PhoneController
+
+SEARCH_STEPS = [
+    # 模拟 Helper 的每个动作都会换页，这里不标记 same_page
+    {'action': 'tap', 'params': {'x': 540, 'y': 150}, 'expect': '进入搜索页'},
+    {'action': 'input', 'params': {'text': '蓝牙耳机'}, 'expect': '搜索框显示文字'},
+    {'action': 'tap', 'params': {'x': 980, 'y': 150}, 'expect': '显示搜索结果'},
+]
+
+
+class FakeModel:
+    def __init__(self, latency: float, plan: bool):
+        self.latency = latency
+        self.plan = plan
+        self.calls = 0
+
+    def analyze_screen(self, image, task, history):
+        self.calls += 1
+        time.sleep(self.latency)
+        done_steps = sum(1 for h in history if 'step' in h)
+        if done_steps >= len(SEARCH_STEPS):
+            return {'action': 'done', 'params': {}, 'thought': '完成'}
+        remaining = [dict(step, model_params=step['params']) for step in SEARCH_STEPS[done_steps:]]
+        if not self.plan:
+            return dict(remaining[0], thought='单步')
+        return dict(remaining[0], plan=remaining[1:], thought='规划')
+
+
+def run(mode: str, args) -> dict:
+    animations = {path: args.animation for path in ACTION_PATHS}
+    if mode == "diverged":
+        animations["/input"] = None
+    with StubHelper(image_format="JPEG", animations=animations) as stub:
+        model = FakeModel(args.model_latency, plan=(mode != "single"))
+        agent = AutoGLMAgent(PhoneController(stub.url), model)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run("搜索蓝牙耳机")
+        elapsed = time.perf_counter() - t0
+        actions = [path for path, _ in stub.actions]
+    assert ok, "任务失败"
+    return {"elapsed": elapsed, "model_calls": model.calls, "actions": len(actions),
+            "planned": agent.engine.planned_steps, "diverged": agent.engine.plan_divergences}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    parser.add_argument("--animation", type=float, default=0.3)
+    args = parser.parse_args()
+
+    print(f"{'模式':<10}{'耗时':>9}{'模型调用':>10}{'动作数':>8}{'按计划':>8}{'偏离':>6}")
+    for mode in ("single", "plan", "diverged"):
+        r = run(mode, args)
+        print(f"{mode:<10}{r['elapsed']:>8.2f}s{r['model_calls']:>10}{r['actions']:>8}"
+              f"{r['planned']:>8}{r['diverged']:>6}")
+
+
+if __name__ == "__main__":
+    main()
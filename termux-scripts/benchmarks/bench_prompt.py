@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+提示词前缀缓存 / 紧凑历史测试台
+
+用 fake_openai 模拟支持前缀缓存的模型服务 (未命中缓存的输入 token 按 prefill_per_token 计预填充耗时)，
+跑一个 N 步的任务 (历史逐步变长)，对比:
+- legacy:  原来的单条 user 消息，任务和历史在最前面，后面是完整说明，历史为自由文本
+- builder: PromptBuilder，静态 system 前缀 + 紧凑历史
+
+用法:
+    python benchmarks/bench_prompt.py [--steps 12] [--prefill 0.0005]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+
+os.environ.setdefault("DOUBAO_API_KEY", "bench")
+
+from fake_openai import FakeOpenAI
+from stub_helper import make_screen
+import autoglm_hybrid
+from autoglm_hybrid import MAX_BATCH_ACTIONS, DoubaoVisionModel
+from prompt_builder import PromptBuilder, UsageTracker, estimate_tokens, track_usage
+
+TASK = "打开淘宝搜索蓝牙耳机，按销量排序后打开第一个商品"
+REPLY = json.dumps({
+    "action": "tap",
+    "params": {"x": 540, "y": 150},
+    "thought": "页面顶部是搜索框，点击它进入搜索页面，然后就可以输入要搜索的商品名称。",
+}, ensure_ascii=False)
+
+
+class LegacyPromptBuilder(PromptBuilder):
+    """原 analyze_screen 里的提示词: 每次整段重建，放在一条 user 消息里"""
+
+    def user_text(self, task, history, width, height):
+        history_text = ""
+        if history:
+            history_text = "\n【已执行的操作】\n" + "\n".join(
+                f"- {h['thought']}: {h['action']} {h.get('params', '')}".rstrip() for h in history[-5:])
+        return f"""分析手机屏幕截图，完成任务：{task}
+{history_text}
+
+屏幕尺寸：{width}x{height}像素
+
+可用操作：
+- launch: 直接启动应用（推荐）{{"app":"应用名"}} 支持：淘宝/京东/微信/支付宝/抖音/拼多多/美团/高德地图/微博/QQ/bilibili/小红书
+- tap: 点击屏幕位置 {{"x":数字,"y":数字}}
+- input: 输入文字 {{"text":"文字"}}
+- swipe: 滑动 {{"x1":起点x,"y1":起点y,"x2":终点x,"y2":终点y}}
+- back: 返回 {{}}
+- done: 任务完成 {{}}
+
+重要规则：
+1. 如果任务是"打开XX应用"，优先使用 launch 操作直接启动
+2. 如果需要搜索，先用 launch 打开应用，再 tap 点击搜索框，再 input 输入
+3. 坐标(0,0)在左上角，({width},{height})在右下角
+4. 当前截图就能确定的连续操作（如 点击搜索框→输入文字）可以一次返回，最多{self.max_batch_actions}个；
+   后一步需要看到新页面才能确定时，只返回一个操作；done 必须单独返回
+
+返回JSON格式：{{"action":"操作名","params":{{}},"thought":"说明"}}
+连续操作：{{"actions":[{{"action":"操作名","params":{{}}}},...],"thought":"说明"}}
+
+示例：
+- 打开淘宝：{{"action":"launch","params":{{"app":"淘宝"}},"thought":"启动淘宝应用"}}
+- 点击搜索框：{{"action":"tap","params":{{"x":540,"y":150}},"thought":"点击顶部搜索框"}}
+- 输入关键词：{{"action":"input","params":{{"text":"蓝牙耳机"}},"thought":"输入搜索词"}}
+- 点击搜索框并输入：{{"actions":[{{"action":"tap","params":{{"x":540,"y":150}}}},{{"action":"input","params":{{"text":"蓝牙耳机"}}}}],"thought":"点击搜索框后输入搜索词"}}
+- 完成：{{"action":"done","params":{{}},"thought":"搜索结果已显示"}}
+
+现在返回下一步操作："""
+
+    def build(self, task, history, width, height, image_url):
+        return [{"role": "user", "content": [
+            {"type": "text", "text": self.user_text(task, history, width, height)},
+            {"type": "image_url", "image_url": {"url": image_url}},
+        ]}]
+
+    def estimate(self, messages, width, height):
+        return estimate_tokens(messages[0]["content"][0]["text"])
+
+
+def run(model: DoubaoVisionModel, builder: PromptBuilder, steps: int) -> UsageTracker:
+    model.prompt_builder = builder
+    usage = UsageTracker()
+    history = []
+    for step in range(steps):
+        # 每步截图不同，避免图片部分被当作公共前缀
+        image = make_screen(seed=step)
+        with contextlib.redirect_stdout(None), track_usage(usage):
+            result = model.analyze_screen(image, TASK, history)
+            pending = result.pop('pending', None)
+            if pending is not None:
+                result['thought'] = pending.result(timeout=30)['thought']
+        history.append({'step': step, 'action': result['action'],
+                        'params': result['model_params'], 'thought': result['thought']})
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.15, help="首字延迟 (秒)")
+    parser.add_argument("--prefill", type=float, default=0.0005, help="每个未缓存输入 token 的耗时 (秒)")
+    parser.add_argument("--image-tokens", type=int, default=800)
+    args = parser.parse_args()
+
+    autoglm_hybrid.DOUBAO_API_KEY = "bench"
+    builders = {
+        "legacy": LegacyPromptBuilder(MAX_BATCH_ACTIONS),
+        "builder": PromptBuilder(MAX_BATCH_ACTIONS),
+    }
+    print(f"{args.steps} 步任务，图片按 {args.image_tokens} tokens 计，"
+          f"预填充 {args.prefill * 1000:.1f}ms/token")
+    print(f"{'模式':<10}{'每步输入':>10}{'缓存命中':>10}{'未缓存':>10}{'p50':>9}{'p95':>9}")
+    for name, builder in builders.items():
+        with FakeOpenAI(latency=args.latency, token_delay=0.005, chunk_size=8,
+                        prefill_per_token=args.prefill, image_tokens=args.image_tokens,
+                        reply=lambda body: REPLY) as fake:
+            model = DoubaoVisionModel()
+            model.api_url = fake.url
+            usage = run(model, builder, args.steps)
+        s = usage.summary()
+        print(f"{name:<10}{s['avg_prompt_tokens']:>10.0f}{s['cache_ratio']:>10.0%}"
+              f"{s['uncached_tokens'] / s['calls']:>10.0f}"
+              f"{s['latency_p50']:>8.2f}s{s['latency_p95']:>8.2f}s")
+        print(f"  {usage.report()}")
+
+
+if __name__ == "__main__":
+    main()
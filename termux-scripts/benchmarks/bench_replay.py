@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+轨迹录制 / 回放测试台
+
+任务 "点击搜索框 → 输入关键词 → 点击搜索 → 完成"，假模型固定延迟:
+- record:   第一次运行，全部调用模型，成功后录制轨迹
+- replay:   按轨迹回放，不调用模型
+- diverged: 界面改版 (输入后屏幕不再变化)，回放到不一致的一步交给模型，成功后重新录制
+- replay2:  按新轨迹回放
+
+用法:
+    python benchmarks/bench_replay.py [--model-latency 2.0]
+"""
+
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+# 只测轨迹回放，不让决策缓存参与
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+
+from stub_helper import ACTION_PATHS, StubHelper
+from autoglm_hybrid import AutoGLMAgent, PhoneController
+from trajectory import TrajectoryStore
+
+SEARCH_STEPS = [
+    {'action': 'tap', 'params': {'x': 540, 'y': 150}},
+    {'action': 'input', 'params': {'text': '蓝牙耳机'}},
+    {'action': 'tap', 'params': {'x': 980, 'y': 150}},
+]
+TASK = "搜索蓝牙耳机"
+
+
+class FakeModel:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def analyze_screen(self, image, task, history):
+        self.calls += 1
+        time.sleep(self.latency)
+        done_steps = sum(1 for h in history if 'step' in h and h['action'] != 'wait')
+        if done_steps < len(SEARCH_STEPS):
+            step = SEARCH_STEPS[done_steps]
+            return dict(step, model_params=step['params'], thought='单步')
+        return {'action': 'done', 'params': {}, 'model_params': {}, 'thought': '完成'}
+
+
+def run(store: TrajectoryStore, args, animations: dict) -> dict:
+    with StubHelper(image_format="JPEG", animations=animations) as stub:
+        model = FakeModel(args.model_latency)
+        agent = AutoGLMAgent(PhoneController(stub.url), model, trajectories=store)
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run(TASK)
+        elapsed = time.perf_counter() - t0
+        actions = [path for path, _ in stub.actions]
+    assert ok and actions == ["/tap", "/input", "/tap"], actions
+    return {"elapsed": elapsed, "model_calls": model.calls,
+            "replayed": agent.engine.replayed_steps, "diverged": agent.engine.replay_diverged}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-latency", type=float, default=2.0)
+    parser.add_argument("--animation", type=float, default=0.2)
+    args = parser.parse_args()
+
+    animations = {path: args.animation for path in ACTION_PATHS}
+    # 界面改版: 输入后屏幕不再变化，录制时的第 3 步屏幕对不上
+    changed = dict(animations, **{"/input": None})
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TrajectoryStore(tmp)
+        print(f"{'运行':<10}{'耗时':>8}{'模型调用':>10}{'回放步数':>10}{'偏离':>6}")
+        for name, anim in (("record", animations), ("replay", animations),
+                           ("diverged", changed), ("replay2", changed)):
+            r = run(store, args, anim)
+            print(f"{name:<10}{r['elapsed']:>7.2f}s{r['model_calls']:>10}{r['replayed']:>10}"
+                  f"{'是' if r['diverged'] else '否':>6}")
+        size = os.path.getsize(store.path_for(TASK))
+        print(f"\n轨迹文件 {size} 字节: {store.list()}")
+
+
+if __name__ == "__main__":
+    main()
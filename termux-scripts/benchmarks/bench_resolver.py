@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+本地解析器测试台
+
+任务 "搜索蓝牙耳机"，页面依次为:
+    0 首页 + 广告弹窗 (只有图片，没有无障碍文字) -> 1 首页 -> 2 搜索页 -> 3 已输入 -> 4 结果页
+- model: 关闭本地解析，每一步都调用 (假) 模型
+- local: 模板库里有弹窗的关闭按钮，控件树规则在输入后点击 "搜索"
+另外在每个页面上试匹配模板，检查只在弹窗页命中，并给出单次匹配耗时。
+
+用法:
+    python benchmarks/bench_resolver.py [--model-latency 1.0]
+"""
+
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+
+from PIL import Image, ImageDraw
+
+from stub_helper import ACTION_PATHS, StubHelper, load_hierarchies, make_screen
+from autoglm_hybrid import AutoGLMAgent, PhoneController
+from local_resolver import (ResolveContext, ResolverChain, TemplateLibrary, TemplateResolver,
+                            TextRuleResolver)
+
+TASK = "搜索蓝牙耳机"
+CLOSE_BOX = (470, 1430, 610, 1570)  # 弹窗关闭按钮
+CLOSE_CENTER = (540, 1500)
+# 每个页面上模型给出的操作
+MODEL_STEPS = {
+    0: {'action': 'tap', 'params': {'x': 540, 'y': 1500}},
+    1: {'action': 'tap', 'params': {'x': 540, 'y': 270}},
+    2: {'action': 'input', 'params': {'text': '蓝牙耳机'}},
+    3: {'action': 'tap', 'params': {'x': 960, 'y': 270}},
+    4: {'action': 'done', 'params': {}},
+}
+
+
+def popup_screen(seed: int) -> Image.Image:
+    img = make_screen(seed=seed)
+    draw = ImageDraw.Draw(img)
+    draw.rounded_rectangle([140, 600, 940, 1350], radius=40, fill=(255, 210, 60))
+    draw.text((300, 900), "SALE 50%", fill=(200, 0, 0))
+    draw.ellipse([480, 1440, 600, 1560], outline=(255, 255, 255), width=8, fill=(60, 60, 60))
+    draw.line([505, 1465, 575, 1535], fill=(255, 255, 255), width=10)
+    draw.line([575, 1465, 505, 1535], fill=(255, 255, 255), width=10)
+    return img
+
+
+class PopupStub(StubHelper):
+    """第 0 页带广告弹窗"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.set_screen(popup_screen(0))
+
+
+class FakeModel:
+    def __init__(self, stub: StubHelper, latency: float):
+        self.stub = stub
+        self.latency = latency
+        self.calls = 0
+
+    def analyze_screen(self, image, task, history):
+        self.calls += 1
+        time.sleep(self.latency)
+        step = MODEL_STEPS[min(self.stub.page, 4)]
+        return dict(step, model_params=step['params'], thought='模型')
+
+
+def hierarchies() -> list:
+    home, search, typed, results = load_hierarchies()
+    return [home, home, search, typed, results]
+
+
+def run(resolvers, args) -> dict:
+    animations = {path: args.animation for path in ACTION_PATHS}
+    with PopupStub(image_format="JPEG", animations=animations, hierarchies=hierarchies()) as stub:
+        model = FakeModel(stub, args.model_latency)
+        agent = AutoGLMAgent(PhoneController(stub.url), model, resolvers=resolvers)
+        if resolvers is None:
+            agent.resolvers = None
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run(TASK)
+        elapsed = time.perf_counter() - t0
+        actions = list(stub.actions)
+    assert ok, actions
+    assert [path for path, _ in actions] == ["/tap", "/tap", "/input", "/tap"], actions
+    return {"elapsed": elapsed, "model_calls": model.calls, "actions": actions,
+            "resolved": agent.engine.resolved_steps}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-latency", type=float, default=1.0)
+    parser.add_argument("--animation", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = TemplateLibrary(tmp)
+        library.add("close_popup", popup_screen(0), CLOSE_BOX)
+        templates = library.load()
+        full = TemplateResolver(templates)
+        regional = TemplateResolver(TemplateLibrary(tmp).load())
+        regional.templates[0].region = [0.3, 0.5, 0.7, 0.75]
+
+        # 每个页面试匹配: 只应该在弹窗页命中，且坐标是关闭按钮中心
+        pages = [popup_screen(0)] + [make_screen(seed=i) for i in range(1, 5)]
+        print(f"{'页面':<6}{'全屏匹配':>14}{'耗时':>9}{'限定区域':>14}{'耗时':>9}")
+        for i, page in enumerate(pages):
+            row = []
+            for resolver in (full, regional):
+                ctx = ResolveContext(TASK, page, [])
+                start = time.perf_counter()
+                match = resolver.match(ctx, resolver.templates[0])
+                row.append((match, (time.perf_counter() - start) * 1000))
+                if i == 0:
+                    assert match and abs(match[0] - CLOSE_CENTER[0]) <= 8 \
+                        and abs(match[1] - CLOSE_CENTER[1]) <= 8, match
+                else:
+                    assert match is None, (i, match)
+            print(f"{i:<6}" + "".join(f"{str(m[:2]) if m else '-':>14}{ms:>7.1f}ms" for m, ms in row))
+
+        print(f"\n{'模式':<8}{'耗时':>8}{'模型调用':>10}{'本地解析':>10}")
+        r = run(None, args)
+        print(f"{'model':<8}{r['elapsed']:>7.2f}s{r['model_calls']:>10}{r['resolved']:>10}")
+        chain = ResolverChain([TextRuleResolver(), TemplateResolver(templates)])
+        r = run(chain, args)
+        print(f"{'local':<8}{r['elapsed']:>7.2f}s{r['model_calls']:>10}{r['resolved']:>10}")
+        taps = [(body['x'], body['y']) for path, body in r['actions'] if path == '/tap']
+        assert abs(taps[0][0] - CLOSE_CENTER[0]) <= 8 and taps[2] == (960, 270), taps
+        for name, s in chain.stats().items():
+            print(f"  {name:<10} 命中 {s['hits']}/{s['attempts']} ({s['hit_rate']:.0%})，"
+                  f"p50 {s['latency_p50'] * 1000:.1f}ms，p95 {s['latency_p95'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+基准: 截图传输格式对比
+
+对每种图片编码 (PNG / JPEG) 分别测试:
+- json:   旧版 Helper，Base64 嵌在 JSON 里
+- binary: 新版 Helper，直接返回 image/* 字节
+
+输出每帧传输字节数、获取+解码耗时、Python 侧峰值内存。
+注意 tracemalloc 只统计 Python 分配 (JSON 文本、Base64 字符串、响应字节)，
+Pillow 的像素缓冲区不在其中，两种格式这部分相同。
+
+用法:
+    python benchmarks/bench_screenshot.py [--frames 10]
+"""
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from stub_helper import StubHelper
+from helper_transport import HelperTransport
+
+
+def measure(stub: StubHelper, frames: int) -> dict:
+    transport = HelperTransport(stub.url)
+    transport.screenshot().load()  # 预热连接和编码缓存
+
+    times, peaks = [], []
+    sent_before = stub.bytes_sent
+    for _ in range(frames):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        img = transport.screenshot()
+        img.load()
+        times.append(time.perf_counter() - t0)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    transport.close()
+    return {
+        "bytes": (stub.bytes_sent - sent_before) / frames,
+        "ms": statistics.median(times) * 1000,
+        "peak": max(peaks),
+        "binary": transport.binary_screenshots > 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'格式':<6}{'传输':<8}{'字节/帧':>12}{'耗时 p50':>12}{'峰值内存':>12}")
+    for image_format in ("PNG", "JPEG"):
+        results = {}
+        for mode, binary in (("json", False), ("binary", True)):
+            with StubHelper(image_format=image_format, binary=binary) as stub:
+                r = measure(stub, args.frames)
+            assert r["binary"] == binary
+            results[mode] = r
+            print(f"{image_format:<6}{mode:<8}{r['bytes'] / 1024:>10.0f}KB"
+                  f"{r['ms']:>10.1f}ms{r['peak'] / 1024:>10.0f}KB")
+        json_r, bin_r = results["json"], results["binary"]
+        print(f"  -> 字节 -{1 - bin_r['bytes'] / json_r['bytes']:.0%}, "
+              f"耗时 -{1 - bin_r['ms'] / json_r['ms']:.0%}, "
+              f"峰值内存 -{1 - bin_r['peak'] / json_r['peak']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+屏幕稳定检测测试台
+
+模拟 Helper 在每次点击后播放已知时长的动画，对比:
+- fixed:  原来的固定等待 (点击后 2.0 秒)
+- settle: SettleDetector 自适应等待
+
+"提前" 表示等待结束时动画仍在播放 (下一步会截到过渡画面)。
+
+用法:
+    python benchmarks/bench_settle.py [--durations 0,0.3,0.8,1.5,2.5]
+"""
+
+import argparse
+import time
+
+from stub_helper import StubHelper
+from helper_transport import HelperTransport
+from settle import SETTLE_PREVIEW_EDGE, SettleDetector
+
+FIXED_TAP_WAIT = 2.0
+
+
+def run_case(duration: float, repeats: int) -> dict:
+    with StubHelper(image_format="JPEG", animations={"/tap": duration}) as stub:
+        transport = HelperTransport(stub.url)
+        detector = SettleDetector(lambda: transport.screenshot(max_edge=SETTLE_PREVIEW_EDGE),
+                                  lambda: (stub.width, stub.height))
+        waits, early = [], 0
+        for _ in range(repeats):
+            transport.call("/tap", {"x": 540, "y": 1200})
+            _, waited = detector.wait("tap")
+            waits.append(waited)
+            if stub.animating():
+                early += 1
+        transport.close()
+    return {
+        "settle": sum(waits) / len(waits),
+        "settle_early": early,
+        "fixed_early": repeats if duration > FIXED_TAP_WAIT else 0,
+        "timeouts": detector.timeouts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--durations", default="0,0.3,0.8,1.5,2.5")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    durations = [float(d) for d in args.durations.split(",")]
+    print(f"{'动画':>6} {'fixed':>8} {'settle':>8} {'fixed提前':>10} {'settle提前':>10} {'超时':>6}")
+    total_fixed = total_settle = 0.0
+    for duration in durations:
+        r = run_case(duration, args.repeats)
+        total_fixed += FIXED_TAP_WAIT
+        total_settle += r["settle"]
+        print(f"{duration:>5.1f}s {FIXED_TAP_WAIT:>7.2f}s {r['settle']:>7.2f}s "
+              f"{r['fixed_early']:>10} {r['settle_early']:>10} {r['timeouts']:>6}")
+    print(f"\n平均每步等待: fixed {total_fixed / len(durations):.2f}s, "
+          f"settle {total_settle / len(durations):.2f}s")
+
+
+if __name__ == "__main__":
+    start = time.time()
+    main()
+    print(f"耗时 {time.time() - start:.1f}s")
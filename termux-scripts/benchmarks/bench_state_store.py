@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+控制台状态存储测试台
+
+一个写线程模拟任务执行 (每次更新 step/thought/action 三个字段并写一行日志)，
+N 个读线程模拟 /api/state: 取状态并序列化成 JSON。三种实现:
+- dict:   最早的做法，全局 dict 直接改，读者不加锁
+- locked: 全局 dict + 一把锁，读者在锁内复制
+- store:  StateStore，读者直接拿不可变快照
+统计读/写吞吐、读延迟 p50/p99，以及读者看到的不一致 (三个字段不属于同一次更新) 和异常。
+另外检查 changes_since: 从任意旧版本回放增量得到的状态与最新快照一致，太旧的版本返回 None。
+
+用法:
+    python benchmarks/bench_state_store.py [--readers 8] [--duration 2]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from state_store import StateStore
+
+INITIAL = {"running": True, "step": 0, "thought": "0", "action": "0", "status": "运行中"}
+MAX_LOGS = 100
+
+
+class DictState:
+    """原来的全局 dict: 逐个字段赋值，日志列表切片后重新赋值"""
+
+    def __init__(self):
+        self.state = dict(INITIAL, logs=[])
+
+    def write(self, i: int):
+        self.state["step"] = i
+        self.state["thought"] = str(i)
+        self.state["action"] = str(i)
+        self.state["logs"].append(f"步骤{i}")
+        self.state["logs"] = self.state["logs"][-MAX_LOGS:]
+
+    def read(self) -> dict:
+        return self.state
+
+
+class LockedState(DictState):
+    """全局 dict + 锁，读者在锁内复制"""
+
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+
+    def write(self, i: int):
+        with self.lock:
+            super().write(i)
+
+    def read(self) -> dict:
+        with self.lock:
+            return dict(self.state, logs=list(self.state["logs"]))
+
+
+class StoreState:
+    def __init__(self):
+        self.store = StateStore(INITIAL, max_logs=MAX_LOGS, history=500)
+
+    def write(self, i: int):
+        self.store.update(step=i, thought=str(i), action=str(i))
+        self.store.append_log(f"步骤{i}")
+
+    def read(self) -> dict:
+        return self.store.snapshot().to_dict()
+
+
+def run(impl, readers: int, duration: float) -> dict:
+    stop = threading.Event()
+    lock = threading.Lock()
+    result = {"reads": 0, "writes": 0, "inconsistent": 0, "errors": 0, "latencies": []}
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            impl.write(i)
+            if i % 50 == 0:
+                time.sleep(0)  # 让出 GIL，模拟任务线程在步骤之间的等待
+        result["writes"] = i
+
+    def reader():
+        reads = inconsistent = errors = 0
+        latencies = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                data = impl.read()
+                body = json.dumps(data)
+                step, thought, action = str(data["step"]), data["thought"], data["action"]
+                if not (step == thought == action):
+                    inconsistent += 1
+            except RuntimeError:
+                errors += 1  # 序列化过程中 dict/list 被修改
+                continue
+            latencies.append(time.perf_counter() - start)
+            reads += 1
+            del body
+        with lock:
+            result["reads"] += reads
+            result["inconsistent"] += inconsistent
+            result["errors"] += errors
+            result["latencies"] += latencies
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+    latencies = sorted(result.pop("latencies")) or [0.0]
+    result["p50"] = latencies[len(latencies) // 2]
+    result["p99"] = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return result
+
+
+def check_changes_since(rounds: int = 2000, seed: int = 0):
+    """从旧快照回放增量，结果必须与最新快照一致"""
+    rng = random.Random(seed)
+    store = StateStore(INITIAL, max_logs=10, history=64)
+    snapshots = {0: store.snapshot()}
+    for i in range(rounds):
+        roll = rng.random()
+        if roll < 0.5:
+            store.update(step=rng.randrange(5), thought=str(rng.randrange(3)))
+        elif roll < 0.8:
+            store.append_log(f"line {i}")
+        else:
+            store.apply("frame", lambda s: ({"frame": s.get("frame", 0) + 1}, {"frame": s.get("frame", 0) + 1}))
+        snapshots[store.version] = store.snapshot()
+
+    latest = store.snapshot()
+    checked = 0
+    for base_version in range(max(0, latest.version - 64), latest.version + 1):
+        base = snapshots[base_version]
+        changes = store.changes_since(base_version)
+        assert changes is not None, base_version
+        state, logs = dict(base.state), list(base.logs)
+        for version, kind, data in changes:
+            if kind == "log":
+                logs = (logs + [data["line"]])[-10:]
+            else:
+                state.update(data)
+        assert state == dict(latest.state) and logs == list(latest.logs), base_version
+        checked += 1
+    assert store.changes_since(latest.version - 65) is None      # 已被挤出缓冲区
+    assert store.changes_since(latest.version + 1) is None       # 服务重启后的旧客户端
+    assert store.changes_since(latest.version) == []
+    # 快照不可修改
+    try:
+        latest.state["step"] = -1
+        raise AssertionError("快照可以被修改")
+    except TypeError:
+        pass
+    print(f"changes_since: 从 {checked} 个旧版本回放增量都与最新快照一致，过旧/过新的版本返回 None")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=2.0)
+    args = parser.parse_args()
+
+    check_changes_since()
+    print(f"\n1 个写线程 + {args.readers} 个读线程，{args.duration:.0f}s")
+    print(f"{'实现':<8}{'读/秒':>10}{'写/秒':>10}{'读p50':>9}{'读p99':>9}{'不一致':>8}{'异常':>6}")
+    for name, impl in (("dict", DictState), ("locked", LockedState), ("store", StoreState)):
+        r = run(impl(), args.readers, args.duration)
+        print(f"{name:<8}{r['reads'] / args.duration:>10.0f}{r['writes'] / args.duration:>10.0f}"
+              f"{r['p50'] * 1e6:>7.0f}µs{r['p99'] * 1e6:>7.0f}µs{r['inconsistent']:>8}{r['errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
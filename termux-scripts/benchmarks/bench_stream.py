@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+流式模型响应测试台
+
+用 fake_openai 模拟模型服务 (回复中 action/params 在前，较长的 thought 在后)，对比:
+- full:   等完整响应再解析 (原流程)
+- stream: SSE 流式，action 和 params 完整后立即返回
+
+用法:
+    python benchmarks/bench_stream.py [--runs 5] [--token-delay 0.02]
+"""
+
+import argparse
+import contextlib
+import os
+import statistics
+import time
+
+os.environ.setdefault("DOUBAO_API_KEY", "bench")
+
+from fake_openai import DEFAULT_REPLY, FakeOpenAI
+from stub_helper import make_screen
+import autoglm_hybrid
+from autoglm_hybrid import DoubaoVisionModel
+
+
+def measure(model: DoubaoVisionModel, image, runs: int) -> tuple:
+    to_action, to_thought = [], []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            result = model.analyze_screen(image, "搜索蓝牙耳机", [])
+        to_action.append(time.perf_counter() - t0)
+        pending = result.pop('pending', None)
+        if pending is not None:
+            result['thought'] = pending.result(timeout=30)['thought']
+        to_thought.append(time.perf_counter() - t0)
+        assert result['action'] == 'tap' and result['model_params'] == {'x': 540, 'y': 150}, result
+        assert result['thought'].endswith("不影响点击。"), result['thought']
+    return statistics.median(to_action), statistics.median(to_thought)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3, help="首字延迟 (秒)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="分块间隔 (秒)")
+    args = parser.parse_args()
+
+    image = make_screen()
+    print(f"回复 {len(DEFAULT_REPLY)} 字符")
+    print(f"{'模式':<8}{'动作可执行':>12}{'完整响应':>12}")
+    with FakeOpenAI(latency=args.latency, token_delay=args.token_delay) as fake:
+        autoglm_hybrid.DOUBAO_API_KEY = "bench"
+        model = DoubaoVisionModel()
+        model.api_url = fake.url
+        for mode in ("full", "stream"):
+            model.stream = (mode == "stream")
+            action, total = measure(model, image, args.runs)
+            print(f"{mode:<8}{action:>11.2f}s{total:>11.2f}s")
+
+    # 服务端忽略 stream 参数时应回退到普通解析
+    with FakeOpenAI(latency=0, token_delay=0, stream=False) as fake:
+        model.api_url = fake.url
+        model.stream = True
+        measure(model, image, 1)
+        print("服务端不支持流式: 回退正常")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+耗时追踪测试台
+
+1. 开销: 每个 span 的耗时 (开启 / 关闭 / 没有激活的 Tracer)，与空循环对比
+2. 端到端: stub_helper 模拟手机 (动作后有动画)，fake_openai 模拟流式模型，
+   代理跑一个 --steps 步的任务，检查:
+   - 汇总表包含截图、解码、编码、上传 + 推理、首字、解析、执行、等待各阶段
+   - 线程池里的 span 记到了代理自己的 Tracer
+   - 导出的 Chrome trace 是合法 JSON，每个模型请求都落在某一步之内
+   并对比追踪开启 / 关闭时任务的总耗时
+
+用法:
+    python benchmarks/bench_tracing.py [--steps 4] [--spans 200000]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import time
+
+# 每一步都要真正调用模型，不能让之前运行留下的决策缓存 / 轨迹命中
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+os.environ.setdefault("AUTOGLM_LOCAL_RESOLVE", "0")
+os.environ.setdefault("DOUBAO_API_KEY", "bench")
+
+from fake_openai import FakeOpenAI
+from stub_helper import ACTION_PATHS, StubHelper
+import tracing
+from autoglm_hybrid import AutoGLMAgent, DoubaoVisionModel, PhoneController
+
+EXPECTED_STAGES = ("task", "step", "helper.screenshot", "helper.http", "image.decode",
+                   "image.prepare", "image.resize", "image.encode", "image.base64_encode",
+                   "prompt.build", "model.request", "model.first_token", "model.stream",
+                   "agent.model", "agent.execute", "helper.tap", "settle", "helper.preview", "sleep")
+
+
+def overhead(n: int) -> dict:
+    """每个 span (含 with 语句本身) 的平均耗时 (ns)，减去空循环"""
+    def loop(make) -> float:
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            with make("x"):
+                pass
+        return (time.perf_counter_ns() - t0) / n
+
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        pass
+    base = (time.perf_counter_ns() - t0) / n
+
+    result = {"inactive": loop(tracing.span) - base}
+    tracer = tracing.Tracer(enabled=False)
+    with tracing.activate(tracer):
+        result["disabled"] = loop(tracing.span) - base
+    tracer = tracing.Tracer(enabled=True, max_spans=1000)
+    with tracing.activate(tracer):
+        result["enabled"] = loop(tracing.span) - base
+    assert len(tracer.spans) == 1000  # 环形缓冲区不增长
+    return result
+
+
+def make_reply(steps: int):
+    count = [0]
+
+    def reply(body: dict) -> str:
+        count[0] += 1
+        if count[0] > steps:
+            return json.dumps({"action": "done", "params": {}, "thought": "任务完成"}, ensure_ascii=False)
+        return json.dumps({"action": "tap", "params": {"x": 540, "y": 100 + 80 * count[0]},
+                           "thought": "点击下一个入口，" + "等待页面加载。" * 8}, ensure_ascii=False)
+    return reply
+
+
+def run_task(stub: StubHelper, steps: int, enabled: bool) -> tuple:
+    with FakeOpenAI(reply=make_reply(steps), latency=0.2, token_delay=0.005) as fake:
+        model = DoubaoVisionModel()
+        model.api_url = fake.url
+        agent = AutoGLMAgent(PhoneController(stub.url), model, tracer=tracing.Tracer(enabled=enabled))
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run("打开设置")
+        wall = time.perf_counter() - t0
+    assert ok
+    return agent, wall
+
+
+def check_trace(agent: AutoGLMAgent, steps: int) -> str:
+    summary = agent.tracer.summary()
+    missing = [name for name in EXPECTED_STAGES if name not in summary]
+    assert not missing, missing
+    assert summary["step"]["count"] == steps + 1, summary["step"]
+    assert summary["task"]["count"] == 1
+    assert summary["model.request"]["count"] == steps + 1
+
+    path = agent.tracer.export(os.path.join(tempfile.mkdtemp(), "trace.json"))
+    with open(path, encoding="utf-8") as f:
+        trace = json.load(f)
+    events = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    names = {e["tid"]: e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"}
+    assert all(isinstance(e["ts"], float) and e["dur"] >= 0 for e in events)
+    assert {e["tid"] for e in events} <= set(names), "有线程没有名字"
+    step_spans = [(e["ts"], e["ts"] + e["dur"]) for e in events if e["name"] == "step"]
+    for e in events:
+        if e["name"] == "model.request":
+            assert any(s <= e["ts"] and e["ts"] + e["dur"] <= t for s, t in step_spans), e
+    workers = {names[e["tid"]] for e in events if e["name"].startswith(("helper.", "model.", "image."))}
+    assert any(name.startswith("autoglm") for name in workers), workers
+    return f"{len(events)} 个 span，{len(names)} 个线程 -> {path}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=4)
+    parser.add_argument("--spans", type=int, default=200000)
+    args = parser.parse_args()
+
+    cost = overhead(args.spans)
+    print(f"每个 span 的开销: 开启 {cost['enabled']:.0f}ns，关闭 {cost['disabled']:.0f}ns，"
+          f"未激活 {cost['inactive']:.0f}ns")
+
+    animations = {path: 0.3 for path in ACTION_PATHS}
+    with StubHelper(image_format="JPEG", latency=0.02, animations=animations) as stub:
+        agent, wall_on = run_task(stub, args.steps, True)
+        print(f"\n{args.steps} 步点击 + 完成，追踪开启 {wall_on:.2f}s")
+        print(agent.tracer.report())
+        print(f"Chrome trace: {check_trace(agent, args.steps)}")
+        spans_per_step = len(agent.tracer.spans) / (args.steps + 1)
+
+        off, wall_off = run_task(stub, args.steps, False)
+        assert not off.tracer.spans
+        print(f"\n追踪关闭 {wall_off:.2f}s；每步约 {spans_per_step:.0f} 个 span，"
+              f"估算开销 {spans_per_step * cost['enabled'] / 1000:.0f}µs/步")
+
+
+if __name__ == "__main__":
+    main()
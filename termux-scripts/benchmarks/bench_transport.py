@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+基准: 模块级 requests 调用 vs 共享连接池 (HelperTransport)
+
+模拟 25 步任务，每步一次截图 + 一次点击 + 一次 /status，
+对比每个动作的平均延迟和 Helper 端看到的 TCP 连接数。
+
+用法:
+    python benchmarks/bench_transport.py [--steps 25] [--rounds 5]
+"""
+
+import argparse
+import statistics
+import time
+
+import requests
+
+from stub_helper import StubHelper
+from helper_transport import HelperTransport
+
+
+def run_plain(url: str, steps: int) -> list:
+    """旧实现: 每次调用都是新的 TCP 连接"""
+    latencies = []
+    for _ in range(steps):
+        for call in (
+            lambda: requests.get(f"{url}/screenshot", timeout=15).json(),
+            lambda: requests.post(f"{url}/tap", json={"x": 1, "y": 2}, timeout=5).json(),
+            lambda: requests.get(f"{url}/status", timeout=3).json(),
+        ):
+            t0 = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def run_pooled(transport: HelperTransport, steps: int) -> list:
+    latencies = []
+    for _ in range(steps):
+        for call in (
+            lambda: transport.get("/screenshot").json(),
+            lambda: transport.call("/tap", {"x": 1, "y": 2}),
+            lambda: transport.get("/status").json(),
+        ):
+            t0 = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - t0)
+    return latencies
+
+
+def report(name: str, latencies: list, connections: int):
+    ms = sorted(x * 1000 for x in latencies)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"{name:<10} 请求={len(ms):<5} 平均={statistics.mean(ms):7.2f}ms "
+          f"p50={statistics.median(ms):7.2f}ms p95={p95:7.2f}ms 连接数={connections}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=25)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="Helper 端处理延迟 (秒)")
+    args = parser.parse_args()
+
+    with StubHelper(latency=args.latency) as stub:
+        stub.screen_bytes()  # 预热 PNG 缓存，只测传输
+
+        plain = []
+        before = stub.connections
+        for _ in range(args.rounds):
+            plain += run_plain(stub.url, args.steps)
+        report("requests", plain, stub.connections - before)
+
+        transport = HelperTransport(stub.url)
+        pooled = []
+        before = stub.connections
+        for _ in range(args.rounds):
+            pooled += run_pooled(transport, args.steps)
+        report("pooled", pooled, stub.connections - before)
+        print(f"连接池统计: {transport.stats()}")
+
+        gain = 1 - statistics.mean(pooled) / statistics.mean(plain)
+        print(f"平均每次调用延迟降低: {gain:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+控件树 / 纯文字优先测试台
+
+1. 空间索引: 在约 3000 个控件的合成树上，网格索引的 at(x, y) 与线性扫描对比
+2. 端到端: stub_helper (带 fixtures/ 控件树) + fake_openai，任务 "搜索蓝牙耳机"
+   - image: 每步发截图，模型返回坐标
+   - text:  先只发控件列表，模型用 tap_id / tap_text；结果页模型要求截图后再确认完成
+   对比请求体积、输入 token 和耗时，并检查 tap_text / tap_id 解析出的坐标
+
+用法:
+    python benchmarks/bench_ui_tree.py [--nodes 3000] [--prefill 0.0005]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import time
+
+os.environ.setdefault("DOUBAO_API_KEY", "bench")
+os.environ.setdefault("AUTOGLM_DECISION_CACHE", "0")
+os.environ.setdefault("AUTOGLM_REPLAY", "0")
+os.environ.setdefault("AUTOGLM_LOCAL_RESOLVE", "0")
+
+from fake_openai import FakeOpenAI
+from stub_helper import ACTION_PATHS, StubHelper, load_hierarchies
+import autoglm_hybrid
+from autoglm_hybrid import AutoGLMAgent, DoubaoVisionModel, PhoneController
+from ui_tree import UITree
+
+TASK = "打开淘宝搜索蓝牙耳机"
+IMAGE_STEPS = [
+    {"action": "tap", "params": {"x": 540, "y": 270}, "thought": "点击搜索栏"},
+    {"action": "input", "params": {"text": "蓝牙耳机"}, "thought": "输入关键词"},
+    {"action": "tap", "params": {"x": 960, "y": 270}, "thought": "点击搜索按钮"},
+]
+DONE = {"action": "done", "params": {}, "thought": "搜索结果已显示"}
+HISTORY_ACTION = re.compile(r"^\d+ (tap|tap_text|tap_id|input) ", re.M)
+
+
+def synthetic_tree(count: int, width: int = 1080, height: int = 2400, seed: int = 0) -> UITree:
+    """随机嵌套的控件: 每个控件在父控件内部"""
+    rng = random.Random(seed)
+    nodes = [{"b": [0, 0, width, height], "cls": "FrameLayout", "p": -1}]
+    while len(nodes) < count:
+        parent = rng.randrange(len(nodes))
+        left, top, right, bottom = nodes[parent]["b"]
+        if right - left < 20 or bottom - top < 20:
+            continue
+        w = rng.randint(10, max(10, (right - left) // 2))
+        h = rng.randint(10, max(10, (bottom - top) // 3))
+        x = rng.randint(left, right - w)
+        y = rng.randint(top, bottom - h)
+        nodes.append({"b": [x, y, x + w, y + h], "cls": "View", "p": parent,
+                      "t": f"item {len(nodes)}", "c": rng.random() < 0.3})
+    return UITree.from_json({"width": width, "height": height, "nodes": nodes})
+
+
+def linear_at(tree: UITree, x: int, y: int):
+    best = None
+    for node in tree.nodes:
+        if node.area and node.contains(x, y) and (best is None or node.area < best.area):
+            best = node
+    return best
+
+
+def bench_index(count: int, queries: int = 2000):
+    tree = synthetic_tree(count)
+    rng = random.Random(1)
+    points = [(rng.randrange(tree.width), rng.randrange(tree.height)) for _ in range(queries)]
+    for x, y in points[:200]:
+        assert tree.at(x, y) is linear_at(tree, x, y)
+
+    t0 = time.perf_counter()
+    for x, y in points:
+        tree.at(x, y)
+    indexed = (time.perf_counter() - t0) / queries
+    t0 = time.perf_counter()
+    for x, y in points:
+        linear_at(tree, x, y)
+    linear = (time.perf_counter() - t0) / queries
+    t0 = time.perf_counter()
+    UITree.from_json({"width": tree.width, "height": tree.height,
+                      "nodes": [{"b": list(n.bounds), "p": n.parent} for n in tree.nodes]})
+    build = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for i in range(100):
+        tree.find_text(f"item {i * 7 + 1}")
+    find = (time.perf_counter() - t0) / 100
+
+    print(f"{len(tree)} 个控件: 建索引 {build * 1000:.1f}ms，"
+          f"at() 索引 {indexed * 1e6:.1f}µs / 线性 {linear * 1e6:.1f}µs ({linear / indexed:.0f}x)，"
+          f"find_text {find * 1000:.2f}ms")
+
+
+def make_reply():
+    def reply(body: dict) -> str:
+        user = body["messages"][-1]["content"]
+        if isinstance(user, str):
+            # 纯文字请求: 根据控件列表决定
+            if "#search_query" in user:
+                decision = {"action": "screenshot"}
+            elif "#search_input" not in user:
+                decision = {"action": "tap_id", "params": {"id": "home_searchbar"}, "thought": "点击搜索栏"}
+            elif "蓝牙耳机 #search_input" not in user:
+                decision = {"action": "input", "params": {"text": "蓝牙耳机"}, "thought": "输入关键词"}
+            else:
+                decision = {"action": "tap_text", "params": {"text": "搜索"}, "thought": "点击搜索按钮"}
+            return json.dumps(decision, ensure_ascii=False)
+        text = user[0]["text"]
+        done_steps = len(HISTORY_ACTION.findall(text))
+        return json.dumps(IMAGE_STEPS[done_steps] if done_steps < len(IMAGE_STEPS) else DONE,
+                          ensure_ascii=False)
+    return reply
+
+
+def run(text_first: bool, args) -> dict:
+    animations = {path: args.animation for path in ACTION_PATHS}
+    with StubHelper(image_format="JPEG", animations=animations,
+                    hierarchies=load_hierarchies()) as stub, \
+            FakeOpenAI(latency=args.latency, token_delay=0.005, chunk_size=8,
+                       prefill_per_token=args.prefill, image_tokens=args.image_tokens,
+                       reply=make_reply()) as fake:
+        model = DoubaoVisionModel()
+        model.api_url = fake.url
+        agent = AutoGLMAgent(PhoneController(stub.url), model)
+        agent.text_first = text_first
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(None):
+            ok = agent.run(TASK)
+        elapsed = time.perf_counter() - t0
+        actions = list(stub.actions)
+        requests_ = list(fake.requests)
+        usages = list(fake.usages)
+    assert ok, actions
+    assert [path for path, _ in actions] == ["/tap", "/input", "/tap"], actions
+    taps = [(body["x"], body["y"]) for path, body in actions if path == "/tap"]
+    payload = sum(len(json.dumps(body, ensure_ascii=False).encode()) for body in requests_)
+    images = sum(1 for body in requests_ if not isinstance(body["messages"][-1]["content"], str))
+    return {
+        "elapsed": elapsed,
+        "calls": len(requests_),
+        "images": images,
+        "payload": payload,
+        "prompt_tokens": sum(u["prompt_tokens"] for u in usages),
+        "latency_p50": agent.usage.summary()["latency_p50"],
+        "taps": taps,
+        "fallbacks": agent.engine.text_fallbacks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.15, help="首字延迟 (秒)")
+    parser.add_argument("--prefill", type=float, default=0.0005, help="每个未缓存输入 token 的耗时 (秒)")
+    parser.add_argument("--image-tokens", type=int, default=800)
+    parser.add_argument("--animation", type=float, default=0.2)
+    args = parser.parse_args()
+
+    bench_index(args.nodes)
+    fixture = UITree.from_json(load_hierarchies()[0])
+    print(f"fixtures 首页: {len(fixture)} 个控件，控件列表 {len(fixture.describe())} 字")
+
+    autoglm_hybrid.DOUBAO_API_KEY = "bench"
+    print(f"\n{'模式':<8}{'耗时':>8}{'模型调用':>10}{'截图':>6}{'请求体':>10}{'输入token':>11}{'p50':>8}")
+    for name, text_first in (("image", False), ("text", True)):
+        r = run(text_first, args)
+        print(f"{name:<8}{r['elapsed']:>7.2f}s{r['calls']:>10}{r['images']:>6}"
+              f"{r['payload'] / 1024:>8.1f}KB{r['prompt_tokens']:>11}{r['latency_p50']:>7.2f}s")
+        if text_first:
+            # tap_id home_searchbar -> 搜索栏中心；tap_text 搜索 -> 搜索页的按钮 (不是首页的)
+            assert r["taps"] == [(540, 270), (960, 270)], r["taps"]
+            print(f"  tap_id / tap_text 解析坐标 {r['taps']}，要求截图 {r['fallbacks']} 次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Web 控制台推送测试台
+
+N 个浏览器同时观看控制台，两种场景:
+- running: 任务运行中，每 0.5 秒一条日志，每步 (默认 3 秒) 一次状态变化和一帧新截图
+- idle:    没有任务，什么都不变
+两种方式:
+- poll: 原来的方式，每秒 GET /api/state，响应里带完整日志和 Base64 截图
+- sse:  /api/events 只推送增量，收到新帧通知后 GET /api/frame.jpg
+统计客户端收到的字节数、请求数和进程 CPU 时间，并检查 ETag/304 和 Last-Event-ID 补发。
+
+用法:
+    python benchmarks/bench_web.py [--clients 5] [--duration 10] [--step 3]
+"""
+
+import argparse
+import base64
+import http.client
+import os
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from stub_helper import StubHelper, make_screen
+
+_stub = StubHelper().start()
+os.environ["AUTOGLM_HELPER_URL"] = _stub.url
+import autoglm_web as web  # noqa: E402  Helper 地址在导入时读取
+
+
+class LegacyHandler(web.Handler):
+    """原来的 /api/state: 每次都带完整日志和 Base64 截图"""
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/api/state":
+            data, _ = web.preview.jpeg()
+            self.json_response(dict(web.store.snapshot().to_dict(), screenshot=base64.b64encode(data).decode() if data else ""))
+        else:
+            super().do_GET()
+
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.requests = 0
+        self.not_modified = 0
+
+    def add(self, size: int, requests: int = 0, not_modified: int = 0):
+        with self.lock:
+            self.bytes += size
+            self.requests += requests
+            self.not_modified += not_modified
+
+
+def produce(stop: threading.Event, step_interval: float):
+    """模拟任务: 日志每 0.5 秒一条，每步一次状态变化和新截图"""
+    per_step = max(1, round(step_interval / 0.5))
+    tick = 0
+    while not stop.is_set():
+        step = tick // per_step
+        if tick % per_step == 0:
+            web.update_state(step=step, status=f"步骤 {step}/25",
+                             thought=f"第 {step} 步的思考", action="tap {'x': 540, 'y': 270}")
+            web.preview.set_frame(make_screen(seed=tick))
+        web.log(f"步骤{step}: 点击搜索框，输入关键词并等待结果 → tap")
+        tick += 1
+        stop.wait(0.5)
+
+
+def poll_client(port: int, counter: Counter, stop: threading.Event):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    while not stop.is_set():
+        conn.request("GET", "/api/state")
+        resp = conn.getresponse()
+        counter.add(len(resp.read()), requests=1)
+        conn.close()
+        stop.wait(1.0)
+
+
+def sse_client(port: int, counter: Counter, stop: threading.Event):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/api/events")
+    resp = conn.getresponse()
+    counter.add(0, requests=1)
+    frames = http.client.HTTPConnection("127.0.0.1", port)
+    etag, event = None, None
+    while not stop.is_set():
+        line = resp.fp.readline()
+        if not line:
+            break
+        counter.add(len(line))
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: ") and event in ("frame", "snapshot"):
+            headers = {"If-None-Match": etag} if etag else {}
+            frames.request("GET", "/api/frame.jpg", headers=headers)
+            r = frames.getresponse()
+            body = r.read()
+            etag = r.getheader("ETag") or etag
+            counter.add(len(body), requests=1, not_modified=int(r.status == 304))
+            frames.close()
+    conn.close()
+
+
+def run(mode: str, scenario: str, args) -> dict:
+    handler = LegacyHandler if mode == "poll" else web.Handler
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    stop = threading.Event()
+    counter = Counter()
+    client = poll_client if mode == "poll" else sse_client
+    threads = []
+    if scenario == "running":
+        threads.append(threading.Thread(target=produce, args=(stop, args.step), daemon=True))
+    threads += [threading.Thread(target=client, args=(port, counter, stop), daemon=True)
+                for _ in range(args.clients)]
+    cpu0 = time.process_time()
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    cpu = time.process_time() - cpu0
+    # SSE 客户端阻塞在 readline，再推一个事件让它们退出
+    web.log("结束")
+    for t in threads:
+        t.join(timeout=2)
+    server.shutdown()
+    return {"bytes": counter.bytes, "requests": counter.requests,
+            "not_modified": counter.not_modified, "cpu": cpu}
+
+
+def check_protocol():
+    """ETag/304 和 Last-Event-ID 补发"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), web.Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    web.preview.set_frame(make_screen(seed=1))
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/api/frame.jpg")
+    r = conn.getresponse()
+    r.read()
+    etag = r.getheader("ETag")
+    conn.request("GET", "/api/frame.jpg", headers={"If-None-Match": etag})
+    r = conn.getresponse()
+    r.read()
+    assert r.status == 304, r.status
+
+    last_id = web.store.version
+    web.log("重连前的最后一条")
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    conn.request("GET", "/api/events", headers={"Last-Event-ID": str(last_id)})
+    r = conn.getresponse()
+    first = [r.fp.readline().decode().strip() for _ in range(3)]
+    assert first[1] == "event: log" and "重连前的最后一条" in first[2], first
+    conn.close()
+    server.shutdown()
+    print(f"ETag/304 正常 ({etag})，Last-Event-ID 重连只补发缺失的事件")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--step", type=float, default=3.0, help="每步间隔 (秒)")
+    args = parser.parse_args()
+
+    web.print = lambda *a, **k: None  # log() 的控制台输出
+    check_protocol()
+    print(f"\n{args.clients} 个浏览器观看 {args.duration:.0f}s")
+    print(f"{'场景':<9}{'模式':<6}{'下行':>10}{'每客户端每秒':>14}{'请求':>7}{'进程CPU':>9}")
+    for scenario in ("running", "idle"):
+        for mode in ("poll", "sse"):
+            r = run(mode, scenario, args)
+            rate = r["bytes"] / args.clients / args.duration / 1024
+            print(f"{scenario:<9}{mode:<6}{r['bytes'] / 1024:>8.0f}KB{rate:>11.1f}KB/s"
+                  f"{r['requests']:>7}{r['cpu']:>8.2f}s")
+    _stub.stop()
+
+
+if __name__ == "__main__":
+    main()
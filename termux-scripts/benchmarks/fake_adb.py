@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+模拟 adb 命令行，用于离线测试 LADB 模式
+
+install(directory) 在目录里生成 `adb` 和设备端的 `input` / `screencap` 脚本，
+把目录放到 PATH 最前面即可:
+- adb devices                 列出 FAKE_ADB_SERIALS
+- adb -s SERIAL shell CMD...  用本机 sh 执行命令
+- adb -s SERIAL shell         常驻 shell，从 stdin 读命令
+- adb -s SERIAL exec-out CMD  同 shell，stdout 原样输出二进制
+- adb -s SERIAL pull SRC DST  从模拟的设备目录复制文件
+- 设备端 input 命令只把参数追加到 FAKE_ADB_LOG
+- 设备端 screencap 输出 install(screen=...) 生成的 PNG / 原始帧缓冲夹具
+- 设备路径 /sdcard/ 映射到 <directory>/device/sdcard/
+
+FAKE_ADB_LATENCY 模拟每次启动 adb 的握手耗时 (秒)。
+"""
+
+import os
+import shutil
+import stat
+import struct
+import sys
+import time
+
+DEFAULT_SERIAL = "emulator-5554"
+
+
+def install(directory: str, latency: float = 0.05, serials: str = DEFAULT_SERIAL,
+            screen=None) -> dict:
+    """
+    生成假 adb，返回需要合并到 os.environ 的环境变量
+
+    Args:
+        screen: 设备屏幕 (PIL.Image)，生成 screencap 夹具；None 时 screencap 不可用
+    """
+    bin_dir = os.path.join(directory, "bin")
+    device_dir = os.path.join(directory, "device")
+    os.makedirs(bin_dir, exist_ok=True)
+    os.makedirs(os.path.join(device_dir, "sdcard"), exist_ok=True)
+
+    _write_script(os.path.join(bin_dir, "adb"),
+                  f'#!/bin/sh\nexec "{sys.executable}" "{os.path.abspath(__file__)}" "$@"\n')
+    _write_script(os.path.join(device_dir, "input"),
+                  '#!/bin/sh\necho "input $*" >> "$FAKE_ADB_LOG"\n')
+    # screencap [-p] [FILE]: 带 -p 输出 PNG，否则输出原始帧缓冲
+    _write_script(os.path.join(device_dir, "screencap"), f"""#!/bin/sh
+fixture="{directory}/screen.raw"
+[ "$1" = "-p" ] && fixture="{directory}/screen.png" && shift
+if [ -n "$1" ]; then cat "$fixture" > "$1"; else cat "$fixture"; fi
+""")
+    if screen is not None:
+        write_screen(directory, screen)
+
+    return {
+        "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+        "FAKE_ADB_DEVICE_PATH": device_dir,
+        "FAKE_ADB_LOG": os.path.join(directory, "input.log"),
+        "FAKE_ADB_LATENCY": str(latency),
+        "FAKE_ADB_SERIALS": serials,
+    }
+
+
+def write_screen(directory: str, screen):
+    """生成 screencap 夹具: PNG 和 Android 9+ 格式的原始帧缓冲 (16 字节头, RGBA_8888)"""
+    screen = screen.convert("RGBA")
+    screen.save(os.path.join(directory, "screen.png"), format="PNG")
+    with open(os.path.join(directory, "screen.raw"), "wb") as f:
+        f.write(struct.pack("<IIII", screen.width, screen.height, 1, 0))
+        f.write(screen.tobytes())
+
+
+def _write_script(path: str, content: str):
+    with open(path, "w") as f:
+        f.write(content)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _device_path(arg: str) -> str:
+    sdcard = os.path.join(os.environ["FAKE_ADB_DEVICE_PATH"], "sdcard") + "/"
+    return arg.replace("/sdcard/", sdcard)
+
+
+def _device_env() -> dict:
+    env = dict(os.environ)
+    env["PATH"] = os.environ["FAKE_ADB_DEVICE_PATH"] + os.pathsep + env.get("PATH", "")
+    return env
+
+
+def main(argv):
+    time.sleep(float(os.environ.get("FAKE_ADB_LATENCY", "0")))
+    serials = os.environ.get("FAKE_ADB_SERIALS", DEFAULT_SERIAL).split(",")
+
+    if argv[:1] == ["-s"]:
+        if argv[1] not in serials:
+            print(f"adb: device '{argv[1]}' not found", file=sys.stderr)
+            return 1
+        argv = argv[2:]
+
+    if argv[:1] == ["devices"]:
+        print("List of devices attached")
+        for serial in serials:
+            print(f"{serial}\tdevice")
+        print()
+        return 0
+
+    if argv[:1] in (["shell"], ["exec-out"]):
+        if len(argv) == 1:
+            os.execvpe("sh", ["sh"], _device_env())
+        # 与真实 adb 一样把参数拼成一条命令交给设备 shell
+        command = " ".join(_device_path(a) for a in argv[1:])
+        os.execvpe("sh", ["sh", "-c", command], _device_env())
+
+    if argv[:1] == ["pull"] and len(argv) == 3:
+        shutil.copyfile(_device_path(argv[1]), argv[2])
+        return 0
+
+    print(f"fake adb: unsupported command {argv}", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+本地模拟 OpenAI 兼容的 /chat/completions，用于离线测试模型调用
+
+- stream=true 时按 SSE 分块返回 (data: {...choices[0].delta.content...})，最后 data: [DONE]
+- 否则返回普通 JSON
+- latency 模拟首字延迟，token_delay 模拟每个分块的生成间隔
+- 返回 usage (prompt_tokens / completion_tokens / prompt_tokens_details.cached_tokens)，
+  流式请求带 stream_options.include_usage 时在最后一个分块返回
+- 模拟前缀缓存: 与之前请求相同的前缀计为 cached_tokens，
+  只有未命中缓存的输入 token 计入预填充耗时 (prefill_per_token)
+
+用法:
+    python fake_openai.py --port 8000
+    export DOUBAO_API_URL=http://127.0.0.1:8000
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import estimate_tokens
+
+DEFAULT_REPLY = json.dumps({
+    "action": "tap",
+    "params": {"x": 540, "y": 150},
+    "thought": "页面顶部是搜索框，点击它进入搜索页面，然后就可以输入要搜索的商品名称。"
+               "搜索框里的提示文字是{热门推荐}，不影响点击。",
+}, ensure_ascii=False)
+
+
+class FakeOpenAI:
+    """在后台线程运行的模拟模型服务"""
+
+    def __init__(self, port: int = 0, reply: Optional[Callable[[dict], str]] = None,
+                 latency: float = 0.3, token_delay: float = 0.02, chunk_size: int = 4,
+                 stream: bool = True, prefill_per_token: float = 0.0, image_tokens: int = 1000,
+                 cache_min_tokens: int = 256):
+        """
+        Args:
+            reply: 请求体 -> 回复内容，默认返回 DEFAULT_REPLY
+            latency: 首字延迟 (秒)
+            token_delay: 每个分块之间的间隔 (秒)
+            chunk_size: 每个分块的字符数
+            stream: 是否支持流式 (False 时忽略 stream 参数，始终返回 JSON)
+            prefill_per_token: 每个未命中缓存的输入 token 的预填充耗时 (秒)
+            image_tokens: 每张图片计多少 token
+            cache_min_tokens: 公共前缀至少这么长才算命中缓存
+        """
+        self.reply = reply or (lambda body: DEFAULT_REPLY)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.chunk_size = chunk_size
+        self.stream = stream
+        self.prefill_per_token = prefill_per_token
+        self.image_tokens = image_tokens
+        self.cache_min_tokens = cache_min_tokens
+        self.requests = []
+        self.usages = []
+        self._prefixes = []  # 之前请求的输入文本 (图片用占位符)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "FakeOpenAI":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def usage_for(self, body: dict, content: str) -> dict:
+        """按请求内容计算 usage，并记住这次的输入用于之后的前缀匹配"""
+        parts, images = [], 0
+        for message in body.get("messages", []):
+            parts.append(f"<{message.get('role')}>")
+            content_parts = message.get("content")
+            if isinstance(content_parts, str):
+                content_parts = [{"type": "text", "text": content_parts}]
+            for part in content_parts or []:
+                if part.get("type") == "image_url":
+                    images += 1
+                    parts.append(f"<image:{part['image_url']['url'][-32:]}>")
+                else:
+                    parts.append(part.get("text", ""))
+        text = "".join(parts)
+        prompt_tokens = estimate_tokens(text) + images * self.image_tokens
+        with self._lock:
+            common = max((len(os.path.commonprefix([text, prev])) for prev in self._prefixes),
+                         default=0)
+            self._prefixes.append(text)
+        cached = estimate_tokens(text[:common])
+        if cached < self.cache_min_tokens:
+            cached = 0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": estimate_tokens(content),
+            "total_tokens": prompt_tokens + estimate_tokens(content),
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+        self.usages.append(usage)
+        return usage
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length).decode())
+                fake.requests.append(body)
+                if not self.path.endswith("/chat/completions"):
+                    self._send(404, "application/json", b'{"error": "Not found"}')
+                    return
+                content = fake.reply(body)
+                usage = fake.usage_for(body, content)
+                uncached = usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+                time.sleep(fake.latency + uncached * fake.prefill_per_token)
+                if body.get("stream") and fake.stream:
+                    include_usage = (body.get("stream_options") or {}).get("include_usage")
+                    self._stream(content, usage if include_usage else None)
+                else:
+                    # 非流式: 整段生成完才返回
+                    chunks = max(1, len(content) // fake.chunk_size)
+                    time.sleep(fake.token_delay * chunks)
+                    payload = {"choices": [{"index": 0, "message": {"role": "assistant",
+                                                                     "content": content}}],
+                               "usage": usage}
+                    self._send(200, "application/json", json.dumps(payload).encode())
+
+            def _stream(self, content: str, usage: Optional[dict]):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for i in range(0, len(content), fake.chunk_size):
+                    chunk = {"choices": [{"index": 0,
+                                          "delta": {"content": content[i:i + fake.chunk_size]}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(fake.token_delay)
+                if usage is not None:
+                    chunk = {"choices": [], "usage": usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def _send(self, status: int, content_type: str, data: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 OpenAI 兼容模型服务")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.3, help="首字延迟 (秒)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="分块间隔 (秒)")
+    parser.add_argument("--no-stream", action="store_true", help="不支持流式")
+    args = parser.parse_args()
+
+    fake = FakeOpenAI(args.port, latency=args.latency, token_delay=args.token_delay,
+                      stream=not args.no_stream)
+    print(f"模拟模型服务运行中: {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Web 控制台压力测试
+
+N 个控制台同时连到 autoglm_web，Helper 是带延迟的 stub_helper (模拟慢的手机端)。
+每个控制台:
+- 观看: legacy 每秒轮询 /api/state；pool 用 SSE，收到新帧后取 /api/frame.jpg
+- 操作: 不停地随机 GET /api/state、连点几次刷新 (并发 /api/screenshot)、POST /api/action 滑动
+两种服务:
+- legacy: 原来的单线程 HTTPServer，刷新和操作都同步调用 Helper，操作后 sleep 0.5 秒
+- pool:   WebServer 线程池 + 合并截图
+统计各接口延迟 (p50/p95/max)、失败数、刷新点击次数和 Helper 实际截图次数。
+另外单独检查: 同时点十次刷新只截一次图 (等结果的 ?wait=1 最多两次)。
+
+用法:
+    python benchmarks/load_web.py [--clients 20] [--duration 10] [--helper-latency 0.3]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from http.server import HTTPServer
+
+from stub_helper import StubHelper
+
+
+class CountingStub(StubHelper):
+    """统计完整截图次数"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.captures = 0
+
+    def render(self, max_edge: int = 0) -> tuple:
+        with self._lock:
+            self.captures += 1
+        return super().render(max_edge)
+
+
+_stub = CountingStub(image_format="JPEG").start()
+os.environ["AUTOGLM_HELPER_URL"] = _stub.url
+import autoglm_web as web  # noqa: E402  Helper 地址在导入时读取
+
+
+class LegacyHandler(web.Handler):
+    """原来的同步 /api/screenshot 和 /api/action"""
+
+    def do_GET(self):
+        if self.path == "/api/screenshot":
+            img = web.ctrl.screenshot_full()
+            if img:
+                web.preview.set_frame(img)
+            web.ctrl.check()
+            self.json_response({"ok": bool(img)})
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        if self.path == "/api/action":
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length).decode()) if length else {}
+            p = body.get("params", {})
+            web.ctrl.swipe(p.get("x1", 540), p.get("y1", 1600), p.get("x2", 540), p.get("y2", 800))
+            time.sleep(0.5)
+            img = web.ctrl.screenshot_full()
+            if img:
+                web.preview.set_frame(img)
+            self.json_response({"ok": True})
+        else:
+            super().do_POST()
+
+
+class LegacyServer(HTTPServer):
+    def handle_error(self, request, client_address):
+        pass  # 客户端等不及断开后写响应的 BrokenPipe
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.failures = {}
+        self.clicks = 0
+        self.fallbacks = 0
+
+    def add(self, name: str, elapsed: float, ok: bool):
+        with self.lock:
+            self.latencies.setdefault(name, []).append(elapsed)
+            if not ok:
+                self.failures[name] = self.failures.get(name, 0) + 1
+
+    def summary(self, name: str) -> tuple:
+        values = sorted(self.latencies.get(name, [])) or [0.0]
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        return pick(0.5), pick(0.95), values[-1]
+
+
+def request(port: int, rec: Recorder, name: str, method: str, path: str, body: dict = None,
+            timeout: float = 15.0) -> bool:
+    start = time.perf_counter()
+    ok = False
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload else {}
+        conn.request(method, path, body=payload, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        ok = resp.status in (200, 304)
+        conn.close()
+    except OSError:
+        pass
+    rec.add(name, time.perf_counter() - start, ok)
+    return ok
+
+
+def poll_viewer(port: int, rec: Recorder, stop: threading.Event):
+    while not stop.is_set():
+        request(port, rec, "state", "GET", "/api/state")
+        stop.wait(1.0)
+
+
+def sse_viewer(port: int, rec: Recorder, stop: threading.Event):
+    """SSE 观看；连接数满 (503) 时和浏览器一样退回轮询"""
+    try:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        conn.request("GET", "/api/events")
+        resp = conn.getresponse()
+    except OSError:
+        return
+    if resp.status == 503:
+        with rec.lock:
+            rec.fallbacks += 1
+        conn.close()
+        return poll_viewer(port, rec, stop)
+    event = None
+    while not stop.is_set():
+        try:
+            line = resp.fp.readline()
+        except OSError:
+            break
+        if not line:
+            break
+        line = line.decode().rstrip("\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: ") and event in ("frame", "snapshot"):
+            request(port, rec, "frame", "GET", "/api/frame.jpg")
+    conn.close()
+
+
+def operator(port: int, rec: Recorder, stop: threading.Event, seed: int):
+    """随机操作: 看状态、连点刷新、滑动"""
+    rng = random.Random(seed)
+    while not stop.is_set():
+        roll = rng.random()
+        if roll < 0.6:
+            request(port, rec, "state", "GET", "/api/state")
+        elif roll < 0.85:
+            clicks = rng.randint(1, 4)
+            with rec.lock:
+                rec.clicks += clicks
+            burst = [threading.Thread(target=request, args=(port, rec, "screenshot", "GET", "/api/screenshot"))
+                     for _ in range(clicks)]
+            for t in burst:
+                t.start()
+            for t in burst:
+                t.join()
+        else:
+            request(port, rec, "action", "POST", "/api/action",
+                    {"action": "swipe", "params": {"x1": 540, "y1": 1600, "x2": 540, "y2": 800}})
+        stop.wait(rng.uniform(0.2, 0.8))
+
+
+def start_server(mode: str):
+    if mode == "legacy":
+        server = LegacyServer(("127.0.0.1", 0), LegacyHandler)
+    else:
+        web.store.closed = False
+        server = web.WebServer(("127.0.0.1", 0), web.Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(mode: str, args) -> dict:
+    server = start_server(mode)
+    port = server.server_address[1]
+    rec = Recorder()
+    stop = threading.Event()
+    viewer = poll_viewer if mode == "legacy" else sse_viewer
+    threads = [threading.Thread(target=viewer, args=(port, rec, stop), daemon=True)
+               for _ in range(args.clients)]
+    threads += [threading.Thread(target=operator, args=(port, rec, stop, i), daemon=True)
+                for i in range(args.clients)]
+    captures0 = _stub.captures
+    for t in threads:
+        t.start()
+    time.sleep(args.duration)
+    stop.set()
+    # 等操作线程收尾再截止统计 (后台合并的截图最多晚 0.5 秒)
+    for t in threads[args.clients:]:
+        t.join(timeout=30)
+    time.sleep(web.ACTION_REFRESH_DELAY + 0.5)
+    captures = _stub.captures - captures0
+
+    t0 = time.perf_counter()
+    server.shutdown()
+    server.server_close()
+    for t in threads[:args.clients]:
+        t.join(timeout=5)
+    closing = time.perf_counter() - t0
+    return {"rec": rec, "captures": captures, "closing": closing,
+            "rejected": getattr(server, "rejected", 0)}
+
+
+def burst_captures(port: int, rec: Recorder, path: str, clicks: int) -> int:
+    """同时点 clicks 次刷新，返回 Helper 截图次数"""
+    captures0 = _stub.captures
+    burst = [threading.Thread(target=request, args=(port, rec, "screenshot", "GET", path))
+             for _ in range(clicks)]
+    for t in burst:
+        t.start()
+    for t in burst:
+        t.join()
+    time.sleep(_stub.latency * 2 + 0.3)  # 等后台截图完成
+    return _stub.captures - captures0
+
+
+def check_coalescing(clicks: int = 10) -> tuple:
+    """
+    同时点十次刷新
+    - 默认: 立即返回，后台只截一次
+    - ?wait=1: 等截图完成再返回；截图期间到来的请求并入下一次，最多两次
+    """
+    server = start_server("pool")
+    port = server.server_address[1]
+    rec = Recorder()
+    background = burst_captures(port, rec, "/api/screenshot", clicks)
+    waited = burst_captures(port, rec, "/api/screenshot?wait=1", clicks)
+    server.shutdown()
+    server.server_close()
+    assert not rec.failures, rec.failures
+    assert background == 1, background
+    assert 1 <= waited <= 2, waited
+    return background, waited
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--helper-latency", type=float, default=0.3, help="Helper 每个请求的延迟 (秒)")
+    args = parser.parse_args()
+
+    web.print = lambda *a, **k: None  # log() 的控制台输出
+    _stub.latency = args.helper_latency
+    background, waited = check_coalescing()
+    print(f"同时点 10 次刷新 -> Helper 截图 {background} 次 (?wait=1: {waited} 次)")
+
+    print(f"\n{args.clients} 个控制台，{args.duration:.0f}s，Helper 延迟 {args.helper_latency * 1000:.0f}ms")
+    print(f"{'服务':<8}{'接口':<12}{'请求':>6}{'失败':>6}{'p50':>9}{'p95':>9}{'max':>9}")
+    for mode in ("legacy", "pool"):
+        r = run(mode, args)
+        rec = r["rec"]
+        for name in ("state", "screenshot", "action", "frame"):
+            if name not in rec.latencies:
+                continue
+            p50, p95, worst = rec.summary(name)
+            print(f"{mode:<8}{name:<12}{len(rec.latencies[name]):>6}{rec.failures.get(name, 0):>6}"
+                  f"{p50 * 1000:>7.0f}ms{p95 * 1000:>7.0f}ms{worst * 1000:>7.0f}ms")
+        extra = f"，SSE 满员改轮询 {rec.fallbacks} 个，503 {r['rejected']} 次" if mode == "pool" else ""
+        print(f"{'':<8}刷新点击 {rec.clicks} 次 -> Helper 截图 {r['captures']} 次{extra}，"
+              f"关闭服务 {r['closing']:.2f}s")
+    print(f"合并统计: 刷新 {web.refresh_preview.stats()}，状态检查 {web.check_status.stats()}")
+    _stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+本地模拟 AutoGLM Helper，用于离线基准测试
+
+接口与 android-app 中的 HttpServer.kt 保持一致:
+GET /status, GET /screenshot, GET /hierarchy, POST /tap /swipe /input /back /home /launch /batch
+
+可以模拟动画: 每个动作后屏幕切到新页面，并在 animations 指定的时长内持续变化。
+
+用法:
+    python stub_helper.py --port 8080 --animation 0.8
+"""
+
+import argparse
+import base64
+import glob
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image, ImageDraw
+
+# 让基准脚本可以直接 import termux-scripts 下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ACTION_PATHS = ("/tap", "/swipe", "/input", "/back", "/home", "/launch")
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_photo_cache = {}
+
+
+def make_screen(width: int = 1080, height: int = 2400, seed: int = 0) -> Image.Image:
+    """生成一张带少量 UI 元素的假屏幕，seed 不同页面不同"""
+    img = Image.new("RGB", (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, width, 180], fill=(255, 80, 0))
+    draw.rounded_rectangle([60, 220, width - 60, 320], radius=40, fill=(255, 255, 255))
+    for i in range(8):
+        top = 400 + i * 240
+        # 相邻页面亮度差足够大，帧指纹能区分
+        shade = (seed * 53 + i * 29) % 256
+        draw.rectangle([60, top, width - 60, top + 200], fill=(shade, shade, 255 - shade // 2))
+    # 商品图/视频区域: 噪声让 PNG 体积接近真实截图
+    size = (width - 120, height // 4)
+    if size not in _photo_cache:
+        _photo_cache[size] = Image.effect_noise(size, 60).convert("RGB")
+    img.paste(_photo_cache[size], (60, height - height // 4 - 60))
+    return img
+
+
+def load_hierarchies(directory: str = FIXTURES_DIR) -> list:
+    """按文件名顺序读取 hierarchy_*.json，第 i 个对应第 i 个页面"""
+    result = []
+    for path in sorted(glob.glob(os.path.join(directory, "hierarchy_*.json"))):
+        with open(path, encoding="utf-8") as f:
+            result.append(json.load(f))
+    return result
+
+
+class StubHelper:
+    """在后台线程运行的模拟 Helper"""
+
+    def __init__(self, port: int = 0, latency: float = 0.0,
+                 width: int = 1080, height: int = 2400,
+                 image_format: str = "PNG", binary: bool = True,
+                 animations: dict = None, batch: bool = True, hierarchies: list = None):
+        """
+        Args:
+            port: 监听端口，0 表示自动分配
+            latency: 每个请求额外的处理延迟 (秒)
+            image_format: 截图编码格式 PNG / JPEG
+            binary: 是否支持二进制截图 (False 模拟旧版 Helper)
+            animations: 动作 -> 动画时长 (秒)，如 {"/tap": 0.8}；None 表示动作不改变屏幕，
+                        某个动作的时长为 None 表示该动作不改变屏幕
+            batch: 是否支持 /batch (False 时返回 404)
+            hierarchies: GET /hierarchy 按页面轮流返回的控件树，None 时返回 404 (旧版 Helper)
+        """
+        self.latency = latency
+        self.image_format = image_format
+        self.binary = binary
+        self.batch = batch
+        self.hierarchies = hierarchies
+        self.animations = animations
+        self.width, self.height = width, height
+        self.page = 0
+        self.screen = make_screen(width, height)
+        self.animating_until = 0.0
+        self.actions = []
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._encoded = {}
+        self._sockets = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def set_screen(self, image: Image.Image):
+        with self._lock:
+            self.screen = image
+            self._encoded = {}
+
+    def on_action(self, path: str):
+        """动作后切换页面并开始动画"""
+        if self.animations is None or self.animations.get(path, 0.0) is None:
+            return
+        with self._lock:
+            self.page += 1
+            self.screen = make_screen(self.width, self.height, seed=self.page)
+            self._encoded = {}
+            self.animating_until = time.monotonic() + self.animations.get(path, 0.0)
+
+    def animating(self) -> bool:
+        return time.monotonic() < self.animating_until
+
+    def screen_bytes(self, max_edge: int = 0) -> bytes:
+        """当前屏幕的编码字节 (按 image_format，静止画面带缓存)"""
+        return self.render(max_edge)[0]
+
+    def render(self, max_edge: int = 0) -> tuple:
+        """返回 (编码字节, 图片尺寸)"""
+        with self._lock:
+            image = self.screen
+            remaining = self.animating_until - time.monotonic()
+            key = max_edge
+            if remaining > 0:
+                # 动画中: 一个随时间移动的色块
+                image = image.copy()
+                offset = int(remaining * 50) % 40
+                ImageDraw.Draw(image).rectangle(
+                    [0, 400 + offset * 40, self.width, 700 + offset * 40], fill=(20, 20, 20))
+                key = None
+            elif key in self._encoded:
+                return self._encoded[key]
+
+        if max_edge and max(image.size) > max_edge:
+            ratio = max_edge / max(image.size)
+            image = image.resize((max(1, int(image.width * ratio)), max(1, int(image.height * ratio))))
+        buf = BytesIO()
+        image.save(buf, format=self.image_format, quality=80)
+        result = buf.getvalue(), image.size
+        if key is not None:
+            with self._lock:
+                self._encoded[key] = result
+        return result
+
+    def start(self) -> "StubHelper":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务并断开所有 keep-alive 连接 (模拟 Helper 被杀掉)"""
+        self.server.shutdown()
+        self.server.server_close()
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                # 头和正文分两次写出，关闭 Nagle 避免 keep-alive 下的 40ms 延迟确认
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stub._lock:
+                    stub.connections += 1
+                    stub._sockets.add(self.connection)
+
+            def finish(self):
+                super().finish()
+                with stub._lock:
+                    stub._sockets.discard(self.connection)
+
+            def do_GET(self):
+                self._begin()
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                if url.path == "/status":
+                    self._json({"status": "ok", "service": "AutoGLM Helper",
+                                "version": "stub", "accessibility_enabled": True})
+                elif url.path == "/screenshot":
+                    max_edge = int(query.get("max_edge", ["0"])[0]) if stub.binary else 0
+                    data, size = stub.render(max_edge)
+                    if stub.binary and "image/" in self.headers.get("Accept", ""):
+                        self._image(data, size)
+                    else:
+                        image = base64.b64encode(data).decode()
+                        self._json({"success": True, "image": image, "format": "base64"})
+                elif url.path == "/hierarchy" and stub.hierarchies:
+                    with stub._lock:
+                        tree = stub.hierarchies[stub.page % len(stub.hierarchies)]
+                    max_nodes = int(query.get("max_nodes", ["1500"])[0])
+                    nodes = tree.get("nodes", [])
+                    self._json(dict(tree, success=True, width=stub.width, height=stub.height,
+                                    truncated=len(nodes) > max_nodes, nodes=nodes[:max_nodes]))
+                else:
+                    self._json({"error": "Not found"}, 404)
+
+            def do_POST(self):
+                self._begin()
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length).decode()) if length else {}
+                if self.path in ACTION_PATHS:
+                    with stub._lock:
+                        stub.actions.append((self.path, body))
+                    stub.on_action(self.path)
+                    self._json({"success": True})
+                elif self.path == "/batch" and stub.batch:
+                    self._json(self._run_batch(body))
+                else:
+                    self._json({"error": "Not found"}, 404)
+
+            def _run_batch(self, body):
+                results = []
+                actions = body.get("actions", [])
+                for i, step in enumerate(actions):
+                    path = "/" + step.get("action", "")
+                    success = path in ACTION_PATHS or path == "/wait"
+                    if path in ACTION_PATHS:
+                        params = {k: v for k, v in step.items() if k not in ("action", "delay_ms")}
+                        with stub._lock:
+                            stub.actions.append((path, params))
+                        stub.on_action(path)
+                    results.append({"action": step.get("action"), "success": success, "elapsed_ms": 0})
+                    if not success and body.get("stop_on_failure", True):
+                        break
+                    if i < len(actions) - 1:
+                        time.sleep(step.get("delay_ms", 0) / 1000)
+                return {"success": all(r["success"] for r in results) and len(results) == len(actions),
+                        "completed": len(results), "results": results}
+
+            def _begin(self):
+                with stub._lock:
+                    stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+            def _image(self, data: bytes, size: tuple):
+                self.send_response(200)
+                self.send_header("Content-Type", f"image/{stub.image_format.lower()}")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("X-Image-Width", str(size[0]))
+                self.send_header("X-Image-Height", str(size[1]))
+                self.end_headers()
+                self.wfile.write(data)
+                with stub._lock:
+                    stub.bytes_sent += len(data)
+
+            def _json(self, data, status=200):
+                payload = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                with stub._lock:
+                    stub.bytes_sent += len(payload)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 AutoGLM Helper")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟 (秒)")
+    parser.add_argument("--format", default="PNG", choices=["PNG", "JPEG"], help="截图格式")
+    parser.add_argument("--legacy", action="store_true", help="模拟旧版 Helper (只返回 Base64 JSON)")
+    parser.add_argument("--no-batch", action="store_true", help="不支持 /batch (模拟旧版 Helper)")
+    parser.add_argument("--hierarchy", nargs="?", const=FIXTURES_DIR, default=None,
+                        help="提供 /hierarchy，控件树取自该目录的 hierarchy_*.json (默认 fixtures/)")
+    parser.add_argument("--animation", type=float, default=None,
+                        help="每个动作后的动画时长 (秒)，不指定则动作不改变屏幕")
+    args = parser.parse_args()
+
+    animations = None
+    if args.animation is not None:
+        animations = {path: args.animation for path in ACTION_PATHS}
+    stub = StubHelper(port=args.port, latency=args.latency, image_format=args.format,
+                      binary=not args.legacy, animations=animations,
+                      batch=not (args.legacy or args.no_batch),
+                      hierarchies=load_hierarchies(args.hierarchy) if args.hierarchy else None)
+    print(f"模拟 Helper 运行中: {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+
+
+if __name__ == "__main__":
+    main()
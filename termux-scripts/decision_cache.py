@@ -0,0 +1,209 @@
+"""
+Open-AutoGLM 混合方案 - 跨任务的决策缓存
+
+同一个任务 (如 "打开淘宝搜索蓝牙耳机") 每天要跑很多次，相同屏幕上模型给出的坐标也相同。
+这里把 (规范化的任务, 屏幕指纹) -> 决策 记在 SQLite 里:
+- 只缓存验证过的决策: 动作执行成功且屏幕随后发生了变化
+- 查询时先按 dHash 汉明距离粗筛，再比较块均值，足够接近才直接重放，否则照常调用模型
+- 重放的动作执行失败或屏幕没有变化时删除该条目
+- 按最近使用时间淘汰 (LRU)，超过 TTL 未使用的条目过期
+
+重放的决策不经过模型，默认关闭，和规划模式、纯文字优先一样需要显式开启。
+
+配置:
+    AUTOGLM_DECISION_CACHE=1       开启 (默认关闭)
+    AUTOGLM_DECISION_CACHE_PATH    数据库路径，默认 ~/.autoglm/decisions.db
+    AUTOGLM_DECISION_CACHE_TTL     过期时间 (天)，默认 7
+    AUTOGLM_DECISION_CACHE_MAX     最多条目数，默认 2000
+    AUTOGLM_DECISION_MATCH_DIFF    允许变化的块比例，默认 0.01 (状态栏时间、图标变化)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional, Tuple
+
+from frame_cache import FrameFingerprint, block_diff, hamming
+
+DECISION_CACHE = os.getenv("AUTOGLM_DECISION_CACHE", "0") == "1"
+DECISION_CACHE_PATH = os.getenv("AUTOGLM_DECISION_CACHE_PATH",
+                                os.path.expanduser("~/.autoglm/decisions.db"))
+DECISION_CACHE_TTL = float(os.getenv("AUTOGLM_DECISION_CACHE_TTL", "7")) * 86400
+DECISION_CACHE_MAX = int(os.getenv("AUTOGLM_DECISION_CACHE_MAX", "2000"))
+DECISION_MATCH_DIFF = float(os.getenv("AUTOGLM_DECISION_MATCH_DIFF", "0.01"))
+DECISION_MAX_HAMMING = 6  # dHash 粗筛
+
+# 可以重放的决策；wait 没有意义，规划中的后续步骤依赖上下文
+CACHEABLE_ACTIONS = ("tap", "tap_text", "tap_id", "swipe", "input", "launch", "back", "home", "done",
+                     "batch")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY,
+    intent TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    dhash TEXT NOT NULL,
+    blocks BLOB NOT NULL,
+    decision TEXT NOT NULL,
+    successes INTEGER NOT NULL DEFAULT 1,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decisions_key ON decisions (intent, width, height);
+CREATE INDEX IF NOT EXISTS decisions_lru ON decisions (last_used);
+"""
+
+
+def normalize_intent(task: str) -> str:
+    """全角转半角、小写、去掉空白和标点，"打开淘宝，搜索 X" 与 "打开淘宝搜索x" 视为同一任务"""
+    text = unicodedata.normalize("NFKC", task).lower()
+    return "".join(c for c in text if unicodedata.category(c)[0] not in "PZC")
+
+
+class DecisionCache:
+    """SQLite 决策缓存，同一数据库可以被多个代理 (多台设备) 共用"""
+
+    def __init__(self, path: str = DECISION_CACHE_PATH, ttl: float = DECISION_CACHE_TTL,
+                 max_entries: int = DECISION_CACHE_MAX, match_diff: float = DECISION_MATCH_DIFF):
+        """
+        Args:
+            path: 数据库文件，":memory:" 表示只在内存中
+            ttl: 条目多久未使用后过期 (秒)
+            max_entries: 超过后按最近使用时间淘汰
+            match_diff: 块均值变化比例不超过该值才算同一屏幕
+        """
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.match_diff = match_diff
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.stored = 0
+        self.invalidated = 0
+        self.evicted = 0
+        self._expire()
+
+    def lookup(self, task: str, frame: FrameFingerprint) -> Tuple[Optional[int], Optional[dict]]:
+        """
+        查找同一任务下足够接近的屏幕
+
+        Returns:
+            (条目 id, 决策)，没有可信的匹配时为 (None, None)
+        """
+        self.lookups += 1
+        entry_id, decision, _ = self._match(normalize_intent(task), frame)
+        if entry_id is None:
+            return None, None
+        self.hits += 1
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE decisions SET last_used = ? WHERE id = ?",
+                               (time.time(), entry_id))
+        return entry_id, decision
+
+    def store(self, task: str, frame: FrameFingerprint, decision: dict):
+        """记录一个验证过的决策；同一屏幕已有条目时更新"""
+        if decision.get("action") not in CACHEABLE_ACTIONS:
+            return
+        record = {k: decision[k] for k in ("action", "params", "model_params", "thought")
+                  if k in decision}
+        data = json.dumps(record, ensure_ascii=False)
+        intent = normalize_intent(task)
+        now = time.time()
+        entry_id, old, _ = self._match(intent, frame)
+        with self._lock, self._conn:
+            if entry_id is not None:
+                # 同样的决策再次成功则累计，决策变了 (界面改版) 则重新计数
+                same = (old.get("action"), old.get("params")) == (record["action"], record.get("params"))
+                self._conn.execute(
+                    "UPDATE decisions SET decision = ?, last_used = ?, "
+                    "successes = CASE WHEN ? THEN successes + 1 ELSE 1 END WHERE id = ?",
+                    (data, now, same, entry_id))
+            else:
+                self._conn.execute(
+                    "INSERT INTO decisions (intent, width, height, dhash, blocks, decision, "
+                    "created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (intent, frame.size[0], frame.size[1], format(frame.dhash, "016x"),
+                     frame.blocks, data, now, now))
+                self.stored += 1
+        self._evict()
+
+    def confirm(self, entry_id: int):
+        """重放的决策再次成功"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE decisions SET successes = successes + 1 WHERE id = ?",
+                               (entry_id,))
+
+    def invalidate(self, entry_id: int):
+        """重放失败 (执行失败或屏幕没变化)，删除条目，下次重新询问模型"""
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM decisions WHERE id = ?", (entry_id,)).rowcount
+        self.invalidated += deleted
+
+    def clear(self, task: Optional[str] = None):
+        """清空全部或某个任务的缓存"""
+        with self._lock, self._conn:
+            if task is None:
+                self._conn.execute("DELETE FROM decisions")
+            else:
+                self._conn.execute("DELETE FROM decisions WHERE intent = ?", (normalize_intent(task),))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "model_calls_saved": self.hits,
+            "stored": self.stored,
+            "invalidated": self.invalidated,
+            "evicted": self.evicted,
+        }
+
+    def _match(self, intent: str, frame: FrameFingerprint) -> Tuple[Optional[int], Optional[dict], float]:
+        """返回最接近的未过期条目 (id, 决策, 变化比例)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, dhash, blocks, decision FROM decisions "
+                "WHERE intent = ? AND width = ? AND height = ? AND last_used >= ?",
+                (intent, frame.size[0], frame.size[1], time.time() - self.ttl)).fetchall()
+        best = (None, None, 1.0)
+        for entry_id, dhash, blocks, decision in rows:
+            if hamming(int(dhash, 16), frame.dhash) > DECISION_MAX_HAMMING:
+                continue
+            if len(blocks) != len(frame.blocks):
+                continue
+            diff = block_diff(blocks, frame.blocks)
+            if diff <= self.match_diff and diff < best[2]:
+                best = (entry_id, json.loads(decision), diff)
+        return best
+
+    def _expire(self):
+        with self._lock, self._conn:
+            self.evicted += self._conn.execute("DELETE FROM decisions WHERE last_used < ?",
+                                               (time.time() - self.ttl,)).rowcount
+
+    def _evict(self):
+        with self._lock, self._conn:
+            count = self._conn.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+            if count > self.max_entries:
+                self.evicted += self._conn.execute(
+                    "DELETE FROM decisions WHERE id IN "
+                    "(SELECT id FROM decisions ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,)).rowcount
@@ -289,6 +289,13 @@ create_launcher() {
     wget -O ~/.autoglm/autoglm_hybrid.py https://raw.githubusercontent.com/mulinAi/Open-AutoGLM-Hybrid-main/main/termux-scripts/autoglm_hybrid.py || {
         print_warning "下载失败，使用本地创建..."
     }
+
+    # 下载共享模块
+    for module in helper_transport.py image_prep.py frame_cache.py settle.py async_agent.py fleet.py adb_shell.py backend_manager.py model_stream.py action_parser.py prompt_builder.py decision_cache.py trajectory.py ui_tree.py local_resolver.py jobs.py state_store.py tracing.py stats.py; do
+        wget -O ~/.autoglm/$module https://raw.githubusercontent.com/mulinAi/Open-AutoGLM-Hybrid-main/main/termux-scripts/$module || {
+            print_warning "$module 下载失败"
+        }
+    done
     
     # 创建 autoglm 命令
     cat > ~/bin/autoglm << 'LAUNCHER_EOF'
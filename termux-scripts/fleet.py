@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Open-AutoGLM 混合方案 - 多设备并发调度
+
+一个进程驱动多台手机:
+- 设备可以是 Helper URL，也可以是 ADB 序列号 (自动 adb forward 到本地端口)
+- 任务队列由空闲设备领取，同时运行的代理数受 parallel 限制
+- 所有代理共享一个模型 API 限速器 (令牌桶 + 最大并发)
+- 输出每台设备和整体的吞吐指标: 任务/小时、步/秒、单步延迟 p50/p95
+
+用法:
+    python fleet.py --helpers http://127.0.0.1:8080,http://127.0.0.1:8081 \\
+                    --serials R58M123,R58M456 --tasks tasks.txt --parallel 4 --model-rps 2
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from typing import Callable, List, Optional
+
+import async_agent
+from autoglm_hybrid import AutoGLMAgent, DoubaoVisionModel, PhoneController
+from stats import percentile
+
+HELPER_PORT = 8080
+
+
+def forward_helper(serial: str, remote_port: int = HELPER_PORT) -> str:
+    """通过 adb forward 把设备上的 Helper 映射到本地随机端口，返回 Helper URL"""
+    result = subprocess.run(
+        ['adb', '-s', serial, 'forward', 'tcp:0', f'tcp:{remote_port}'],
+        capture_output=True, text=True, timeout=5, check=True
+    )
+    return f"http://127.0.0.1:{int(result.stdout.strip())}"
+
+
+class ModelRateLimiter:
+    """模型 API 共享限速器: 每秒 rate 次 (允许 burst 突发)，最多 max_concurrent 个并发请求"""
+
+    def __init__(self, rate: float, burst: int = 1, max_concurrent: int = 0):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._concurrency = asyncio.Semaphore(max_concurrent) if max_concurrent > 0 else None
+        self.waited = 0.0
+        self.acquired = 0
+
+    async def __aenter__(self):
+        start = time.monotonic()
+        if self._concurrency is not None:
+            await self._concurrency.acquire()
+        try:
+            if self.rate > 0:
+                async with self._lock:
+                    while True:
+                        now = time.monotonic()
+                        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                        self.updated = now
+                        if self.tokens >= 1:
+                            self.tokens -= 1
+                            break
+                        await asyncio.sleep((1 - self.tokens) / self.rate)
+        except BaseException:
+            if self._concurrency is not None:
+                self._concurrency.release()
+            raise
+        self.acquired += 1
+        self.waited += time.monotonic() - start
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._concurrency is not None:
+            self._concurrency.release()
+
+
+class DeviceMetrics:
+    """单台设备的统计"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.tasks_ok = 0
+        self.tasks_failed = 0
+        self.step_latencies = []
+        self.busy = 0.0
+
+    @property
+    def tasks(self) -> int:
+        return self.tasks_ok + self.tasks_failed
+
+    def summary(self, wall: float) -> dict:
+        steps = len(self.step_latencies)
+        return {
+            "device": self.name,
+            "tasks": self.tasks,
+            "ok": self.tasks_ok,
+            "failed": self.tasks_failed,
+            "steps": steps,
+            "tasks_per_hour": self.tasks / wall * 3600 if wall else 0.0,
+            "steps_per_sec": steps / wall if wall else 0.0,
+            "p50": percentile(self.step_latencies, 50),
+            "p95": percentile(self.step_latencies, 95),
+            "utilization": self.busy / wall if wall else 0.0,
+        }
+
+
+class FleetRunner:
+    """把任务队列分发到多台设备并发执行"""
+
+    def __init__(self, devices: List[str], agent_factory: Callable[[str, object], object],
+                 parallel: int = 0, limiter: Optional[ModelRateLimiter] = None):
+        """
+        Args:
+            devices: Helper URL 列表
+            agent_factory: (helper_url, limiter) -> AutoGLMAgent
+            parallel: 同时运行的代理数上限，0 表示每台设备一个
+            limiter: 所有代理共享的模型限速器
+        """
+        self.devices = devices
+        self.agent_factory = agent_factory
+        self.parallel = parallel or len(devices)
+        self.limiter = limiter
+        self.metrics = {url: DeviceMetrics(url) for url in devices}
+        self.results = []
+        self.wall = 0.0
+
+    async def run(self, tasks: List[str]) -> dict:
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in tasks:
+            queue.put_nowait(task)
+        # 每个代理的阻塞调用都在线程池里，线程数跟着并发度走
+        async_agent.configure_executor(self.parallel * 4 + 4)
+
+        slots = asyncio.Semaphore(self.parallel)
+        start = time.monotonic()
+        await asyncio.gather(*(self._device_worker(url, queue, slots) for url in self.devices))
+        self.wall = time.monotonic() - start
+        return self.report()
+
+    async def _device_worker(self, url: str, queue: asyncio.Queue, slots: asyncio.Semaphore):
+        metrics = self.metrics[url]
+        agent = None
+        while True:
+            async with slots:
+                try:
+                    task = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                if agent is None:
+                    agent = await async_agent.in_thread(self.agent_factory, url, self.limiter)
+                t0 = time.monotonic()
+                try:
+                    ok = await agent.run_async(task)
+                except Exception as e:
+                    print(f"❌ [{url}] 任务异常: {e}")
+                    ok = False
+                metrics.busy += time.monotonic() - t0
+                metrics.step_latencies.extend(agent.engine.step_latencies)
+                if ok:
+                    metrics.tasks_ok += 1
+                else:
+                    metrics.tasks_failed += 1
+                self.results.append({"device": url, "task": task, "ok": ok})
+
+    def report(self) -> dict:
+        devices = [m.summary(self.wall) for m in self.metrics.values()]
+        all_steps = [x for m in self.metrics.values() for x in m.step_latencies]
+        tasks = sum(m.tasks for m in self.metrics.values())
+        total = {
+            "tasks": tasks,
+            "ok": sum(m.tasks_ok for m in self.metrics.values()),
+            "steps": len(all_steps),
+            "wall": self.wall,
+            "tasks_per_hour": tasks / self.wall * 3600 if self.wall else 0.0,
+            "steps_per_sec": len(all_steps) / self.wall if self.wall else 0.0,
+            "p50": percentile(all_steps, 50),
+            "p95": percentile(all_steps, 95),
+        }
+        if self.limiter is not None:
+            total["model_calls"] = self.limiter.acquired
+            total["model_wait"] = self.limiter.waited
+        return {"devices": devices, "total": total}
+
+
+def print_report(report: dict):
+    print("\n" + "=" * 78)
+    print(f"{'设备':<32}{'任务':>6}{'成功':>6}{'步数':>6}{'任务/时':>9}{'步/秒':>7}{'p50':>7}{'p95':>7}")
+    for d in report["devices"]:
+        print(f"{d['device']:<32}{d['tasks']:>6}{d['ok']:>6}{d['steps']:>6}"
+              f"{d['tasks_per_hour']:>9.1f}{d['steps_per_sec']:>7.2f}{d['p50']:>6.2f}s{d['p95']:>6.2f}s")
+    t = report["total"]
+    print("-" * 78)
+    print(f"{'合计':<32}{t['tasks']:>6}{t['ok']:>6}{t['steps']:>6}"
+          f"{t['tasks_per_hour']:>9.1f}{t['steps_per_sec']:>7.2f}{t['p50']:>6.2f}s{t['p95']:>6.2f}s")
+    print(f"总耗时 {t['wall']:.1f}s", end="")
+    if "model_calls" in t:
+        print(f"，模型调用 {t['model_calls']} 次，限速等待共 {t['model_wait']:.1f}s", end="")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多设备并发执行任务")
+    parser.add_argument("--helpers", default="", help="逗号分隔的 Helper URL")
+    parser.add_argument("--serials", default="", help="逗号分隔的 ADB 序列号 (自动 adb forward)")
+    parser.add_argument("--tasks", required=True, help="任务文件，每行一个任务")
+    parser.add_argument("--parallel", type=int, default=0, help="最大并发代理数，默认每台设备一个")
+    parser.add_argument("--model-rps", type=float, default=0, help="模型 API 每秒最多请求数，0 不限")
+    parser.add_argument("--model-concurrency", type=int, default=0, help="模型 API 最大并发，0 不限")
+    args = parser.parse_args()
+
+    devices = [u for u in args.helpers.split(",") if u]
+    for serial in filter(None, args.serials.split(",")):
+        url = forward_helper(serial)
+        print(f"🔌 {serial} -> {url}")
+        devices.append(url)
+    if not devices:
+        print("❌ 请通过 --helpers 或 --serials 指定至少一台设备")
+        sys.exit(1)
+
+    with open(args.tasks, encoding="utf-8") as f:
+        tasks = [line.strip() for line in f if line.strip()]
+
+    model = DoubaoVisionModel()
+
+    def make_agent(url, limiter):
+        return AutoGLMAgent(PhoneController(url), model, limiter)
+
+    async def run():
+        limiter = None
+        if args.model_rps or args.model_concurrency:
+            limiter = ModelRateLimiter(args.model_rps, burst=max(1, int(args.model_rps)),
+                                       max_concurrent=args.model_concurrency)
+        runner = FleetRunner(devices, make_agent, args.parallel, limiter)
+        return await runner.run(tasks)
+
+    print(f"📱 设备 {len(devices)} 台，任务 {len(tasks)} 个")
+    print_report(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Open-AutoGLM 混合方案 - 屏幕帧指纹缓存
+
+用截图的块均值指纹判断两帧是否相同 / 几乎相同:
+- 屏幕没变时复用上一步的决策，省掉一次 2-10 秒的模型调用
+- 供 settle.py 判断屏幕是否已经稳定
+
+阈值 AUTOGLM_FRAME_DIFF_THRESHOLD: 允许变化的块比例，默认 0.002
+"""
+
+import os
+from typing import Optional, Tuple
+
+from PIL import Image
+
+FRAME_DIFF_THRESHOLD = float(os.getenv("AUTOGLM_FRAME_DIFF_THRESHOLD", "0.002"))
+FRAME_MAX_REUSE = int(os.getenv("AUTOGLM_FRAME_MAX_REUSE", "1"))
+
+GRID = (36, 80)          # 指纹网格 (宽 x 高)，竖屏约 30x30 像素一块
+BLOCK_TOLERANCE = 10     # 单块灰度均值变化超过该值才算变化，过滤 JPEG 噪声
+
+# 屏幕没变时可以直接复用的决策，其余动作 (input/launch/back/home) 重复执行有副作用
+REUSABLE_ACTIONS = ("wait", "tap", "tap_text", "tap_id", "swipe")
+
+
+class FrameFingerprint:
+    """截图指纹: 灰度块均值网格 + 64 位差值哈希"""
+
+    __slots__ = ("blocks", "size", "dhash")
+
+    def __init__(self, image: Image.Image):
+        thumb = image.convert("L").resize(GRID, Image.BOX)
+        self.blocks = thumb.tobytes()
+        self.size = image.size
+        self.dhash = _dhash(thumb)
+
+    @classmethod
+    def restore(cls, blocks: bytes, size: tuple, dhash: int) -> "FrameFingerprint":
+        """从保存的数据还原指纹 (决策缓存 / 轨迹回放)"""
+        frame = cls.__new__(cls)
+        frame.blocks = blocks
+        frame.size = tuple(size)
+        frame.dhash = dhash
+        return frame
+
+    def diff(self, other: "FrameFingerprint") -> float:
+        """变化块的比例 (0 表示完全相同)"""
+        if other is None or other.size != self.size:
+            return 1.0
+        return block_diff(self.blocks, other.blocks)
+
+
+def block_diff(a: bytes, b: bytes) -> float:
+    """两组块均值中变化块的比例"""
+    changed = sum(1 for x, y in zip(a, b) if abs(x - y) > BLOCK_TOLERANCE)
+    return changed / len(a)
+
+
+def _dhash(thumb: Image.Image) -> int:
+    """64 位差值哈希，用于做缓存键"""
+    small = thumb.resize((9, 8), Image.BOX).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = small[row * 9 + col], small[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class FrameCache:
+    """记住上一帧和基于它做出的决策"""
+
+    def __init__(self, threshold: float = FRAME_DIFF_THRESHOLD, max_reuse: int = FRAME_MAX_REUSE):
+        """
+        Args:
+            threshold: 变化块比例不超过该值视为同一帧
+            max_reuse: 同一帧上最多连续复用几次决策，之后重新询问模型
+        """
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0
+        self.reset()
+
+    def reset(self):
+        """新任务开始时清空"""
+        self.last_frame = None
+        self.last_decision = None
+        self.reuse_count = 0
+
+    def same(self, a: Optional[FrameFingerprint], b: Optional[FrameFingerprint]) -> bool:
+        return a is not None and b is not None and a.diff(b) <= self.threshold
+
+    def lookup(self, frame: FrameFingerprint) -> Tuple[bool, Optional[dict]]:
+        """
+        检查当前帧是否与上一帧相同
+
+        Returns:
+            (是否命中, 可直接复用的决策)。命中但不可复用时决策为 None，
+            调用方应带上 "屏幕未变化" 的提示重新询问模型。
+        """
+        if not self.same(frame, self.last_frame):
+            self.misses += 1
+            self.reuse_count = 0
+            return False, None
+
+        self.hits += 1
+        decision = self.last_decision
+        if (decision and decision.get("action") in REUSABLE_ACTIONS
+                and self.reuse_count < self.max_reuse):
+            self.reuse_count += 1
+            self.reused += 1
+            return True, decision
+        return True, None
+
+    def store(self, frame: FrameFingerprint, decision: dict):
+        """记录基于这一帧的模型决策"""
+        if not self.same(frame, self.last_frame):
+            self.reuse_count = 0
+        self.last_frame = frame
+        self.last_decision = decision
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "model_calls_saved": self.reused,
+        }
@@ -0,0 +1,235 @@
+"""
+Open-AutoGLM 混合方案 - AutoGLM Helper 共享传输层
+
+所有与 AutoGLM Helper (默认 :8080) 的 HTTP 通信都经过这里:
+- 复用 keep-alive 连接池，避免每个动作重新握手
+- 按接口设置超时
+- 统计连接复用 / 新建次数
+- 截图优先协商二进制图片，旧版 Helper 自动回退到 Base64 JSON
+- 批量动作一次请求发出 (/batch)，旧版 Helper 返回 404 时由调用方逐个执行
+- 控件树 (/hierarchy)，旧版 Helper 返回 404 后不再请求
+"""
+
+import base64
+import os
+import threading
+from io import BytesIO
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from PIL import Image
+
+import tracing
+
+# 各接口默认超时 (秒)，截图较大，滑动需要等待手势完成
+DEFAULT_TIMEOUTS = {
+    "/status": 3,
+    "/screenshot": 15,
+    "/tap": 5,
+    "/swipe": 10,
+    "/input": 5,
+    "/back": 5,
+    "/home": 5,
+    "/launch": 5,
+    "/batch": 10,  # 另加各步 delay_ms 之和
+    "/hierarchy": 5,
+}
+DEFAULT_TIMEOUT = 10
+
+POOL_SIZE = int(os.getenv("AUTOGLM_HELPER_POOL_SIZE", "4"))
+
+# 新版 Helper 看到 image/* 会直接返回图片字节；旧版忽略 Accept，仍返回 JSON
+SCREENSHOT_ACCEPT = "image/jpeg, image/png;q=0.9, application/json;q=0.5"
+
+
+class HelperTransport:
+    """AutoGLM Helper 的连接池客户端（线程安全）"""
+
+    def __init__(self, helper_url: str, pool_size: int = POOL_SIZE,
+                 timeouts: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            helper_url: AutoGLM Helper 的 URL
+            pool_size: 每个主机保持的 keep-alive 连接数
+            timeouts: 覆盖默认的接口超时，如 {"/screenshot": 20}
+        """
+        self.helper_url = helper_url.rstrip("/")
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+
+        self.session = requests.Session()
+        # Helper 只在本机，重试交给调用方决定
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                   max_retries=0, pool_block=False)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self.binary_screenshots = 0
+        self.batch_supported: Optional[bool] = None  # None 表示还不知道
+        self.hierarchy_supported: Optional[bool] = None
+
+    def timeout_for(self, endpoint: str) -> float:
+        """获取接口超时"""
+        return self.timeouts.get(endpoint, DEFAULT_TIMEOUT)
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """发送请求，未指定 timeout 时使用接口默认超时"""
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+        with self._lock:
+            self._requests += 1
+        try:
+            return self.session.request(method, f"{self.helper_url}{endpoint}", **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors += 1
+            raise
+
+    def get(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs) -> requests.Response:
+        return self.request("POST", endpoint, **kwargs)
+
+    def call(self, endpoint: str, payload: Optional[dict] = None) -> bool:
+        """POST 一个动作接口，返回 Helper 报告的 success"""
+        resp = self.post(endpoint, json=payload) if payload is not None else self.post(endpoint)
+        return resp.status_code == 200 and bool(resp.json().get("success", False))
+
+    def batch(self, actions: List[dict], stop_on_failure: bool = True) -> Optional[List[dict]]:
+        """
+        一次请求执行多个动作
+
+        Args:
+            actions: [{"action": "tap", "x": 1, "y": 2, "delay_ms": 500}, ...]
+            stop_on_failure: 某个动作失败后不再执行后面的动作
+
+        Returns:
+            每个已执行动作的结果 [{"action", "success", "elapsed_ms"}]；
+            Helper 不支持 /batch 时返回 None
+        """
+        if self.batch_supported is False:
+            return None
+        delays = sum(a.get("delay_ms", 0) for a in actions) / 1000
+        resp = self.post("/batch", json={"actions": actions, "stop_on_failure": stop_on_failure},
+                         timeout=self.timeout_for("/batch") + delays)
+        if resp.status_code == 404:
+            self.batch_supported = False
+            return None
+        self.batch_supported = True
+        if resp.status_code != 200:
+            return [{"action": a.get("action"), "success": False} for a in actions[:1]]
+        return resp.json().get("results", [])
+
+    def hierarchy(self, max_nodes: Optional[int] = None) -> Optional[dict]:
+        """
+        获取当前窗口的控件树 (格式见 ui_tree.py)
+
+        Returns:
+            控件树 JSON；Helper 不支持或没有活动窗口时返回 None
+        """
+        if self.hierarchy_supported is False:
+            return None
+        kwargs = {"params": {"max_nodes": max_nodes}} if max_nodes else {}
+        resp = self.get("/hierarchy", **kwargs)
+        if resp.status_code == 404:
+            self.hierarchy_supported = False
+            return None
+        self.hierarchy_supported = True
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        return data if data.get("success") else None
+
+    def screenshot(self, timeout: Optional[float] = None,
+                   max_edge: Optional[int] = None) -> Optional[Image.Image]:
+        """
+        获取截图
+
+        Args:
+            timeout: 覆盖默认超时
+            max_edge: 让 Helper 先缩放到该长边再编码 (旧版 Helper 忽略，返回原图)
+
+        Returns:
+            PIL.Image 对象，Helper 报告失败时返回 None (网络异常直接抛出)
+        """
+        kwargs = {"headers": {"Accept": SCREENSHOT_ACCEPT}}
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if max_edge:
+            kwargs["params"] = {"max_edge": max_edge}
+        with tracing.span("helper.http", endpoint="/screenshot") as span:
+            resp = self.get("/screenshot", **kwargs)
+            span.set(bytes=len(resp.content))
+        if resp.status_code != 200:
+            return None
+
+        if resp.headers.get("Content-Type", "").startswith("image/"):
+            # 二进制图片: 直接从响应字节解码，没有中间的 Base64 字符串
+            with self._lock:
+                self.binary_screenshots += 1
+            return _decode(resp.content)
+
+        with tracing.span("image.base64_decode"):
+            data = resp.json()
+            image = base64.b64decode(data["image"]) if data.get("success") and data.get("image") else None
+        return _decode(image) if image else None
+
+    def stats(self) -> dict:
+        """连接统计: 请求数、新建连接数、复用次数"""
+        new_connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                new_connections += pool.num_connections
+        with self._lock:
+            total, errors = self._requests, self._errors
+            binary = self.binary_screenshots
+        return {
+            "requests": total,
+            "errors": errors,
+            "new_connections": new_connections,
+            "reused": max(0, total - errors - new_connections),
+            "binary_screenshots": binary,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+def request_not_sent(e: Exception) -> bool:
+    """异常发生在请求到达 Helper 之前 (连接被拒绝 / 连接超时)，动作确定没有执行，可以安全重做"""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(e, requests.exceptions.ConnectionError) and e.args:
+        return isinstance(getattr(e.args[0], "reason", None), NewConnectionError)
+    return False
+
+
+def _decode(data: bytes) -> Image.Image:
+    """解码图片并立即加载像素，之后可在多个线程间共享"""
+    with tracing.span("image.decode"):
+        img = Image.open(BytesIO(data))
+        img.load()
+    return img
+
+
+_shared: Dict[str, HelperTransport] = {}
+_shared_lock = threading.Lock()
+
+
+def get_transport(helper_url: str) -> HelperTransport:
+    """获取某个 Helper URL 的共享传输实例（同一进程内复用同一个连接池）"""
+    key = helper_url.rstrip("/")
+    with _shared_lock:
+        transport = _shared.get(key)
+        if transport is None:
+            transport = HelperTransport(key)
+            _shared[key] = transport
+        return transport
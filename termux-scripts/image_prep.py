@@ -0,0 +1,160 @@
+"""
+Open-AutoGLM 混合方案 - 视觉模型输入图片预处理
+
+截图在上传给视觉模型前统一经过这里:
+- 按长边缩放 (AUTOGLM_IMAGE_MAX_EDGE，0 表示不缩放)
+- 编码为 JPEG / WebP / PNG (AUTOGLM_IMAGE_FORMAT, AUTOGLM_IMAGE_QUALITY)
+- 可选灰度 (AUTOGLM_IMAGE_GRAYSCALE=1)
+
+模型看到的是缩放后的图片，返回的坐标需要用 PreparedImage.to_device 换算回设备像素；
+不经过截图得到的决策 (本地解析、纯文字模式) 用 ImagePreparer.to_model 换算成模型坐标写进历史。
+"""
+
+import base64
+import os
+import time
+from io import BytesIO
+
+from PIL import Image
+
+import tracing
+
+IMAGE_MAX_EDGE = int(os.getenv("AUTOGLM_IMAGE_MAX_EDGE", "1280"))
+IMAGE_FORMAT = os.getenv("AUTOGLM_IMAGE_FORMAT", "JPEG").upper()
+IMAGE_QUALITY = int(os.getenv("AUTOGLM_IMAGE_QUALITY", "80"))
+IMAGE_GRAYSCALE = os.getenv("AUTOGLM_IMAGE_GRAYSCALE", "0") == "1"
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+# 模型返回参数中表示坐标的字段
+X_KEYS = ("x", "x1", "x2")
+Y_KEYS = ("y", "y1", "y2")
+
+
+def scale_params(params: dict, scale_x: float, scale_y: float) -> dict:
+    """按比例换算坐标字段，非坐标字段原样保留"""
+    if not isinstance(params, dict):
+        return params
+    converted = dict(params)
+    for keys, scale in ((X_KEYS, scale_x), (Y_KEYS, scale_y)):
+        for key in keys:
+            if key in converted:
+                try:
+                    converted[key] = int(round(float(converted[key]) * scale))
+                except (TypeError, ValueError):
+                    pass
+    return converted
+
+
+class PreparedImage:
+    """编码好的模型输入图片"""
+
+    def __init__(self, data_url: str, width: int, height: int, device_size: tuple,
+                 encode_ms: float, payload_bytes: int, image_format: str):
+        self.data_url = data_url
+        self.width = width            # 模型看到的尺寸
+        self.height = height
+        self.device_width, self.device_height = device_size
+        self.scale_x = self.device_width / width    # 设备像素 / 模型像素
+        self.scale_y = self.device_height / height
+        self.encode_ms = encode_ms
+        self.payload_bytes = payload_bytes
+        self.format = image_format
+
+    def to_device(self, params: dict) -> dict:
+        """把模型坐标换算回设备像素，非坐标字段原样保留"""
+        if not self.scaled:
+            return params
+        return scale_params(params, self.scale_x, self.scale_y)
+
+    @property
+    def scaled(self) -> bool:
+        return (self.width, self.height) != (self.device_width, self.device_height)
+
+    def summary(self) -> str:
+        return (f"{self.width}x{self.height} {self.format} "
+                f"{self.payload_bytes / 1024:.0f}KB 编码{self.encode_ms:.0f}ms")
+
+    def stats(self) -> dict:
+        return {
+            "width": self.width,
+            "height": self.height,
+            "device_width": self.device_width,
+            "device_height": self.device_height,
+            "format": self.format,
+            "encode_ms": self.encode_ms,
+            "payload_bytes": self.payload_bytes,
+        }
+
+
+class ImagePreparer:
+    """按配置缩放并编码截图"""
+
+    def __init__(self, max_edge: int = IMAGE_MAX_EDGE, image_format: str = IMAGE_FORMAT,
+                 quality: int = IMAGE_QUALITY, grayscale: bool = IMAGE_GRAYSCALE):
+        """
+        Args:
+            max_edge: 长边目标像素，0 表示保持原尺寸
+            image_format: JPEG / WEBP / PNG
+            quality: JPEG / WebP 质量 (1-100)
+            grayscale: 是否转为灰度
+        """
+        image_format = image_format.upper()
+        if image_format == "JPG":
+            image_format = "JPEG"
+        if image_format not in MIME_TYPES:
+            raise ValueError(f"不支持的图片格式: {image_format}")
+        self.max_edge = max_edge
+        self.format = image_format
+        self.quality = quality
+        self.grayscale = grayscale
+
+    def model_size(self, width: int, height: int) -> tuple:
+        """设备截图缩放后模型看到的尺寸"""
+        long_edge = max(width, height)
+        if self.max_edge and long_edge > self.max_edge:
+            ratio = self.max_edge / long_edge
+            return max(1, round(width * ratio)), max(1, round(height * ratio))
+        return width, height
+
+    def to_model(self, params: dict, device_size: tuple) -> dict:
+        """把设备像素换算成模型看到的图片坐标，与 PreparedImage.to_device 互逆"""
+        width, height = device_size
+        new_width, new_height = self.model_size(width, height)
+        if (new_width, new_height) == (width, height):
+            return params
+        return scale_params(params, new_width / width, new_height / height)
+
+    def prepare(self, image: Image.Image) -> PreparedImage:
+        t0 = time.perf_counter()
+        device_size = width, height = image.size
+
+        new_size = self.model_size(width, height)
+        if new_size != device_size:
+            with tracing.span("image.resize"):
+                image = image.resize(new_size, Image.BILINEAR)
+
+        if self.grayscale:
+            image = image.convert("L")
+        elif image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buf = BytesIO()
+        with tracing.span("image.encode", format=self.format):
+            if self.format == "PNG":
+                image.save(buf, format="PNG")
+            else:
+                image.save(buf, format=self.format, quality=self.quality)
+        payload = buf.getvalue()
+        with tracing.span("image.base64_encode"):
+            data_url = f"data:{MIME_TYPES[self.format]};base64,{base64.b64encode(payload).decode()}"
+
+        return PreparedImage(
+            data_url=data_url,
+            width=image.width,
+            height=image.height,
+            device_size=device_size,
+            encode_ms=(time.perf_counter() - t0) * 1000,
+            payload_bytes=len(payload),
+            image_format=self.format,
+        )
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Open-AutoGLM 混合方案 - 任务队列
+
+Web 控制台的任务管理:
+- 每个任务有 ID、优先级、状态和自己的日志，结束后保留结果供查询
+- 优先级高的先执行，同优先级按提交顺序；可以指定在哪台设备上执行
+- 每台设备一个工作线程，空闲时从队列领取任务
+- 排队中的任务取消后直接出队；运行中的任务设置取消标志，由执行函数在步骤之间检查
+
+状态变化和日志通过回调通知 (在队列锁之外调用)，控制台据此推送事件。
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List, Optional
+
+JOB_HISTORY = int(os.getenv("AUTOGLM_JOB_HISTORY", "200"))  # 保留多少个已结束的任务
+JOB_LOGS = 200  # 每个任务保留的日志行数
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class Job:
+    """一个任务及其执行状态"""
+
+    def __init__(self, job_id: str, task: str, priority: int = 0,
+                 device: Optional[str] = None, max_steps: int = 25):
+        self.id = job_id
+        self.task = task
+        self.priority = priority
+        self.device = device        # 指定的设备；None 表示任意空闲设备，开始执行后为实际设备
+        self.max_steps = max_steps
+        self.status = QUEUED
+        self.step = 0
+        self.thought = ""
+        self.action = ""
+        self.result = None
+        self.error = ""
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.logs = deque(maxlen=JOB_LOGS)
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def to_dict(self, logs: bool = False) -> dict:
+        data = {
+            "id": self.id,
+            "task": self.task,
+            "priority": self.priority,
+            "device": self.device,
+            "status": self.status,
+            "step": self.step,
+            "max_steps": self.max_steps,
+            "thought": self.thought,
+            "action": self.action,
+            "result": self.result,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if logs:
+            data["logs"] = list(self.logs)
+        return data
+
+
+class JobQueue:
+    """
+    按优先级排队的任务，每台设备一个工作线程
+
+    排队的任务一般只有几十个，领取时线性扫描即可，指定设备的任务也不需要单独的队列。
+    """
+
+    def __init__(self, on_change: Optional[Callable[[Job, dict], None]] = None,
+                 on_log: Optional[Callable[[Job, str], None]] = None,
+                 history: int = JOB_HISTORY):
+        """
+        Args:
+            on_change: 任务字段变化时调用 (job, 变化的字段)
+            on_log: 任务写日志时调用 (job, 日志内容)
+            history: 保留多少个已结束的任务
+        """
+        self.on_change = on_change
+        self.on_log = on_log
+        self.history = history
+        self.cond = threading.Condition()
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.queued: List[tuple] = []   # (-priority, 序号, job)
+        self.devices: List[str] = []
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._workers: List[threading.Thread] = []
+
+    # ---------- 提交 / 查询 / 取消 ----------
+
+    def submit(self, task: str, priority: int = 0, device: Optional[str] = None,
+               max_steps: int = 25) -> Job:
+        if device is not None and self.devices and device not in self.devices:
+            raise ValueError(f"未知设备: {device}")
+        with self.cond:
+            job = Job(f"j{next(self._ids)}", task, priority, device, max_steps)
+            self.jobs[job.id] = job
+            self.queued.append((-priority, next(self._seq), job))
+            self.cond.notify_all()
+        self._changed(job, job.to_dict())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.cond:
+            return self.jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None) -> List[Job]:
+        """按提交顺序返回任务"""
+        with self.cond:
+            return [job for job in self.jobs.values() if status is None or job.status == status]
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务；已经结束的任务返回 False"""
+        with self.cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job.cancel_event.set()
+            if job.status == QUEUED:
+                self.queued = [entry for entry in self.queued if entry[2] is not job]
+                self._finish_locked(job, CANCELLED)
+                changes = {"status": CANCELLED, "finished": job.finished}
+            else:
+                changes = None  # 运行中: 执行函数在下一步之前退出
+        if changes:
+            self._changed(job, changes)
+        self.log(job, "⏹ 已取消" if changes else "⏹ 请求取消")
+        return True
+
+    def counts(self) -> Dict[str, int]:
+        with self.cond:
+            result = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED, CANCELLED)}
+            for job in self.jobs.values():
+                result[job.status] += 1
+            return result
+
+    # ---------- 执行过程中的更新 ----------
+
+    def update(self, job: Job, **changes):
+        """执行函数更新 step / thought / action 等字段"""
+        with self.cond:
+            changes = {k: v for k, v in changes.items() if getattr(job, k) != v}
+            for key, value in changes.items():
+                setattr(job, key, value)
+        if changes:
+            self._changed(job, changes)
+
+    def log(self, job: Job, msg: str):
+        job.logs.append(f"[{time.strftime('%H:%M:%S')}] {msg}")
+        if self.on_log:
+            self.on_log(job, msg)
+
+    # ---------- 工作线程 ----------
+
+    def next(self, device: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """领取 device 能执行的优先级最高的任务，开始执行；队列关闭或超时返回 None"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while not self.closed:
+                eligible = [entry for entry in self.queued if entry[2].device in (None, device)]
+                if eligible:
+                    entry = min(eligible, key=lambda e: e[:2])
+                    self.queued.remove(entry)
+                    job = entry[2]
+                    job.status = RUNNING
+                    job.device = device
+                    job.started = time.time()
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+            else:
+                return None
+        self._changed(job, {"status": RUNNING, "device": device, "started": job.started})
+        return job
+
+    def start_workers(self, devices: Dict[str, object], runner: Callable[[Job, object], dict]):
+        """
+        每台设备启动一个工作线程
+
+        Args:
+            devices: 设备名 -> 传给 runner 的设备对象
+            runner: runner(job, 设备对象) 执行任务，返回结果 dict，其中 "ok" 表示是否成功
+        """
+        self.devices = list(devices)
+        for name, device in devices.items():
+            worker = threading.Thread(target=self._work, args=(name, device, runner),
+                                      name=f"job-{name}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self, name: str, device, runner):
+        while True:
+            job = self.next(name)
+            if job is None:
+                return
+            status, result, error = FAILED, None, ""
+            try:
+                result = runner(job, device)
+                if job.cancelled:
+                    status = CANCELLED
+                elif result and result.get("ok"):
+                    status = DONE
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                self.log(job, f"❌ 执行出错: {error}")
+            with self.cond:
+                job.result = result
+                job.error = error
+                self._finish_locked(job, status)
+            self._changed(job, {"status": status, "result": result, "error": error,
+                                "finished": job.finished})
+
+    def close(self):
+        """停止领取新任务 (运行中的任务不受影响)"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    # ---------- 内部 ----------
+
+    def _finish_locked(self, job: Job, status: str):
+        job.status = status
+        job.finished = time.time()
+        finished = [j for j in self.jobs.values() if j.status in FINISHED]
+        for old in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[old.id]
+
+    def _changed(self, job: Job, changes: dict):
+        if self.on_change:
+            self.on_change(job, changes)
@@ -0,0 +1,475 @@
+"""
+Open-AutoGLM 混合方案 - 本地解析 (模型调用之前的快速路径)
+
+很多步骤不需要模型: 点击写着 "搜索" 的按钮、关掉一个见过的弹窗。
+模型调用之前按顺序尝试一组本地解析器，有把握时直接给出操作，否则交给模型:
+- TextRuleResolver: 基于控件树 (/hierarchy) 的规则，如关闭 "跳过"/"我知道了" 弹窗、
+  输入关键词后点击 "搜索" 按钮
+- TemplateResolver: 纯 CPU 模板匹配 (只依赖 Pillow)，在截图中查找模板库里已知的界面元素
+
+ResolverChain 记录每个解析器的尝试次数、命中率和耗时。
+
+本地解析给出的操作不经过模型，默认关闭，需要时显式开启。
+
+模板库: AUTOGLM_TEMPLATE_DIR 下的 templates.json + PNG，用本文件的命令行添加:
+    python local_resolver.py add close_popup screen.png 470 1430 610 1570 --region 0.2 0.4 0.8 0.8
+    python local_resolver.py list
+    python local_resolver.py test screen.png
+
+配置:
+    AUTOGLM_LOCAL_RESOLVE=1        开启 (默认关闭)
+    AUTOGLM_TEMPLATE_DIR           模板库目录，默认 ~/.autoglm/templates
+    AUTOGLM_TEMPLATE_THRESHOLD     模板平均灰度差 (0-1) 不超过该值才算匹配，默认 0.08
+"""
+
+import array
+import json
+import os
+import time
+from typing import Callable, List, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageFilter, ImageMath, ImageStat
+
+from action_parser import ACTION_SCHEMAS, validate_action
+from stats import percentile
+from ui_tree import UITree, normalize_text
+
+LOCAL_RESOLVE = os.getenv("AUTOGLM_LOCAL_RESOLVE", "0") == "1"
+TEMPLATE_DIR = os.getenv("AUTOGLM_TEMPLATE_DIR", os.path.expanduser("~/.autoglm/templates"))
+TEMPLATE_THRESHOLD = float(os.getenv("AUTOGLM_TEMPLATE_THRESHOLD", "0.08"))
+
+MATCH_WIDTH = 270      # 匹配时截图缩放到的宽度
+COARSE_FACTOR = 4      # 粗搜索在 1/4 尺寸上全区域扫描，再在原尺寸上细化
+COARSE_CANDIDATES = 3  # 粗搜索保留的候选位置
+MIN_CONTRAST = 12.0    # 模板灰度标准差低于该值 (纯色块) 到处都能匹配，不使用
+SMOOTH_RADIUS = 1      # 细化前两边都做轻微模糊，缩放时的亚像素错位不至于让细线条差异过大
+
+# 弹窗上可以直接点掉的按钮文字 (完全相同才点)
+DISMISS_LABELS = ("跳过", "跳过广告", "我知道了", "知道了", "以后再说", "暂不升级", "暂不开启",
+                  "关闭广告", "不再提示")
+SUBMIT_LABELS = ("搜索",)
+
+_DIFF_LUTS = [[abs(v - c) for v in range(256)] for c in range(256)]
+
+
+class ResolveContext:
+    """一步的输入；灰度缩略图和控件树按需生成，多个解析器共用"""
+
+    def __init__(self, task: str, screenshot: Image.Image, history: list,
+                 tree_loader: Optional[Callable[[], Optional[UITree]]] = None):
+        self.task = task
+        self.screenshot = screenshot
+        self.history = history or []
+        self._tree_loader = tree_loader
+        self._tree_loaded = False
+        self._tree = None
+        self._gray = {}
+
+    @property
+    def tree(self) -> Optional[UITree]:
+        if not self._tree_loaded:
+            self._tree_loaded = True
+            if self._tree_loader is not None:
+                self._tree = self._tree_loader()
+        return self._tree
+
+    def gray(self, width: int) -> Image.Image:
+        """缩放到指定宽度的灰度图"""
+        if width not in self._gray:
+            image = self.screenshot.convert("L")
+            height = max(1, round(image.height * width / image.width))
+            self._gray[width] = image.resize((width, height), Image.BOX)
+        return self._gray[width]
+
+    def smooth(self, width: int) -> Image.Image:
+        key = ("smooth", width)
+        if key not in self._gray:
+            self._gray[key] = self.gray(width).filter(ImageFilter.BoxBlur(SMOOTH_RADIUS))
+        return self._gray[key]
+
+    def last_step(self) -> Optional[dict]:
+        for entry in reversed(self.history):
+            if 'step' in entry:
+                return entry
+        return None
+
+
+def _decision(action: str, params: dict, thought: str, source: str) -> dict:
+    # 坐标是设备像素；写进历史前由代理换算成模型图片坐标 (model_params)
+    return {'action': action, 'params': params, 'thought': thought, 'source': source}
+
+
+class Resolver:
+    """本地解析器: 有把握时返回决策，否则返回 None"""
+
+    name = "resolver"
+
+    def resolve(self, ctx: ResolveContext) -> Optional[dict]:
+        raise NotImplementedError
+
+
+class TextRuleResolver(Resolver):
+    """基于控件树文字的规则"""
+
+    name = "text_rule"
+
+    def __init__(self, dismiss_labels: tuple = DISMISS_LABELS, submit_labels: tuple = SUBMIT_LABELS):
+        self.dismiss_labels = {normalize_text(label) for label in dismiss_labels}
+        self.submit_labels = {normalize_text(label) for label in submit_labels}
+
+    def resolve(self, ctx: ResolveContext) -> Optional[dict]:
+        tree = ctx.tree
+        if tree is None or not len(tree):
+            return None
+        return self._dismiss(tree) or self._submit(ctx, tree)
+
+    def _dismiss(self, tree: UITree) -> Optional[dict]:
+        for node in tree.nodes:
+            if node.clickable and normalize_text(node.label) in self.dismiss_labels:
+                x, y = node.center
+                return _decision('tap', {'x': x, 'y': y}, f"本地规则: 关闭弹窗「{node.label}」",
+                                 self.name)
+        return None
+
+    def _submit(self, ctx: ResolveContext, tree: UITree) -> Optional[dict]:
+        """上一步输入了关键词且输入框里就是它时，点击搜索按钮"""
+        last = ctx.last_step()
+        if last is None or last.get('action') != 'input':
+            return None
+        typed = normalize_text((last.get('params') or {}).get('text', ''))
+        if not typed or not any(n.editable and normalize_text(n.text) == typed for n in tree.nodes):
+            return None
+        buttons = [n for n in tree.nodes
+                   if normalize_text(n.label) in self.submit_labels and tree.target(n).clickable]
+        if len(buttons) != 1:
+            return None  # 没有或有多个搜索按钮，交给模型
+        x, y = tree.target(buttons[0]).center
+        return _decision('tap', {'x': x, 'y': y}, f"本地规则: 输入后点击「{buttons[0].label}」",
+                         self.name)
+
+
+class Template:
+    """模板库中的一个界面元素"""
+
+    def __init__(self, name: str, image: Image.Image, screen_width: int, action: str = "tap",
+                 params: Optional[dict] = None, region: Optional[list] = None,
+                 offset: Optional[list] = None, threshold: float = TEMPLATE_THRESHOLD,
+                 tasks: Optional[list] = None):
+        """
+        Args:
+            image: 从截图上裁下的模板 (原始分辨率)
+            screen_width: 截取模板时的屏幕宽度，其他分辨率按宽度等比缩放
+            action: 匹配后的操作，tap 点击模板中心 (+offset)，其他操作使用 params
+            region: 搜索区域 [左, 上, 右, 下]，屏幕比例 0-1，默认全屏
+            tasks: 只在任务包含其中某个关键词时使用，空表示所有任务
+        """
+        self.name = name
+        self.image = image.convert("L")
+        self.screen_width = screen_width
+        self.action = action
+        self.params = params or {}
+        self.region = region or [0.0, 0.0, 1.0, 1.0]
+        self.offset = offset or [0, 0]
+        self.threshold = threshold
+        self.tasks = [normalize_text(t) for t in tasks or []]
+        self.contrast = ImageStat.Stat(self.image).stddev[0]
+        self._scaled = {}
+
+    def applies_to(self, task: str) -> bool:
+        if not self.tasks:
+            return True
+        wanted = normalize_text(task)
+        return any(keyword in wanted for keyword in self.tasks)
+
+    def scaled(self, ratio: float) -> Image.Image:
+        """按屏幕宽度比例缩放的模板"""
+        key = round(ratio, 4)
+        if key not in self._scaled:
+            width = max(1, round(self.image.width * ratio))
+            height = max(1, round(self.image.height * ratio))
+            self._scaled[key] = self.image.resize((width, height), Image.BOX)
+        return self._scaled[key]
+
+    def smoothed(self, ratio: float) -> Image.Image:
+        """缩放并模糊，去掉受模板外像素影响的边缘一圈"""
+        key = ("smooth", round(ratio, 4))
+        if key not in self._scaled:
+            image = self.scaled(ratio).filter(ImageFilter.BoxBlur(SMOOTH_RADIUS))
+            m = SMOOTH_RADIUS
+            self._scaled[key] = image.crop((m, m, image.width - m, image.height - m))
+        return self._scaled[key]
+
+    def to_dict(self, filename: str) -> dict:
+        return {"name": self.name, "image": filename, "screen_width": self.screen_width,
+                "action": self.action, "params": self.params, "region": self.region,
+                "offset": self.offset, "threshold": self.threshold, "tasks": self.tasks}
+
+
+class TemplateLibrary:
+    """模板库目录: templates.json 清单 + 每个模板一张 PNG"""
+
+    MANIFEST = "templates.json"
+
+    def __init__(self, directory: str = TEMPLATE_DIR):
+        self.directory = directory
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.directory, self.MANIFEST)
+
+    def _manifest(self) -> list:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def load(self) -> List[Template]:
+        templates = []
+        for entry in self._manifest():
+            try:
+                image = Image.open(os.path.join(self.directory, entry["image"]))
+                template = Template(entry["name"], image, int(entry["screen_width"]),
+                                    entry.get("action", "tap"), entry.get("params"),
+                                    entry.get("region"), entry.get("offset"),
+                                    float(entry.get("threshold", TEMPLATE_THRESHOLD)),
+                                    entry.get("tasks"))
+            except (OSError, KeyError, ValueError) as e:
+                print(f"⚠️ 模板无法加载，忽略: {entry.get('name')} ({e})")
+                continue
+            if template.contrast < MIN_CONTRAST:
+                print(f"⚠️ 模板 {template.name} 几乎是纯色 (标准差 {template.contrast:.1f})，忽略")
+                continue
+            templates.append(template)
+        return templates
+
+    def add(self, name: str, screenshot: Image.Image, box: Tuple[int, int, int, int],
+            **options) -> Template:
+        """从截图裁下 box 区域加入模板库，同名模板被替换"""
+        os.makedirs(self.directory, exist_ok=True)
+        template = Template(name, screenshot.crop(box), screenshot.width, **options)
+        filename = f"{name}.png"
+        template.image.save(os.path.join(self.directory, filename))
+        manifest = [e for e in self._manifest() if e.get("name") != name]
+        manifest.append(template.to_dict(filename))
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.manifest_path)
+        return template
+
+
+def _add(a: Image.Image, b: Image.Image) -> Image.Image:
+    if hasattr(ImageMath, "lambda_eval"):
+        return ImageMath.lambda_eval(lambda args: args["a"] + args["b"], a=a, b=b)
+    return ImageMath.eval("a + b", a=a, b=b)
+
+
+def sad_map(screen: Image.Image, template: Image.Image) -> Tuple[array.array, int, int]:
+    """
+    模板在每个位置的灰度差绝对值之和 (SAD)
+
+    按模板像素循环，每次对整张图做一次查表和加法 (都在 C 里完成)，
+    模板像素少、位置多时比逐个位置裁剪比较快得多。
+
+    Returns:
+        (SAD 数组, 宽, 高)，位置 (x, y) 的值在 y * 宽 + x
+    """
+    out_w = screen.width - template.width + 1
+    out_h = screen.height - template.height + 1
+    acc = None
+    pixels = template.load()
+    for j in range(template.height):
+        for i in range(template.width):
+            patch = screen.crop((i, j, i + out_w, j + out_h)).point(_DIFF_LUTS[pixels[i, j]])
+            patch = patch.convert("I")
+            acc = patch if acc is None else _add(acc, patch)
+    return array.array("i", acc.tobytes()), out_w, out_h
+
+
+def _crop_score(screen: Image.Image, template: Image.Image, x: int, y: int) -> float:
+    """单个位置的平均灰度差 (0-1)"""
+    crop = screen.crop((x, y, x + template.width, y + template.height))
+    return ImageStat.Stat(ImageChops.difference(crop, template)).mean[0] / 255
+
+
+class TemplateResolver(Resolver):
+    """在截图中查找模板库里的界面元素，唯一且足够相似时执行模板对应的操作"""
+
+    name = "template"
+
+    def __init__(self, templates: List[Template]):
+        self.templates = templates
+
+    def resolve(self, ctx: ResolveContext) -> Optional[dict]:
+        for template in self.templates:
+            if not template.applies_to(ctx.task):
+                continue
+            match = self.match(ctx, template)
+            if match is None:
+                continue
+            x, y, score = match
+            thought = f"本地模板「{template.name}」(差异 {score:.3f})"
+            if template.action == "tap":
+                params = {'x': x + template.offset[0], 'y': y + template.offset[1]}
+                return _decision('tap', params, thought, self.name)
+            valid, errors = validate_action({'action': template.action, 'params': template.params})
+            if not errors:
+                return _decision(valid['action'], valid['params'], thought, self.name)
+        return None
+
+    def match(self, ctx: ResolveContext, template: Template) -> Optional[Tuple[int, int, float]]:
+        """
+        Returns:
+            (模板中心的截图坐标 x, y, 平均灰度差)；没有匹配或有多处匹配时返回 None
+        """
+        width = ctx.screenshot.width
+        fine = ctx.smooth(MATCH_WIDTH)
+        coarse = ctx.gray(MATCH_WIDTH // COARSE_FACTOR)
+        ratio = MATCH_WIDTH / template.screen_width
+        fine_t = template.smoothed(ratio)
+        coarse_t = template.scaled(ratio / COARSE_FACTOR)
+        left, top, right, bottom = template.region
+        box = (int(left * coarse.width), int(top * coarse.height),
+               int(right * coarse.width), int(bottom * coarse.height))
+        region = coarse.crop(box)
+        if region.width < coarse_t.width or region.height < coarse_t.height or min(fine_t.size) < 4:
+            return None
+
+        sad, out_w, _ = sad_map(region, coarse_t)
+        # 粗搜索的候选: 按 SAD 排序，互相不重叠
+        candidates = []
+        for index in sorted(range(len(sad)), key=sad.__getitem__):
+            cx, cy = index % out_w, index // out_w
+            if all(abs(cx - px) >= coarse_t.width or abs(cy - py) >= coarse_t.height
+                   for px, py in candidates):
+                candidates.append((cx, cy))
+                if len(candidates) >= COARSE_CANDIDATES:
+                    break
+
+        matches = []
+        max_x, max_y = fine.width - fine_t.width, fine.height - fine_t.height
+        for cx, cy in candidates:
+            gx = (cx + box[0]) * fine.width // coarse.width + SMOOTH_RADIUS
+            gy = (cy + box[1]) * fine.height // coarse.height + SMOOTH_RADIUS
+            best = None
+            for y in range(max(0, gy - COARSE_FACTOR), min(max_y, gy + COARSE_FACTOR) + 1):
+                for x in range(max(0, gx - COARSE_FACTOR), min(max_x, gx + COARSE_FACTOR) + 1):
+                    score = _crop_score(fine, fine_t, x, y)
+                    if best is None or score < best[2]:
+                        best = (x, y, score)
+            if best is not None and best[2] <= template.threshold:
+                matches.append(best)
+        if len(matches) != 1:
+            return None  # 没找到，或者同样的元素出现了多次 (不知道该点哪个)
+        x, y, score = matches[0]
+        scale = width / fine.width
+        return (round((x + fine_t.width / 2) * scale), round((y + fine_t.height / 2) * scale), score)
+
+
+class ResolverStats:
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.errors = 0
+        self.latencies = []
+
+    def to_dict(self) -> dict:
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.attempts if self.attempts else 0.0,
+            "errors": self.errors,
+            "latency_p50": percentile(self.latencies, 50),
+            "latency_p95": percentile(self.latencies, 95),
+        }
+
+
+class ResolverChain:
+    """按顺序尝试本地解析器，第一个有把握的结果生效"""
+
+    def __init__(self, resolvers: List[Resolver]):
+        self.resolvers = resolvers
+        self._stats = {r.name: ResolverStats() for r in resolvers}
+
+    def reset(self):
+        self._stats = {r.name: ResolverStats() for r in self.resolvers}
+
+    def resolve(self, ctx: ResolveContext) -> Optional[dict]:
+        for resolver in self.resolvers:
+            stats = self._stats[resolver.name]
+            stats.attempts += 1
+            start = time.perf_counter()
+            try:
+                result = resolver.resolve(ctx)
+            except Exception as e:
+                stats.errors += 1
+                print(f"  ⚠️ 本地解析器 {resolver.name} 出错: {e}")
+                result = None
+            stats.latencies.append(time.perf_counter() - start)
+            if result is not None:
+                stats.hits += 1
+                return result
+        return None
+
+    def stats(self) -> dict:
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def report(self) -> str:
+        parts = []
+        for name, s in self.stats().items():
+            parts.append(f"{name} 命中 {s['hits']}/{s['attempts']}，"
+                         f"p50 {s['latency_p50'] * 1000:.1f}ms / p95 {s['latency_p95'] * 1000:.1f}ms")
+        return "🧩 本地解析: " + "；".join(parts)
+
+
+def default_chain(template_dir: str = TEMPLATE_DIR) -> ResolverChain:
+    """文字规则在前 (有控件树时几乎不花时间)，模板库不为空时再加模板匹配"""
+    resolvers: List[Resolver] = [TextRuleResolver()]
+    templates = TemplateLibrary(template_dir).load()
+    if templates:
+        resolvers.append(TemplateResolver(templates))
+    return ResolverChain(resolvers)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="管理本地模板库")
+    parser.add_argument("--dir", default=TEMPLATE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="从截图裁剪模板")
+    add.add_argument("name")
+    add.add_argument("screenshot")
+    add.add_argument("box", type=int, nargs=4, metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"))
+    add.add_argument("--action", default="tap", choices=sorted(ACTION_SCHEMAS))
+    add.add_argument("--params", default="{}", help="非 tap 操作的参数 (JSON)")
+    add.add_argument("--region", type=float, nargs=4, help="搜索区域 (屏幕比例 0-1)")
+    add.add_argument("--threshold", type=float, default=TEMPLATE_THRESHOLD)
+    add.add_argument("--tasks", nargs="*", help="只在任务包含这些关键词时使用")
+    sub.add_parser("list", help="列出模板")
+    test = sub.add_parser("test", help="在截图上试匹配所有模板")
+    test.add_argument("screenshot")
+    args = parser.parse_args()
+
+    library = TemplateLibrary(args.dir)
+    if args.command == "add":
+        template = library.add(args.name, Image.open(args.screenshot), tuple(args.box),
+                               action=args.action, params=json.loads(args.params),
+                               region=args.region, threshold=args.threshold, tasks=args.tasks)
+        print(f"✅ 已添加 {template.name}: {template.image.size}，标准差 {template.contrast:.1f}")
+    elif args.command == "list":
+        for template in library.load():
+            print(f"{template.name}: {template.action} {template.image.size} 区域 {template.region}")
+    else:
+        ctx = ResolveContext("", Image.open(args.screenshot), [])
+        resolver = TemplateResolver(library.load())
+        for template in resolver.templates:
+            start = time.perf_counter()
+            match = resolver.match(ctx, template)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{template.name}: {match if match else '未匹配'} ({elapsed:.1f}ms)")
+
+
+if __name__ == "__main__":
+    main()
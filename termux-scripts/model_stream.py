@@ -0,0 +1,43 @@
+"""
+Open-AutoGLM 混合方案 - 流式模型响应
+
+/chat/completions 使用 stream=true 时按 SSE 返回增量内容:
+- iter_sse_deltas() 从响应中逐个取出 delta.content
+- 配合 action_parser.IncrementalJSONParser 边接收边解析顶层字段，
+  action 和 params 一完整就可以执行，不必等 thought 生成完
+
+服务端不支持流式、直接返回 JSON 时由调用方回退到普通解析。
+"""
+
+import json
+from typing import Iterator, Optional
+
+
+def iter_sse_deltas(resp, usage: Optional[dict] = None) -> Iterator[str]:
+    """
+    逐个产出 SSE 流中的 choices[0].delta.content，遇到 [DONE] 结束
+
+    Args:
+        usage: 请求带 stream_options.include_usage 时，最后一个分块的 usage 会写入这个字典
+    """
+    for line in resp.iter_lines():
+        if not line or not line.startswith(b"data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == b"[DONE]":
+            return
+        try:
+            chunk = json.loads(payload)
+        except ValueError:
+            continue
+        if not isinstance(chunk, dict):
+            continue
+        if usage is not None and isinstance(chunk.get("usage"), dict):
+            usage.update(chunk["usage"])
+        try:
+            choice = chunk["choices"][0]
+        except (KeyError, IndexError, TypeError):
+            continue
+        content = (choice.get("delta") or choice.get("message") or {}).get("content")
+        if content:
+            yield content
@@ -6,18 +6,19 @@ Open-AutoGLM 混合方案 - 手机控制器（自动降级逻辑）
 1. 无障碍服务模式 (优先) - 通过 AutoGLM Helper APP
 2. LADB 模式 (备用) - 通过 ADB 连接
 
-自动检测可用模式并降级
+自动检测可用模式并降级；运行中按后端健康状况自动切换，
+无障碍服务恢复后自动切回 (见 backend_manager.py)
 """
 
-import os
 import subprocess
-import requests
-import base64
 import time
 import logging
-from typing import Optional, Tuple
+from typing import Optional
 from PIL import Image
-from io import BytesIO
+
+from helper_transport import get_transport, request_not_sent
+from backend_manager import BackendManager
+from adb_shell import ADB_PERSISTENT, AdbShellError, AdbShellSession, screencap
 
 # 配置日志
 logging.basicConfig(
@@ -27,6 +28,10 @@ logging.basicConfig(
 logger = logging.getLogger('PhoneController')
 
 
+class RequestNotSent(Exception):
+    """请求确定没有到达 Helper (连接被拒绝 / 连接超时)，换后端重做不会重复执行"""
+
+
 class PhoneController:
     """手机控制器 - 支持自动降级"""
     
@@ -35,16 +40,26 @@ class PhoneController:
     MODE_LADB = "ladb"  # LADB 模式
     MODE_NONE = "none"  # 无可用模式
     
-    def __init__(self, helper_url: str = "http://localhost:8080"):
+    def __init__(self, helper_url: str = "http://localhost:8080", adb_serial: Optional[str] = None):
         """
         初始化手机控制器
         
         Args:
             helper_url: AutoGLM Helper 的 URL
+            adb_serial: LADB 模式使用的设备序列号，不指定时使用第一个设备
         """
         self.helper_url = helper_url
+        self.transport = get_transport(helper_url)
         self.mode = self.MODE_NONE
+        self.adb_serial = adb_serial
         self.adb_device = None
+        self.adb_shell: Optional[AdbShellSession] = None  # LADB 模式的常驻 shell
+        self.backends = BackendManager(
+            [self.MODE_ACCESSIBILITY, self.MODE_LADB],
+            {self.MODE_ACCESSIBILITY: self._try_accessibility_service,
+             self.MODE_LADB: self._try_ladb},
+            on_change=self._on_backend_change
+        )
         
         # 自动检测可用模式
         self._detect_mode()
@@ -53,20 +68,20 @@ class PhoneController:
         """检测可用的控制模式"""
         logger.info("检测可用的控制模式...")
         
-        # 1. 尝试无障碍服务模式
-        if self._try_accessibility_service():
-            self.mode = self.MODE_ACCESSIBILITY
+        # 同时检测两个后端，不可用的在后台探测，恢复后自动启用
+        self.backends.detect()
+        self.mode = self.backends.current or self.MODE_NONE
+        
+        if self.mode == self.MODE_ACCESSIBILITY:
             logger.info(f"✅ 使用无障碍服务模式 ({self.helper_url})")
             return
         
-        # 2. 降级到 LADB 模式
-        if self._try_ladb():
-            self.mode = self.MODE_LADB
+        if self.mode == self.MODE_LADB:
             logger.warning(f"⚠️ 降级到 LADB 模式 (设备: {self.adb_device})")
             return
         
-        # 3. 都不可用
-        self.mode = self.MODE_NONE
+        # 都不可用
+        self.backends.close()
         logger.error("❌ 无可用控制方式")
         raise Exception(
             "无法连接到手机控制服务！\n"
@@ -78,10 +93,7 @@ class PhoneController:
     def _try_accessibility_service(self) -> bool:
         """尝试连接无障碍服务"""
         try:
-            response = requests.get(
-                f"{self.helper_url}/status",
-                timeout=3
-            )
+            response = self.transport.get("/status")
             
             if response.status_code == 200:
                 data = response.json()
@@ -119,11 +131,24 @@ class PhoneController:
                 logger.debug("未找到已连接的 ADB 设备")
                 return False
             
-            # 使用第一个设备
-            self.adb_device = devices[0]
+            if self.adb_serial:
+                if self.adb_serial not in devices:
+                    logger.debug(f"指定的 ADB 设备未连接: {self.adb_serial}")
+                    return False
+                self.adb_device = self.adb_serial
+            else:
+                # 未指定时使用第一个设备
+                if len(devices) > 1:
+                    logger.warning(f"连接了 {len(devices)} 台设备，未指定 adb_serial，使用第一台")
+                self.adb_device = devices[0]
             logger.info(f"找到 ADB 设备: {self.adb_device}")
             
-            # 测试连接
+            # 测试连接 (同时建立常驻 shell 会话)
+            if ADB_PERSISTENT:
+                self.close_adb_shell()
+                self.adb_shell = AdbShellSession(self.adb_device)
+                return self.adb_shell.check(['echo', 'test'], timeout=3)
+            
             test_result = subprocess.run(
                 ['adb', '-s', self.adb_device, 'shell', 'echo', 'test'],
                 capture_output=True,
@@ -136,6 +161,99 @@ class PhoneController:
             logger.debug(f"LADB 连接失败: {e}")
             return False
     
+    def _adb_shell(self, args, timeout: float) -> str:
+        """
+        在设备上执行 shell 命令，优先走常驻会话
+        
+        Returns:
+            命令输出，失败抛出异常
+        """
+        if self.adb_shell is not None:
+            code, output = self.adb_shell.run(args, timeout)
+            if code != 0:
+                raise AdbShellError(f"退出码 {code}: {output.strip()}")
+            return output
+        result = subprocess.run(
+            ['adb', '-s', self.adb_device, 'shell'] + list(args),
+            check=True,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        return result.stdout
+    
+    def close_adb_shell(self):
+        """关闭常驻 adb shell 会话"""
+        if self.adb_shell is not None:
+            self.adb_shell.close()
+            self.adb_shell = None
+    
+    def close(self):
+        """停止后台探测并关闭 adb shell 会话"""
+        self.backends.close()
+        self.close_adb_shell()
+    
+    def _on_backend_change(self, old: Optional[str], new: Optional[str]):
+        """当前后端切换"""
+        self.mode = new or self.MODE_NONE
+        if new is None:
+            logger.error(f"❌ {old} 不可用，暂无可用控制方式，后台继续探测")
+        elif old is None or self.backends.priority.index(new) < self.backends.priority.index(old):
+            logger.info(f"✅ {new} 已恢复，切回 {new} 模式")
+        else:
+            logger.warning(f"⚠️ {old} 不稳定，切换到 {new} 模式")
+    
+    def _dispatch(self, name: str, handlers: dict, failure, *args, idempotent: bool = False):
+        """
+        按后端优先级执行动作并记录健康状况
+        
+        只读的调用 (截图) 失败时同一次调用内直接尝试下一个后端，避免整步卡住。
+        点击、滑动、输入等动作失败时可能已经在手机上执行了 (如响应超时)，
+        只有确定请求没发出去 (RequestNotSent) 才换后端重做；否则记录失败并返回，
+        下一步再按健康状况选择后端。
+        
+        Args:
+            name: 动作名称 (用于日志)
+            handlers: 后端 -> 实现函数，不支持该动作的后端不在其中
+            failure: 失败时的返回值
+            idempotent: 重复执行没有副作用
+        """
+        available = self.backends.candidates()
+        candidates = [mode for mode in available if mode in handlers]
+        if not candidates:
+            if available:
+                logger.error(f"当前可用的后端 ({', '.join(available)}) 不支持这次{name}")
+            else:
+                logger.error(f"无可用的{name}方式")
+            return failure
+        
+        for mode in candidates:
+            start = time.monotonic()
+            sent = True
+            try:
+                result = handlers[mode](*args)
+            except RequestNotSent as e:
+                logger.warning(f"{name}请求未发出 ({mode}): {e}")
+                result, sent = failure, False
+            ok = result is not None and result is not False
+            self.backends.record(mode, ok, time.monotonic() - start)
+            if ok:
+                logger.debug(f"{name} 由 {mode} 完成")
+                return result
+            if sent and not idempotent:
+                logger.warning(f"{name}在 {mode} 上失败，可能已经执行，不换后端重做")
+                return failure
+        return failure
+    
+    @property
+    def last_backend(self) -> Optional[str]:
+        """最近一次成功动作使用的后端"""
+        return self.backends.last_backend
+    
+    def backend_stats(self) -> dict:
+        """各后端的成功率、延迟、完成动作数和切换次数"""
+        return self.backends.stats()
+    
     def get_mode(self) -> str:
         """获取当前控制模式"""
         return self.mode
@@ -147,32 +265,20 @@ class PhoneController:
         Returns:
             PIL.Image 对象，失败返回 None
         """
-        if self.mode == self.MODE_ACCESSIBILITY:
-            return self._screenshot_accessibility()
-        elif self.mode == self.MODE_LADB:
-            return self._screenshot_ladb()
-        else:
-            logger.error("无可用的截图方式")
-            return None
+        return self._dispatch("截图", {
+            self.MODE_ACCESSIBILITY: self._screenshot_accessibility,
+            self.MODE_LADB: self._screenshot_ladb,
+        }, None, idempotent=True)
     
     def _screenshot_accessibility(self) -> Optional[Image.Image]:
         """通过无障碍服务截图"""
         try:
-            response = requests.get(
-                f"{self.helper_url}/screenshot",
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    # 解码 Base64 图片
-                    image_data = base64.b64decode(data['image'])
-                    image = Image.open(BytesIO(image_data))
-                    logger.debug(f"截图成功 (无障碍): {image.size}")
-                    return image
+            image = self.transport.screenshot(timeout=10)
+            if image is not None:
+                logger.debug(f"截图成功 (无障碍): {image.size}")
+                return image
             
-            logger.error(f"截图失败: HTTP {response.status_code}")
+            logger.error("截图失败: Helper 未返回图片")
             return None
             
         except Exception as e:
@@ -180,33 +286,10 @@ class PhoneController:
             return None
     
     def _screenshot_ladb(self) -> Optional[Image.Image]:
-        """通过 LADB 截图"""
+        """通过 LADB 截图 (exec-out 直接读到内存)"""
         try:
-            # 截图到设备
-            subprocess.run(
-                ['adb', '-s', self.adb_device, 'shell', 'screencap', '-p', '/sdcard/autoglm_screenshot.png'],
-                check=True,
-                timeout=5
-            )
-            
-            # 拉取到本地
-            local_path = '/tmp/autoglm_screenshot.png'
-            subprocess.run(
-                ['adb', '-s', self.adb_device, 'pull', '/sdcard/autoglm_screenshot.png', local_path],
-                check=True,
-                timeout=5
-            )
-            
-            # 打开图片
-            image = Image.open(local_path)
+            image = screencap(self.adb_device, timeout=10)
             logger.debug(f"截图成功 (LADB): {image.size}")
-            
-            # 清理临时文件
-            subprocess.run(
-                ['adb', '-s', self.adb_device, 'shell', 'rm', '/sdcard/autoglm_screenshot.png'],
-                timeout=3
-            )
-            
             return image
             
         except Exception as e:
@@ -224,22 +307,15 @@ class PhoneController:
         Returns:
             是否成功
         """
-        if self.mode == self.MODE_ACCESSIBILITY:
-            return self._tap_accessibility(x, y)
-        elif self.mode == self.MODE_LADB:
-            return self._tap_ladb(x, y)
-        else:
-            logger.error("无可用的点击方式")
-            return False
+        return self._dispatch("点击", {
+            self.MODE_ACCESSIBILITY: self._tap_accessibility,
+            self.MODE_LADB: self._tap_ladb,
+        }, False, x, y)
     
     def _tap_accessibility(self, x: int, y: int) -> bool:
         """通过无障碍服务点击"""
         try:
-            response = requests.post(
-                f"{self.helper_url}/tap",
-                json={'x': x, 'y': y},
-                timeout=5
-            )
+            response = self.transport.post("/tap", json={'x': x, 'y': y})
             
             if response.status_code == 200:
                 data = response.json()
@@ -250,17 +326,15 @@ class PhoneController:
             return False
             
         except Exception as e:
+            if request_not_sent(e):
+                raise RequestNotSent(str(e)) from e
             logger.error(f"点击失败 (无障碍): {e}")
             return False
     
     def _tap_ladb(self, x: int, y: int) -> bool:
         """通过 LADB 点击"""
         try:
-            result = subprocess.run(
-                ['adb', '-s', self.adb_device, 'shell', 'input', 'tap', str(x), str(y)],
-                check=True,
-                timeout=3
-            )
+            self._adb_shell(['input', 'tap', str(x), str(y)], timeout=3)
             
             logger.debug(f"点击 ({x}, {y}): True")
             return True
@@ -283,21 +357,17 @@ class PhoneController:
         Returns:
             是否成功
         """
-        if self.mode == self.MODE_ACCESSIBILITY:
-            return self._swipe_accessibility(x1, y1, x2, y2, duration)
-        elif self.mode == self.MODE_LADB:
-            return self._swipe_ladb(x1, y1, x2, y2, duration)
-        else:
-            logger.error("无可用的滑动方式")
-            return False
+        return self._dispatch("滑动", {
+            self.MODE_ACCESSIBILITY: self._swipe_accessibility,
+            self.MODE_LADB: self._swipe_ladb,
+        }, False, x1, y1, x2, y2, duration)
     
     def _swipe_accessibility(self, x1: int, y1: int, x2: int, y2: int, duration: int) -> bool:
         """通过无障碍服务滑动"""
         try:
-            response = requests.post(
-                f"{self.helper_url}/swipe",
-                json={'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'duration': duration},
-                timeout=10
+            response = self.transport.post(
+                "/swipe",
+                json={'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2, 'duration': duration}
             )
             
             if response.status_code == 200:
@@ -309,18 +379,16 @@ class PhoneController:
             return False
             
         except Exception as e:
+            if request_not_sent(e):
+                raise RequestNotSent(str(e)) from e
             logger.error(f"滑动失败 (无障碍): {e}")
             return False
     
     def _swipe_ladb(self, x1: int, y1: int, x2: int, y2: int, duration: int) -> bool:
         """通过 LADB 滑动"""
         try:
-            result = subprocess.run(
-                ['adb', '-s', self.adb_device, 'shell', 'input', 'swipe', 
-                 str(x1), str(y1), str(x2), str(y2), str(duration)],
-                check=True,
-                timeout=5
-            )
+            self._adb_shell(['input', 'swipe', str(x1), str(y1), str(x2), str(y2), str(duration)],
+                            timeout=5)
             
             logger.debug(f"滑动 ({x1},{y1}) -> ({x2},{y2}): True")
             return True
@@ -339,22 +407,16 @@ class PhoneController:
         Returns:
             是否成功
         """
-        if self.mode == self.MODE_ACCESSIBILITY:
-            return self._input_accessibility(text)
-        elif self.mode == self.MODE_LADB:
-            return self._input_ladb(text)
-        else:
-            logger.error("无可用的输入方式")
-            return False
+        handlers = {self.MODE_ACCESSIBILITY: self._input_accessibility}
+        # adb input text 只能输入 ASCII，中文等文字只走无障碍服务
+        if text.isascii():
+            handlers[self.MODE_LADB] = self._input_ladb
+        return self._dispatch("输入", handlers, False, text)
     
     def _input_accessibility(self, text: str) -> bool:
         """通过无障碍服务输入"""
         try:
-            response = requests.post(
-                f"{self.helper_url}/input",
-                json={'text': text},
-                timeout=5
-            )
+            response = self.transport.post("/input", json={'text': text})
             
             if response.status_code == 200:
                 data = response.json()
@@ -365,6 +427,8 @@ class PhoneController:
             return False
             
         except Exception as e:
+            if request_not_sent(e):
+                raise RequestNotSent(str(e)) from e
             logger.error(f"输入失败 (无障碍): {e}")
             return False
     
@@ -374,11 +438,7 @@ class PhoneController:
             # ADB input text 不支持中文，需要使用其他方法
             # 这里简化处理，仅支持英文
             escaped_text = text.replace(' ', '%s')
-            result = subprocess.run(
-                ['adb', '-s', self.adb_device, 'shell', 'input', 'text', escaped_text],
-                check=True,
-                timeout=5
-            )
+            self._adb_shell(['input', 'text', escaped_text], timeout=5)
             
             logger.debug(f"输入文字: True")
             return True
@@ -0,0 +1,294 @@
+"""
+Open-AutoGLM 混合方案 - 提示词构建与 token 统计
+
+每一步请求的提示词分成两部分:
+- system 消息: 操作说明、规则、示例，只和配置有关，同一进程内逐字节不变；
+  支持前缀缓存 (prefix / context caching) 的服务端可以直接命中，不再重复计费和预填充
+- user 消息: 任务、压缩后的历史、屏幕尺寸和截图，每步变化
+
+纯文字模式 (build_text) 用无障碍控件列表代替截图，有单独的 system 消息，同样逐字节不变。
+
+历史用紧凑格式，每步一行: `序号 操作 参数 说明`，说明截断到 HISTORY_THOUGHT_CHARS 字。
+
+UsageTracker 记录每次调用的 token (优先用服务端返回的 usage，没有时按字数估算) 和耗时，
+任务结束时输出汇总。每个代理一个 UsageTracker，和 tracing 一样通过 contextvar 传给模型，
+多个代理共享同一个模型实例时各记各的。
+"""
+
+import contextlib
+import contextvars
+import os
+import threading
+from typing import List, Optional
+
+from stats import percentile
+
+HISTORY_STEPS = int(os.getenv("AUTOGLM_HISTORY_STEPS", "5"))  # 历史最多带几步
+HISTORY_THOUGHT_CHARS = int(os.getenv("AUTOGLM_HISTORY_THOUGHT_CHARS", "24"))
+IMAGE_TOKEN_PIXELS = 28 * 28  # 估算图片 token: 每 28x28 像素约 1 个 token
+
+SUPPORTED_APPS = "淘宝/京东/微信/支付宝/抖音/拼多多/美团/高德地图/微博/QQ/bilibili/小红书"
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数: 中文约 1 字 1 token，其他字符约 4 个 1 token"""
+    cjk = sum(1 for c in text if c >= "⺀")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _format_params(action: str, params) -> str:
+    if not isinstance(params, dict) or not params:
+        return ""
+    if action == "tap" and "x" in params and "y" in params:
+        return f"{params['x']},{params['y']}"
+    if action == "swipe" and all(k in params for k in ("x1", "y1", "x2", "y2")):
+        return f"{params['x1']},{params['y1']}>{params['x2']},{params['y2']}"
+    if action in ("input", "tap_text"):
+        return f"\"{params.get('text', '')}\""
+    if action == "tap_id":
+        return f"#{params.get('id', '')}"
+    if action == "launch":
+        return str(params.get("app", ""))
+    if action == "batch":
+        return "; ".join(f"{a.get('action')} {_format_params(a.get('action'), a.get('params'))}".strip()
+                         for a in params.get("actions", []))
+    return ",".join(f"{k}={v}" for k, v in params.items())
+
+
+def encode_history(history: Optional[list], steps: int = HISTORY_STEPS,
+                   thought_chars: int = HISTORY_THOUGHT_CHARS) -> str:
+    """
+    把历史压缩成每步一行
+
+    普通步骤: {'step', 'action', 'params', 'thought'}
+    提示条目 (没有 params，如 screen_unchanged / search_app / 计划提示): 只输出说明，不截断
+    """
+    if not history:
+        return ""
+    recent = history[-steps:]
+    lines = []
+    for entry in recent:
+        action = entry.get("action", "")
+        thought = entry.get("thought") or ""
+        if "params" not in entry:
+            lines.append(f"! {thought or action}")
+            continue
+        if len(thought) > thought_chars:
+            thought = thought[:thought_chars] + "…"
+        parts = [str(entry.get("step", "")), action, _format_params(action, entry["params"]), thought]
+        lines.append(" ".join(p for p in parts if p))
+    skipped = len(history) - len(recent)
+    header = f"【已执行】共{len(history)}条，省略前{skipped}条" if skipped else "【已执行】"
+    return header + "\n" + "\n".join(lines)
+
+
+class PromptBuilder:
+    """构建 chat/completions 的 messages，system 部分只生成一次"""
+
+    def __init__(self, max_batch_actions: int, plan_mode: bool = False, plan_max_actions: int = 5,
+                 history_steps: int = HISTORY_STEPS):
+        self.max_batch_actions = max_batch_actions
+        self.plan_mode = plan_mode
+        self.plan_max_actions = plan_max_actions
+        self.history_steps = history_steps
+        self.system_prompt = self._build_system()
+        self.system_tokens = estimate_tokens(self.system_prompt)
+        self._text_system = None
+
+    def _build_system(self) -> str:
+        plan_text = ""
+        if self.plan_mode:
+            plan_text = f"""
+规划模式：根据当前截图一次规划最多{self.plan_max_actions}个连续操作，每个操作写明执行后预期的屏幕 (expect)
+- 只规划当前截图能确定坐标的操作，需要看到新页面才能确定的留到下一次
+- 执行后仍停留在同一页面的操作 (如输入文字) 标记 "same_page":true
+- 执行后需要重新截图确认结果的关键操作标记 "checkpoint":true
+- done 必须单独返回
+规划格式：{{"plan":[{{"action":"tap","params":{{"x":540,"y":150}},"expect":"搜索框获得焦点","same_page":true}},{{"action":"input","params":{{"text":"蓝牙耳机"}},"expect":"搜索框显示蓝牙耳机","same_page":true}}],"thought":"说明"}}
+"""
+        return f"""根据任务、已执行的操作和屏幕截图，决定下一步手机操作。
+
+可用操作：
+- launch: 直接启动应用（推荐）{{"app":"应用名"}} 支持：{SUPPORTED_APPS}
+- tap: 点击屏幕位置 {{"x":数字,"y":数字}}
+- input: 输入文字 {{"text":"文字"}}
+- swipe: 滑动 {{"x1":起点x,"y1":起点y,"x2":终点x,"y2":终点y}}
+- back: 返回 {{}}
+- done: 任务完成 {{}}
+
+重要规则：
+1. 如果任务是"打开XX应用"，优先使用 launch 操作直接启动
+2. 如果需要搜索，先用 launch 打开应用，再 tap 点击搜索框，再 input 输入
+3. 坐标(0,0)在左上角，右下角坐标等于消息中给出的屏幕尺寸
+4. 当前截图就能确定的连续操作（如 点击搜索框→输入文字）可以一次返回，最多{self.max_batch_actions}个；
+   后一步需要看到新页面才能确定时，只返回一个操作；done 必须单独返回
+
+已执行的操作每行一步：序号 操作 参数 说明；! 开头为系统提示
+
+返回JSON格式：{{"action":"操作名","params":{{}},"thought":"说明"}}
+连续操作：{{"actions":[{{"action":"操作名","params":{{}}}},...],"thought":"说明"}}
+
+示例：
+- 打开淘宝：{{"action":"launch","params":{{"app":"淘宝"}},"thought":"启动淘宝应用"}}
+- 点击搜索框并输入：{{"actions":[{{"action":"tap","params":{{"x":540,"y":150}}}},{{"action":"input","params":{{"text":"蓝牙耳机"}}}}],"thought":"点击搜索框后输入搜索词"}}
+- 完成：{{"action":"done","params":{{}},"thought":"搜索结果已显示"}}
+{plan_text}"""
+
+    @property
+    def text_system_prompt(self) -> str:
+        """纯文字模式 (只发控件列表、不发截图) 的 system 提示词，第一次用到时生成"""
+        if self._text_system is None:
+            self._text_system = f"""根据任务、已执行的操作和当前界面的控件列表，决定下一步手机操作。
+
+控件列表每行一个：[序号] 文字 #id 类名 中心x,y 标记；标记 点=可点击 输=可输入 滚=可滚动 焦=有焦点
+
+可用操作：
+- launch: 直接启动应用 {{"app":"应用名"}} 支持：{SUPPORTED_APPS}
+- tap_text: 点击显示该文字的控件 {{"text":"控件文字"}}
+- tap_id: 点击该 id 的控件 {{"id":"id"}}
+- input: 向有焦点的输入框输入文字 {{"text":"文字"}}
+- swipe: 滑动，坐标用列表中的像素坐标 {{"x1":起点x,"y1":起点y,"x2":终点x,"y2":终点y}}
+- back: 返回 {{}}
+- done: 任务完成 {{}}
+
+规则：
+1. 优先 tap_text；文字重复或没有文字时用 tap_id
+2. 控件列表不足以判断 (图片内容、没有文字的图标、列表为空) 时返回 {{"action":"screenshot"}}，系统会改为发送截图
+
+返回JSON格式：{{"action":"操作名","params":{{}},"thought":"说明"}}
+"""
+        return self._text_system
+
+    def build_text(self, task: str, history: Optional[list], tree_text: str) -> List[dict]:
+        """纯文字请求: 控件列表代替截图"""
+        parts = [f"任务：{task}"]
+        history_text = encode_history(history, self.history_steps)
+        if history_text:
+            parts.append(history_text)
+        parts.append(f"【控件】\n{tree_text}")
+        parts.append("现在返回下一步操作：")
+        return [
+            {"role": "system", "content": self.text_system_prompt},
+            {"role": "user", "content": "\n".join(parts)},
+        ]
+
+    def estimate_text(self, messages: List[dict]) -> int:
+        return sum(estimate_tokens(m["content"]) for m in messages)
+
+    def user_text(self, task: str, history: Optional[list], width: int, height: int) -> str:
+        """每步变化的部分: 任务在前 (同一任务内也不变)，历史和屏幕尺寸在后"""
+        parts = [f"任务：{task}"]
+        history_text = encode_history(history, self.history_steps)
+        if history_text:
+            parts.append(history_text)
+        parts.append(f"屏幕尺寸：{width}x{height}")
+        parts.append(f"现在返回{'操作计划' if self.plan_mode else '下一步操作'}：")
+        return "\n".join(parts)
+
+    def build(self, task: str, history: Optional[list], width: int, height: int,
+              image_url: str) -> List[dict]:
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": self.user_text(task, history, width, height)},
+                    {"type": "image_url", "image_url": {"url": image_url}},
+                ],
+            },
+        ]
+
+    def estimate(self, messages: List[dict], width: int, height: int) -> int:
+        """估算一次请求的输入 token (system + 文字 + 图片)"""
+        text = messages[1]["content"][0]["text"]
+        return self.system_tokens + estimate_tokens(text) + width * height // IMAGE_TOKEN_PIXELS
+
+
+def usage_call(usage: Optional[dict], estimated_prompt: int, latency: float) -> dict:
+    """一次调用的 token 和耗时，服务端没有返回 usage 时输入 token 用估算值"""
+    usage = usage or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return {
+        "prompt_tokens": usage.get("prompt_tokens", estimated_prompt),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "cached_tokens": details.get("cached_tokens", 0) or 0,
+        "estimated": "prompt_tokens" not in usage,
+        "latency": latency,
+    }
+
+
+class UsageTracker:
+    """按调用记录 token 和耗时 (流式请求在后台线程记录，加锁)"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+
+    def record(self, usage: Optional[dict], estimated_prompt: int, latency: float) -> dict:
+        """
+        Args:
+            usage: 服务端返回的 usage (可能为空)
+            estimated_prompt: 本地估算的输入 token，usage 缺失时使用
+            latency: 从发出请求到拿到可执行操作的耗时 (秒)
+        """
+        call = usage_call(usage, estimated_prompt, latency)
+        with self._lock:
+            self.calls.append(call)
+        return call
+
+    def summary(self) -> dict:
+        with self._lock:
+            calls = list(self.calls)
+        n = len(calls)
+        if not n:
+            return {"calls": 0}
+        prompt = sum(c["prompt_tokens"] for c in calls)
+        cached = sum(c["cached_tokens"] for c in calls)
+        latencies = [c["latency"] for c in calls]
+        return {
+            "calls": n,
+            "prompt_tokens": prompt,
+            "completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "cached_tokens": cached,
+            "uncached_tokens": prompt - cached,
+            "avg_prompt_tokens": prompt / n,
+            "cache_ratio": cached / prompt if prompt else 0.0,
+            "estimated": any(c["estimated"] for c in calls),
+            "latency_avg": sum(latencies) / n,
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        if not s["calls"]:
+            return "🔢 token: 无模型调用"
+        mark = " (含估算)" if s["estimated"] else ""
+        return (f"🔢 token{mark}: 输入 {s['prompt_tokens']} (每步 {s['avg_prompt_tokens']:.0f}，"
+                f"缓存命中 {s['cached_tokens']} / {s['cache_ratio']:.0%})，输出 {s['completion_tokens']}；"
+                f"调用耗时 平均 {s['latency_avg']:.2f}s p50 {s['latency_p50']:.2f}s "
+                f"p95 {s['latency_p95']:.2f}s")
+
+
+# ---------- 当前 UsageTracker ----------
+
+_current_usage: contextvars.ContextVar = contextvars.ContextVar("autoglm_usage", default=None)
+
+
+def current_usage() -> Optional[UsageTracker]:
+    """当前上下文的 UsageTracker；没有激活时返回 None，调用只打印不记录"""
+    return _current_usage.get()
+
+
+@contextlib.contextmanager
+def track_usage(tracker: UsageTracker):
+    """在这段代码 (以及它派生的 asyncio 任务和 in_thread 调用) 中把模型调用记到 tracker"""
+    token = _current_usage.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_usage.reset(token)
@@ -0,0 +1,132 @@
+"""
+Open-AutoGLM 混合方案 - 屏幕稳定检测
+
+替代动作后的固定 sleep: 轮询低分辨率截图，连续几帧相同即认为屏幕已稳定。
+每种动作有自己的最短 / 最长等待，快的界面立即继续，慢的界面最多等到上限。
+
+AUTOGLM_SETTLE_SCALE 可整体放大/缩小所有等待时间 (默认 1.0)
+"""
+
+import os
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from PIL import Image
+
+import tracing
+from frame_cache import FRAME_DIFF_THRESHOLD, FrameFingerprint
+
+SETTLE_SCALE = float(os.getenv("AUTOGLM_SETTLE_SCALE", "1.0"))
+SETTLE_PREVIEW_EDGE = int(os.getenv("AUTOGLM_SETTLE_PREVIEW_EDGE", "360"))
+
+
+class SettleProfile:
+    """单个动作类型的等待参数 (秒)"""
+
+    def __init__(self, min_wait: float, max_wait: float, interval: float = 0.2,
+                 stable_frames: int = 2):
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.interval = interval
+        self.stable_frames = stable_frames
+
+    def scaled(self, factor: float) -> "SettleProfile":
+        return SettleProfile(self.min_wait * factor, self.max_wait * factor,
+                             self.interval, self.stable_frames)
+
+
+# 上限沿用原来的固定等待，启动应用给足冷启动时间
+SETTLE_PROFILES = {
+    "tap": SettleProfile(0.2, 2.0),
+    "tap_text": SettleProfile(0.2, 2.0),
+    "tap_id": SettleProfile(0.2, 2.0),
+    "input": SettleProfile(0.2, 2.0),
+    "swipe": SettleProfile(0.3, 1.5),
+    "back": SettleProfile(0.2, 1.5),
+    "home": SettleProfile(0.2, 1.5),
+    "launch": SettleProfile(0.8, 5.0, interval=0.3, stable_frames=3),
+    "wait": SettleProfile(0.5, 1.5),
+    "default": SettleProfile(0.2, 1.5),
+}
+
+
+class SettleDetector:
+    """按动作类型等待屏幕稳定"""
+
+    def __init__(self, capture: Callable[[], Optional[Image.Image]],
+                 device_size: Callable[[], Tuple[int, int]] = None,
+                 profiles: Dict[str, SettleProfile] = None,
+                 threshold: float = FRAME_DIFF_THRESHOLD, scale: float = SETTLE_SCALE):
+        """
+        Args:
+            capture: 低分辨率截图函数，失败返回 None
+            device_size: 返回设备分辨率，用于判断截图是否是全尺寸 (可复用为下一步截图)
+            profiles: 覆盖默认的动作等待参数
+            threshold: 变化块比例阈值
+            scale: 所有等待时间的倍数
+        """
+        self.capture = capture
+        self.device_size = device_size
+        self.profiles = dict(SETTLE_PROFILES)
+        if profiles:
+            self.profiles.update(profiles)
+        self.threshold = threshold
+        self.scale = scale
+        self.total_wait = 0.0
+        self.timeouts = 0
+
+    def profile(self, action: str) -> SettleProfile:
+        profile = self.profiles.get(action, self.profiles["default"])
+        return profile.scaled(self.scale) if self.scale != 1.0 else profile
+
+    def wait(self, action: str) -> Tuple[Optional[Image.Image], float]:
+        """
+        等待动作生效后屏幕稳定
+
+        Returns:
+            (最后一帧, 实际等待秒数)。最后一帧只有在是全尺寸截图时才返回，
+            调用方可以直接当作下一步的截图；否则为 None。
+        """
+        with tracing.span("settle", action=action) as span:
+            image, elapsed, settled = self._wait(action)
+            span.set(settled=settled)
+        return image, elapsed
+
+    def _wait(self, action: str) -> Tuple[Optional[Image.Image], float, bool]:
+        profile = self.profile(action)
+        start = time.monotonic()
+        with tracing.span("sleep"):
+            time.sleep(profile.min_wait)
+
+        last_image, last_fp, stable, settled = None, None, 0, False
+        while True:
+            image = self.capture()
+            if image is not None:
+                fp = FrameFingerprint(image)
+                if last_fp is not None and fp.diff(last_fp) <= self.threshold:
+                    stable += 1
+                else:
+                    stable = 1
+                last_image, last_fp = image, fp
+                if stable >= profile.stable_frames:
+                    settled = True
+                    break
+
+            remaining = profile.max_wait - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            with tracing.span("sleep"):
+                time.sleep(min(profile.interval, remaining))
+
+        elapsed = time.monotonic() - start
+        self.total_wait += elapsed
+        if not settled:
+            self.timeouts += 1
+
+        if last_image is not None and self.device_size is not None \
+                and last_image.size == tuple(self.device_size()):
+            return last_image, elapsed, settled
+        return None, elapsed, settled
+
+    def stats(self) -> dict:
+        return {"total_wait": self.total_wait, "timeouts": self.timeouts}
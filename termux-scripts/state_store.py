@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Open-AutoGLM 混合方案 - 带版本号的状态存储
+
+Web 控制台的共享状态:
+- 每次修改生成一个新的不可变快照，版本号单调递增；读者直接拿当前快照，不加锁
+- 每次修改同时记一条变更 (版本号, 类型, 数据) 到固定大小的环形缓冲区，
+  客户端可以问 "版本 N 之后有哪些变化"，只拿增量
+- 日志只保留最近 max_logs 行，内存有上限
+
+写者之间用一把锁串行；读者只读一个引用和环形缓冲区的槽位 (都是原子操作)，
+槽位被覆盖时通过槽位里的版本号发现，返回 None 让客户端改取完整快照。
+"""
+
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, List, Mapping, Optional, Tuple
+
+Change = Tuple[int, str, Any]
+
+
+class Snapshot:
+    """某一版本的完整状态 (只读)"""
+
+    __slots__ = ("version", "state", "logs")
+
+    def __init__(self, version: int, state: Mapping[str, Any], logs: Tuple[str, ...]):
+        self.version = version
+        self.state = state
+        self.logs = logs
+
+    def __getitem__(self, key: str):
+        return self.state[key]
+
+    def get(self, key: str, default=None):
+        return self.state.get(key, default)
+
+    def to_dict(self) -> dict:
+        """可以直接 JSON 序列化的浅拷贝 (日志是元组，序列化为数组)"""
+        return dict(self.state, logs=self.logs, version=self.version)
+
+
+class StateStore:
+    """
+    不可变快照 + 变更环形缓冲区
+
+    状态里的值发布后不能再原地修改 (dict/list 要整体替换)，否则读者会看到修改了一半的数据。
+    """
+
+    def __init__(self, initial: Optional[dict] = None, max_logs: int = 100, history: int = 500):
+        """
+        Args:
+            initial: 初始状态
+            max_logs: 快照里保留的日志行数
+            history: 环形缓冲区保留多少个变更，更早的版本只能取完整快照
+        """
+        self.max_logs = max_logs
+        self.history = history
+        self._ring: List[Optional[Change]] = [None] * history
+        self._current = Snapshot(0, MappingProxyType(dict(initial or {})), ())
+        self._cond = threading.Condition()
+        self.closed = False
+
+    # ---------- 读 (无锁) ----------
+
+    @property
+    def version(self) -> int:
+        return self._current.version
+
+    def snapshot(self) -> Snapshot:
+        return self._current
+
+    def changes_since(self, version: int) -> Optional[List[Change]]:
+        """
+        版本 version 之后的变更，按版本号排列
+
+        Returns:
+            变更列表 (没有新变化时为空列表)；version 太旧 (已被挤出缓冲区) 或比当前版本还新
+            (服务重启过) 时返回 None，需要改取完整快照
+        """
+        current = self._current.version
+        if version > current or current - version > self.history:
+            return None
+        changes = []
+        for v in range(version + 1, current + 1):
+            change = self._ring[v % self.history]
+            if change is None or change[0] != v:
+                return None  # 读的过程中被新的变更覆盖了
+            changes.append(change)
+        return changes
+
+    # ---------- 写 ----------
+
+    def apply(self, kind: str, func: Callable[[Mapping[str, Any]], Tuple[dict, Any]]) -> Optional[int]:
+        """
+        在写锁内根据当前状态计算修改
+
+        Args:
+            kind: 变更类型，如 "state" / "frame" / "job"
+            func: func(当前状态) -> (要替换的字段, 变更数据)；字段为空时不产生新版本
+
+        Returns:
+            新版本号，没有修改时为 None
+        """
+        with self._cond:
+            current = self._current
+            changes, data = func(current.state)
+            if not changes:
+                return None
+            state = dict(current.state)
+            state.update(changes)
+            return self._publish(kind, data, MappingProxyType(state), current.logs)
+
+    def update(self, **changes) -> Optional[int]:
+        """修改字段，只记录真正变化的字段"""
+        def diff(state):
+            changed = {k: v for k, v in changes.items() if state.get(k, _MISSING) != v}
+            return changed, changed
+        return self.apply("state", diff)
+
+    def append_log(self, line: str) -> int:
+        with self._cond:
+            current = self._current
+            logs = current.logs[-(self.max_logs - 1):] + (line,) if self.max_logs > 1 else (line,)
+            return self._publish("log", {"line": line}, current.state, logs)
+
+    def _publish(self, kind: str, data: Any, state: Mapping[str, Any], logs: Tuple[str, ...]) -> int:
+        """调用方持有写锁: 先写环形缓冲区，再换快照"""
+        version = self._current.version + 1
+        self._ring[version % self.history] = (version, kind, data)
+        self._current = Snapshot(version, state, logs)
+        self._cond.notify_all()
+        return version
+
+    # ---------- 等待 ----------
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> int:
+        """等到有比 version 新的版本 (或超时/关闭)，返回当前版本号"""
+        if self._current.version != version or self.closed:
+            return self._current.version
+        with self._cond:
+            if self._current.version == version and not self.closed:
+                self._cond.wait(timeout)
+            return self._current.version
+
+    def close(self):
+        """唤醒所有等待者让它们退出"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+_MISSING = object()
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Open-AutoGLM 混合方案 - 统计工具
+
+各模块的延迟统计 (步骤耗时、模型调用、本地解析、耗时追踪) 共用的百分位数计算。
+"""
+
+import math
+from typing import Sequence
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """最近秩百分位数，空列表返回 0"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
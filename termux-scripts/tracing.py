@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Open-AutoGLM 混合方案 - 步骤耗时追踪
+
+记录每一步里各阶段 (截图、解码、编码、上传 + 推理、解析、执行、等待) 的耗时:
+- tracing.span("阶段名") 包住一段代码，结束时记一条 (名称, 开始, 耗时, 线程, 参数)
+- 每个代理一个 Tracer，通过 contextvar 传到线程池里的阻塞调用 (见 async_agent.in_thread)，
+  多个代理共享同一个模型实例时各记各的
+- 导出为 Chrome trace JSON (chrome://tracing / ui.perfetto.dev 直接打开)，
+  或按阶段汇总次数、总耗时、p50 / p95
+
+开销: 开启时每个 span 约 1~2µs (两次 perf_counter_ns + 一次 deque.append)，
+关闭或没有激活的 Tracer 时只多一次 contextvar 读取。记录数有上限，长时间运行内存不增长。
+"""
+
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+from stats import percentile
+
+TRACE = os.getenv("AUTOGLM_TRACE", "1") == "1"
+TRACE_DIR = os.getenv("AUTOGLM_TRACE_DIR", "")  # 设置后每个任务导出一个 Chrome trace 文件
+TRACE_MAX_SPANS = int(os.getenv("AUTOGLM_TRACE_MAX_SPANS", "20000"))
+
+# 汇总表里占比的基准: 整个任务的耗时
+TASK_SPAN = "task"
+
+_perf_ns = time.perf_counter_ns
+_get_ident = threading.get_ident
+
+
+class Span:
+    """一段计时，用 with 包住代码，或 begin() 后手动 end()"""
+
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Optional[dict]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self) -> "Span":
+        self.start = _perf_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.set(error=exc_type.__name__)
+        self.end()
+
+    def set(self, **args):
+        """补充参数 (如结果、字节数)，导出时显示在 trace 里"""
+        if self.args is None:
+            self.args = args
+        else:
+            self.args.update(args)
+
+    def end(self):
+        if self.start:
+            self.tracer.record(self.name, self.start, _perf_ns() - self.start, self.args)
+            self.start = 0
+
+
+class _NullSpan:
+    """追踪关闭时的空 span"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def set(self, **args):
+        pass
+
+    def end(self):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    记录 span 的环形缓冲区
+
+    deque.append 本身是原子的，记录时不加锁；线程名在第一次见到该线程时记下，导出时使用。
+    """
+
+    def __init__(self, enabled: bool = TRACE, max_spans: int = TRACE_MAX_SPANS):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)  # (名称, 开始 ns, 耗时 ns, 线程 id, 参数)
+        self.threads: Dict[int, str] = {}
+        self.origin = _perf_ns()
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args or None)
+
+    def begin(self, name: str, **args):
+        """开始一个跨越多段代码的 span，结束时调用 end()"""
+        return self.span(name, **args).__enter__()
+
+    def record(self, name: str, start: int, duration: int, args: Optional[dict] = None):
+        """记录一段已经计好时的耗时 (perf_counter_ns)"""
+        tid = _get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        self.spans.append((name, start, duration, tid, args))
+
+    def reset(self):
+        self.spans.clear()
+        self.origin = _perf_ns()
+
+    # ---------- 汇总 ----------
+
+    def summary(self) -> Dict[str, dict]:
+        """按阶段汇总: 次数、总耗时、平均、p50、p95、最大 (秒)"""
+        durations: Dict[str, List[int]] = {}
+        for name, _, duration, _, _ in tuple(self.spans):
+            durations.setdefault(name, []).append(duration)
+        result = {}
+        for name, values in durations.items():
+            values.sort()
+            total = sum(values) / 1e9
+            result[name] = {
+                "count": len(values),
+                "total": total,
+                "mean": total / len(values),
+                "p50": percentile(values, 50) / 1e9,
+                "p95": percentile(values, 95) / 1e9,
+                "max": values[-1] / 1e9,
+            }
+        return result
+
+    def report(self) -> str:
+        """汇总表，按总耗时排列；占比相对整个任务"""
+        summary = self.summary()
+        if not summary:
+            return "📊 耗时追踪: 没有记录"
+        base = summary.get(TASK_SPAN, {}).get("total") or max(s["total"] for s in summary.values())
+        lines = ["📊 各阶段耗时:",
+                 f"  {'阶段':<22}{'次数':>6}{'总计':>9}{'占比':>7}{'p50':>9}{'p95':>9}{'最大':>9}"]
+        for name, s in sorted(summary.items(), key=lambda item: -item[1]["total"]):
+            lines.append(f"  {name:<24}{s['count']:>6}{s['total']:>8.2f}s{s['total'] / base:>7.0%}"
+                         f"{_ms(s['p50']):>9}{_ms(s['p95']):>9}{_ms(s['max']):>9}")
+        return "\n".join(lines)
+
+    # ---------- 导出 ----------
+
+    def chrome_trace(self) -> dict:
+        """Chrome trace 格式: 每个 span 一个完整事件 (ph=X)，时间单位 µs"""
+        pid = os.getpid()
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                  for tid, name in list(self.threads.items())]
+        origin = self.origin
+        for name, start, duration, tid, args in tuple(self.spans):
+            event = {"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": pid, "tid": tid,
+                     "ts": (start - origin) / 1000, "dur": duration / 1000}
+            if args:
+                event["args"] = {k: v if isinstance(v, (int, float, bool)) or v is None else str(v)
+                                 for k, v in args.items()}
+            events.append(event)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str) -> str:
+        """写入 Chrome trace 文件，返回路径"""
+        path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, ensure_ascii=False)
+        return path
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.0f}ms" if seconds >= 0.01 else f"{seconds * 1000:.2f}ms"
+
+
+# ---------- 当前 Tracer ----------
+
+_current: contextvars.ContextVar = contextvars.ContextVar("autoglm_tracer", default=None)
+_disabled = Tracer(enabled=False, max_spans=1)
+_export_ids = itertools.count(1)
+
+
+def current() -> Tracer:
+    """当前上下文的 Tracer；没有激活时返回一个关闭的 Tracer"""
+    return _current.get() or _disabled
+
+
+def span(name: str, **args):
+    """在当前 Tracer 上计时: with tracing.span("model.request"): ..."""
+    tracer = _current.get()
+    if tracer is None or not tracer.enabled:
+        return NULL_SPAN
+    return Span(tracer, name, args or None)
+
+
+@contextlib.contextmanager
+def activate(tracer: Tracer):
+    """在这段代码 (以及它派生的 asyncio 任务和 in_thread 调用) 中使用 tracer"""
+    token = _current.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current.reset(token)
+
+
+def traced(name: str):
+    """把整个函数记为一个 span 的装饰器"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _current.get()
+            if tracer is None or not tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(tracer, name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def export_path(directory: str = TRACE_DIR) -> str:
+    """任务 trace 文件的默认路径"""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"trace-{stamp}-{os.getpid()}-{next(_export_ids)}.json")
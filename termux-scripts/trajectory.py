@@ -0,0 +1,187 @@
+"""
+Open-AutoGLM 混合方案 - 任务轨迹录制与回放
+
+任务成功完成后，把每一步的决策、执行前的屏幕指纹和耗时保存下来；
+下次执行同一任务 (规范化后相同) 时直接按轨迹回放，不调用模型:
+- 每一步执行前比较当前屏幕与录制时的指纹，一致才执行
+- 屏幕不一致或动作执行失败时停止回放，带上提示交给模型继续
+- 回放中途交给模型并最终成功的运行会重新录制，覆盖旧轨迹
+
+每个任务一个 JSON 文件，指纹块均值用 zlib + base64 压缩，一步约 1KB。
+
+回放会在不调用模型的情况下直接操作手机，默认关闭，需要时显式开启。
+
+配置:
+    AUTOGLM_REPLAY=1            开启录制和回放 (默认关闭)
+    AUTOGLM_TRAJECTORY_DIR      轨迹目录，默认 ~/.autoglm/trajectories
+    AUTOGLM_REPLAY_MATCH_DIFF   允许变化的块比例，默认 0.01
+"""
+
+import base64
+import hashlib
+import json
+import os
+import time
+import zlib
+from typing import List, Optional
+
+from decision_cache import normalize_intent
+from frame_cache import FrameFingerprint, hamming
+
+REPLAY = os.getenv("AUTOGLM_REPLAY", "0") == "1"
+TRAJECTORY_DIR = os.getenv("AUTOGLM_TRAJECTORY_DIR", os.path.expanduser("~/.autoglm/trajectories"))
+REPLAY_MATCH_DIFF = float(os.getenv("AUTOGLM_REPLAY_MATCH_DIFF", "0.01"))
+REPLAY_MAX_HAMMING = 6
+TRAJECTORY_VERSION = 1
+
+
+class TrajectoryStep:
+    """轨迹中的一步: 执行前的屏幕指纹 + 决策 + 耗时"""
+
+    __slots__ = ("frame", "action", "params", "model_params", "thought", "elapsed")
+
+    def __init__(self, frame: FrameFingerprint, action: str, params: dict, model_params: dict,
+                 thought: str = "", elapsed: float = 0.0):
+        self.frame = frame
+        self.action = action
+        self.params = params
+        self.model_params = model_params
+        self.thought = thought
+        self.elapsed = elapsed
+
+    def matches(self, frame: FrameFingerprint, max_diff: float = REPLAY_MATCH_DIFF) -> bool:
+        if frame.size != self.frame.size:
+            return False
+        if hamming(frame.dhash, self.frame.dhash) > REPLAY_MAX_HAMMING:
+            return False
+        return frame.diff(self.frame) <= max_diff
+
+    def decision(self) -> dict:
+        """还原成模型返回的决策格式"""
+        return {"action": self.action, "params": self.params, "model_params": self.model_params,
+                "thought": self.thought}
+
+    def to_dict(self) -> dict:
+        return {
+            "a": self.action,
+            "p": self.params,
+            "mp": self.model_params,
+            "t": self.thought,
+            "s": round(self.elapsed, 3),
+            "h": format(self.frame.dhash, "016x"),
+            "b": base64.b64encode(zlib.compress(self.frame.blocks, 9)).decode(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, size: tuple) -> "TrajectoryStep":
+        frame = FrameFingerprint.restore(zlib.decompress(base64.b64decode(data["b"])), size,
+                                         int(data["h"], 16))
+        return cls(frame, data["a"], data.get("p", {}), data.get("mp", data.get("p", {})),
+                   data.get("t", ""), data.get("s", 0.0))
+
+
+class Trajectory:
+    """一次成功运行的完整轨迹"""
+
+    def __init__(self, task: str, steps: List[TrajectoryStep], duration: float,
+                 created: Optional[float] = None, replays: int = 0):
+        self.task = task
+        self.steps = steps
+        self.duration = duration
+        self.created = created or time.time()
+        self.replays = replays
+
+    def to_dict(self) -> dict:
+        size = self.steps[0].frame.size if self.steps else (0, 0)
+        return {
+            "version": TRAJECTORY_VERSION,
+            "task": self.task,
+            "intent": normalize_intent(self.task),
+            "size": list(size),
+            "duration": round(self.duration, 3),
+            "created": self.created,
+            "replays": self.replays,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Trajectory":
+        size = tuple(data["size"])
+        steps = [TrajectoryStep.from_dict(step, size) for step in data["steps"]]
+        return cls(data["task"], steps, data.get("duration", 0.0), data.get("created"),
+                   data.get("replays", 0))
+
+
+class TrajectoryStore:
+    """按规范化任务保存轨迹，每个任务一个文件"""
+
+    def __init__(self, directory: str = TRAJECTORY_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, task: str) -> str:
+        digest = hashlib.sha1(normalize_intent(task).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def load(self, task: str) -> Optional[Trajectory]:
+        path = self.path_for(task)
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != TRAJECTORY_VERSION or data.get("intent") != normalize_intent(task):
+                return None
+            return Trajectory.from_dict(data)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError, zlib.error) as e:
+            print(f"⚠️ 轨迹文件损坏，忽略: {path} ({e})")
+            return None
+
+    def save(self, trajectory: Trajectory):
+        """写入临时文件后替换，避免并发运行时读到半个文件"""
+        path = self.path_for(trajectory.task)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(trajectory.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def delete(self, task: str) -> bool:
+        try:
+            os.remove(self.path_for(task))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list(self) -> List[dict]:
+        """所有轨迹的摘要"""
+        result = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            result.append({"task": data.get("task"), "steps": len(data.get("steps", [])),
+                           "duration": data.get("duration"), "replays": data.get("replays", 0)})
+        return result
+
+
+class TrajectoryRecorder:
+    """记录一次运行中实际执行的步骤"""
+
+    def __init__(self):
+        self.steps: List[TrajectoryStep] = []
+        self.started = time.monotonic()
+
+    def record(self, frame: FrameFingerprint, result: dict, action: str, params: dict,
+               elapsed: float):
+        if action == "wait":
+            return
+        self.steps.append(TrajectoryStep(frame, action, params,
+                                         result.get("model_params", params),
+                                         result.get("thought", ""), elapsed))
+
+    def finish(self, task: str) -> Trajectory:
+        return Trajectory(task, self.steps, time.monotonic() - self.started)
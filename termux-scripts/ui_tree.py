@@ -0,0 +1,208 @@
+"""
+Open-AutoGLM 混合方案 - 控件树 (无障碍节点) 索引
+
+Helper 的 GET /hierarchy 返回当前窗口的扁平控件列表:
+    {"width", "height", "package", "nodes": [{"b": [l, t, r, b], "t": 文字, "d": 描述,
+     "id": resource-id, "cls": 类名, "c"/"e"/"s"/"f": 可点击/可编辑/可滚动/有焦点, "p": 父节点下标}]}
+
+UITree 在本地建网格空间索引，用于:
+- tap_text / tap_id: 按文字或 resource-id 找到控件，点击它 (或它最近的可点击祖先) 的中心
+- describe(): 输出紧凑的控件列表，供纯文字的模型调用使用，不必上传截图
+"""
+
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+
+GRID_COLS = 8
+GRID_ROWS = 16
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、小写、去掉空白"""
+    return "".join(unicodedata.normalize("NFKC", text or "").lower().split())
+
+
+class UINode:
+    """一个控件"""
+
+    __slots__ = ("index", "bounds", "text", "desc", "rid", "cls", "clickable", "editable",
+                 "scrollable", "focused", "parent")
+
+    def __init__(self, index: int, data: dict):
+        self.index = index
+        left, top, right, bottom = (int(v) for v in data.get("b", (0, 0, 0, 0)))
+        self.bounds = (left, top, right, bottom)
+        self.text = data.get("t", "") or ""
+        self.desc = data.get("d", "") or ""
+        self.rid = data.get("id", "") or ""
+        self.cls = data.get("cls", "") or ""
+        self.clickable = bool(data.get("c"))
+        self.editable = bool(data.get("e"))
+        self.scrollable = bool(data.get("s"))
+        self.focused = bool(data.get("f"))
+        self.parent = int(data.get("p", -1))
+
+    @property
+    def label(self) -> str:
+        return self.text or self.desc
+
+    @property
+    def center(self) -> Tuple[int, int]:
+        left, top, right, bottom = self.bounds
+        return (left + right) // 2, (top + bottom) // 2
+
+    @property
+    def area(self) -> int:
+        left, top, right, bottom = self.bounds
+        return max(0, right - left) * max(0, bottom - top)
+
+    @property
+    def short_id(self) -> str:
+        """去掉包名前缀的 resource-id (com.taobao.taobao:id/search_box -> search_box)"""
+        return self.rid.split(":id/", 1)[-1]
+
+    def contains(self, x: int, y: int) -> bool:
+        left, top, right, bottom = self.bounds
+        return left <= x < right and top <= y < bottom
+
+    def __repr__(self):
+        return f"UINode({self.index}, {self.label or self.short_id or self.cls}, {self.bounds})"
+
+
+class UITree:
+    """控件列表 + 网格空间索引"""
+
+    def __init__(self, nodes: List[UINode], width: int, height: int, package: str = ""):
+        self.nodes = nodes
+        self.width = width or max((n.bounds[2] for n in nodes), default=1)
+        self.height = height or max((n.bounds[3] for n in nodes), default=1)
+        self.package = package
+        self._cell_w = max(1, -(-self.width // GRID_COLS))
+        self._cell_h = max(1, -(-self.height // GRID_ROWS))
+        self._grid = [[] for _ in range(GRID_COLS * GRID_ROWS)]
+        for node in nodes:
+            if node.area == 0:
+                continue
+            left, top, right, bottom = node.bounds
+            for row in range(self._row(top), self._row(bottom - 1) + 1):
+                for col in range(self._col(left), self._col(right - 1) + 1):
+                    self._grid[row * GRID_COLS + col].append(node)
+
+    @classmethod
+    def from_json(cls, data: dict) -> "UITree":
+        nodes = [UINode(i, item) for i, item in enumerate(data.get("nodes", []))]
+        return cls(nodes, int(data.get("width", 0)), int(data.get("height", 0)),
+                   data.get("package", ""))
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _col(self, x: int) -> int:
+        return min(GRID_COLS - 1, max(0, x // self._cell_w))
+
+    def _row(self, y: int) -> int:
+        return min(GRID_ROWS - 1, max(0, y // self._cell_h))
+
+    def at(self, x: int, y: int, clickable: bool = False) -> Optional[UINode]:
+        """包含该点的最小控件"""
+        best = None
+        for node in self._grid[self._row(y) * GRID_COLS + self._col(x)]:
+            if clickable and not (node.clickable or node.editable):
+                continue
+            if node.contains(x, y) and (best is None or node.area < best.area):
+                best = node
+        return best
+
+    def ancestors(self, node: UINode) -> Iterable[UINode]:
+        seen = 0
+        while node.parent >= 0 and seen < len(self.nodes):
+            node = self.nodes[node.parent]
+            seen += 1
+            yield node
+
+    def target(self, node: UINode) -> UINode:
+        """
+        点击一个控件实际应该点的节点: 自己可点击就是自己，否则是最近的可点击祖先，
+        再否则是覆盖其中心的最小可点击控件 (兄弟节点做点击区域的布局)
+        """
+        if node.clickable or node.editable:
+            return node
+        for parent in self.ancestors(node):
+            if parent.clickable or parent.editable:
+                return parent
+        return self.at(*node.center, clickable=True) or node
+
+    def find_text(self, text: str) -> List[UINode]:
+        """按文字 / 描述查找，完全相同的排在前面，其次是前缀、包含；同档内可点击、面积小的优先"""
+        wanted = normalize_text(text)
+        if not wanted:
+            return []
+        scored = []
+        for node in self.nodes:
+            best = None
+            for label in (node.text, node.desc):
+                value = normalize_text(label)
+                if not value:
+                    continue
+                if value == wanted:
+                    rank = 0
+                elif value.startswith(wanted):
+                    rank = 1
+                elif wanted in value:
+                    rank = 2
+                else:
+                    continue
+                best = rank if best is None else min(best, rank)
+            if best is not None:
+                interactive = node.clickable or node.editable
+                scored.append(((best, not interactive, node.area), node))
+        scored.sort(key=lambda item: item[0])
+        return [node for _, node in scored]
+
+    def find_id(self, rid: str) -> List[UINode]:
+        """按 resource-id 查找，可以只写 id/ 后面的部分"""
+        if not rid:
+            return []
+        short = rid.split(":id/", 1)[-1]
+        matches = [n for n in self.nodes if n.rid == rid or (n.rid and n.short_id == short)]
+        matches.sort(key=lambda n: (not (n.clickable or n.editable), n.area))
+        return matches
+
+    def resolve(self, text: Optional[str] = None, rid: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """返回应该点击的坐标，找不到时返回 None"""
+        matches = self.find_id(rid) if rid else self.find_text(text or "")
+        if not matches:
+            return None
+        node = self.target(matches[0])
+        left, top, right, bottom = node.bounds
+        x, y = node.center
+        # 匹配到的文字在目标控件内时点文字本身，避免点到大卡片中间的其他按钮
+        if node is not matches[0] and node.contains(*matches[0].center):
+            x, y = matches[0].center
+        return min(max(x, left), right - 1), min(max(y, top), bottom - 1)
+
+    def describe(self, max_nodes: int = 120) -> str:
+        """
+        供纯文字模型调用的控件列表，每行一个:
+            [序号] 文字 #id 类名 中心x,y 标记(点/输/滚/焦)
+        只列有文字、描述或 id 的控件，按从上到下、从左到右排序
+        """
+        listed = [n for n in self.nodes if (n.label or n.rid) and n.area > 0]
+        listed.sort(key=lambda n: (n.bounds[1], n.bounds[0]))
+        lines = []
+        for node in listed[:max_nodes]:
+            flags = "".join(flag for flag, on in (("点", node.clickable), ("输", node.editable),
+                                                  ("滚", node.scrollable), ("焦", node.focused)) if on)
+            parts = [f"[{node.index}]"]
+            if node.label:
+                parts.append(node.label.replace("\n", " ")[:30])
+            if node.rid:
+                parts.append(f"#{node.short_id}")
+            parts.append(node.cls)
+            parts.append("{},{}".format(*node.center))
+            if flags:
+                parts.append(flags)
+            lines.append(" ".join(parts))
+        if len(listed) > max_nodes:
+            lines.append(f"... 另有 {len(listed) - max_nodes} 个控件未列出")
+        return "\n".join(lines)